@@ -18,7 +18,7 @@
 
 import argparse
 import json
-import requests
+import restclient
 import settings
 
 
@@ -63,8 +63,8 @@ def main():
 
 def create(args):
     jsonContent = open(args.file, 'rb').read()
-    r = requests.post(settings.getRestHost()+"api/oxaas/v1/admin/announcements",
-                      data=jsonContent, auth=(settings.getRestCreds()), verify=settings.getVerifyTls())
+    r = restclient.post(settings.getRestHost()+"api/oxaas/v1/admin/announcements",
+                        data=jsonContent)
     if r.ok:
         print("Created announcement.")
     else:
@@ -73,8 +73,7 @@ def create(args):
 
 
 def delete(args):
-    r = requests.delete(settings.getRestHost()+"api/oxaas/v1/admin/announcements/"+str(args.id),
-                        auth=(settings.getRestCreds()), verify=settings.getVerifyTls())
+    r = restclient.delete(settings.getRestHost()+"api/oxaas/v1/admin/announcements/"+str(args.id))
     if r.ok:
         print("Deleted announcement")
     else:
@@ -82,8 +81,7 @@ def delete(args):
 
 
 def list(args):
-    r = requests.get(settings.getRestHost()+"api/oxaas/v1/admin/announcements/*",
-                     auth=(settings.getRestCreds()), verify=settings.getVerifyTls())
+    r = restclient.get(settings.getRestHost()+"api/oxaas/v1/admin/announcements/*")
     if r.ok:
         contentType = r.headers.get('Content-Type')
         if contentType is not None and contentType.startswith('application/json'):
@@ -101,8 +99,7 @@ def list(args):
 
 
 def enable(args):
-    r = requests.put(settings.getRestHost()+"api/oxaas/v1/admin/announcements/enable/"+str(args.id),
-                     auth=(settings.getRestCreds()), verify=settings.getVerifyTls())
+    r = restclient.put(settings.getRestHost()+"api/oxaas/v1/admin/announcements/enable/"+str(args.id))
     if r.ok:
         print("Enabled announcement")
     else:
@@ -110,8 +107,7 @@ def enable(args):
 
 
 def disable(args):
-    r = requests.put(settings.getRestHost()+"api/oxaas/v1/admin/announcements/disable/"+str(args.id),
-                     auth=(settings.getRestCreds()), verify=settings.getVerifyTls())
+    r = restclient.put(settings.getRestHost()+"api/oxaas/v1/admin/announcements/disable/"+str(args.id))
     if r.ok:
         print("Disabled announcement")
     else:
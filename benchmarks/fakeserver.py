@@ -0,0 +1,596 @@
+#!/usr/bin/env python3
+
+# Copyright (C) 2022  OX Software GmbH
+#                     Wolfgang Rosenauer
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Stand-in OX Cloud provisioning server for benchmarks.
+
+Serves minimal WSDLs and an in-memory implementation of the SOAP services
+and oxaas REST endpoints used by the tools, with configurable latency.
+"""
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+from xml.etree import ElementTree
+
+NS = "http://soap.reseller.admin.openexchange.com"
+SOAPNS = "http://schemas.xmlsoap.org/soap/envelope/"
+
+TYPES = {
+    "Credentials": [("login", "string"), ("password", "string")],
+    "Entry": [("key", "string"), ("value", "string")],
+    "StringMap": [("entries", "Entry*")],
+    "MapEntry": [("key", "string"), ("value", "StringMap")],
+    "MapMap": [("entries", "MapEntry*")],
+    "Context": [("id", "int"), ("name", "string"), ("maxQuota", "long"),
+                ("usedQuota", "long"), ("enabled", "boolean"),
+                ("userAttributes", "MapMap")],
+    "User": [("id", "int"), ("name", "string"), ("password", "string"),
+             ("display_name", "string"), ("given_name", "string"),
+             ("sur_name", "string"), ("primaryEmail", "string"),
+             ("email1", "string"), ("aliases", "string*"),
+             ("defaultSenderAddress", "string"), ("language", "string"),
+             ("timezone", "string"), ("maxQuota", "long"),
+             ("usedQuota", "long"), ("mailenabled", "boolean"),
+             ("drive_user_folder_mode", "string"),
+             ("userAttributes", "MapMap")],
+    "UserModuleAccess": [("editPassword", "boolean"), ("webmail", "boolean"),
+                         ("calendar", "boolean"), ("contacts", "boolean")],
+    "ResellerAdmin": [("id", "int"), ("name", "string"),
+                      ("displayname", "string"), ("password", "string"),
+                      ("capabilities", "string"), ("taxonomies", "string"),
+                      ("configuration", "StringMap"),
+                      ("configurationToAdd", "StringMap"),
+                      ("configurationToRemove", "string*"),
+                      ("capabilitiesToAdd", "string*"),
+                      ("capabilitiesToRemove", "string*"),
+                      ("capabilitiesToDrop", "string*")],
+    "QuotaUsage": [("storage", "long"), ("messages", "long")],
+}
+
+SERVICES = {
+    "OXResellerContextService": {
+        "getData": ([("ctx", "Context"), ("auth", "Credentials")], "Context"),
+        "list": ([("search_pattern", "string"), ("auth", "Credentials")], "Context*"),
+        "exists": ([("ctx", "Context"), ("auth", "Credentials")], "boolean"),
+        "change": ([("ctx", "Context"), ("auth", "Credentials")], None),
+        "delete": ([("ctx", "Context"), ("auth", "Credentials")], None),
+        "createModuleAccessByName": ([("ctx", "Context"), ("admin_user", "User"),
+                                      ("access_combination_name", "string"),
+                                      ("auth", "Credentials")], "Context"),
+    },
+    "OXResellerUserService": {
+        "getData": ([("ctx", "Context"), ("user", "User"), ("auth", "Credentials")], "User"),
+        "getMultipleData": ([("ctx", "Context"), ("users", "User*"), ("auth", "Credentials")], "User*"),
+        "listAll": ([("ctx", "Context"), ("auth", "Credentials"),
+                     ("include_guests", "boolean")], "User*"),
+        "listCaseInsensitive": ([("ctx", "Context"), ("search_pattern", "string"),
+                                 ("auth", "Credentials")], "User*"),
+        "getAccessCombinationName": ([("ctx", "Context"), ("user", "User"),
+                                      ("auth", "Credentials")], "string"),
+        "getModuleAccess": ([("ctx", "Context"), ("user", "User"),
+                             ("auth", "Credentials")], "UserModuleAccess"),
+        "changeByModuleAccess": ([("ctx", "Context"), ("user", "User"),
+                                  ("moduleAccess", "UserModuleAccess"),
+                                  ("auth", "Credentials")], None),
+        "changeByModuleAccessName": ([("ctx", "Context"), ("user", "User"),
+                                      ("access_combination_name", "string"),
+                                      ("auth", "Credentials")], None),
+        "change": ([("ctx", "Context"), ("usrdata", "User"), ("auth", "Credentials")], None),
+        "createByModuleAccessName": ([("ctx", "Context"), ("usrdata", "User"),
+                                      ("access_combination_name", "string"),
+                                      ("auth", "Credentials")], "User"),
+        "delete": ([("ctx", "Context"), ("user", "User"), ("auth", "Credentials"),
+                    ("reassign", "int")], None),
+    },
+    "OXResellerService": {
+        "getSelfData": ([("name", "string"), ("id", "int"), ("auth", "Credentials")], "ResellerAdmin"),
+        "changeSelf": ([("adm", "ResellerAdmin"), ("auth", "Credentials")], None),
+        "list": ([("search_pattern", "string"), ("auth", "Credentials")], "ResellerAdmin*"),
+        "create": ([("adm", "ResellerAdmin"), ("auth", "Credentials")], "ResellerAdmin"),
+        "delete": ([("adm", "ResellerAdmin"), ("auth", "Credentials")], None),
+    },
+    "OXaaSService": {
+        "setMailQuota": ([("ctxid", "int"), ("usrid", "int"), ("quota", "long"),
+                          ("creds", "Credentials")], None),
+        "getMailQuota": ([("ctxid", "int"), ("usrid", "int"), ("creds", "Credentials")], "long"),
+        "getQuotaUsagePerUser": ([("ctxid", "int"), ("usrid", "int"),
+                                  ("creds", "Credentials")], "QuotaUsage"),
+        "listDomainCatchalls": ([("ctxid", "int"), ("creds", "Credentials")], "string*"),
+        "createDomainCatchall": ([("ctxid", "int"), ("domain", "string"), ("user", "string"),
+                                  ("creds", "Credentials")], None),
+        "deleteDomainCatchall": ([("ctxid", "int"), ("domain", "string"), ("user", "string"),
+                                  ("creds", "Credentials")], None),
+        "enablePermissions": ([("ctxid", "int"), ("usrid", "int"), ("perms", "string*"),
+                               ("creds", "Credentials")], None),
+        "disablePermissions": ([("ctxid", "int"), ("usrid", "int"), ("perms", "string*"),
+                                ("creds", "Credentials")], None),
+        "getPermissions": ([("ctxid", "int"), ("usrid", "int"), ("creds", "Credentials")], "string*"),
+    },
+}
+
+ARRAYS = set()
+for name, fields in TYPES.items():
+    for field, ftype in fields:
+        if ftype.endswith("*"):
+            ARRAYS.add(field)
+ARRAYS.update(["users", "perms", "return"])
+
+
+def element(name, ftype):
+    many = ftype.endswith("*")
+    ftype = ftype.rstrip("*")
+    prefix = "xs" if ftype in ("string", "int", "long", "boolean") else "tns"
+    return '<xs:element name="%s" type="%s:%s" minOccurs="0" maxOccurs="%s" nillable="true"/>' % (
+        name, prefix, ftype, "unbounded" if many else "1")
+
+
+def wsdl(servicename, host):
+    ops = SERVICES[servicename]
+    out = ['<?xml version="1.0" encoding="UTF-8"?>',
+           '<wsdl:definitions xmlns:wsdl="http://schemas.xmlsoap.org/wsdl/" '
+           'xmlns:soap="http://schemas.xmlsoap.org/wsdl/soap/" '
+           'xmlns:xs="http://www.w3.org/2001/XMLSchema" xmlns:tns="%s" targetNamespace="%s">' % (NS, NS),
+           '<wsdl:types><xs:schema elementFormDefault="qualified" targetNamespace="%s">' % NS]
+    for name, fields in TYPES.items():
+        out.append('<xs:complexType name="%s"><xs:sequence>%s</xs:sequence></xs:complexType>' % (
+            name, "".join(element(f, t) for f, t in fields)))
+    for op, (params, result) in ops.items():
+        out.append('<xs:element name="%s"><xs:complexType><xs:sequence>%s</xs:sequence></xs:complexType></xs:element>' % (
+            op, "".join(element(p, t) for p, t in params)))
+        out.append('<xs:element name="%sResponse"><xs:complexType><xs:sequence>%s</xs:sequence></xs:complexType></xs:element>' % (
+            op, element("return", result) if result else ""))
+    out.append('</xs:schema></wsdl:types>')
+    for op in ops:
+        out.append('<wsdl:message name="%sRequest"><wsdl:part name="parameters" element="tns:%s"/></wsdl:message>' % (op, op))
+        out.append('<wsdl:message name="%sResponse"><wsdl:part name="parameters" element="tns:%sResponse"/></wsdl:message>' % (op, op))
+    out.append('<wsdl:portType name="%sPortType">' % servicename)
+    for op in ops:
+        out.append('<wsdl:operation name="%s"><wsdl:input message="tns:%sRequest"/><wsdl:output message="tns:%sResponse"/></wsdl:operation>' % (op, op, op))
+    out.append('</wsdl:portType>')
+    out.append('<wsdl:binding name="%sBinding" type="tns:%sPortType">' % (servicename, servicename))
+    out.append('<soap:binding style="document" transport="http://schemas.xmlsoap.org/soap/http"/>')
+    for op in ops:
+        out.append('<wsdl:operation name="%s"><soap:operation soapAction="urn:%s"/>'
+                   '<wsdl:input><soap:body use="literal"/></wsdl:input>'
+                   '<wsdl:output><soap:body use="literal"/></wsdl:output></wsdl:operation>' % (op, op))
+    out.append('</wsdl:binding>')
+    out.append('<wsdl:service name="%s"><wsdl:port name="%sPort" binding="tns:%sBinding">'
+               '<soap:address location="%swebservices/%s"/></wsdl:port></wsdl:service>' % (
+                   servicename, servicename, servicename, host, servicename))
+    out.append('</wsdl:definitions>')
+    return "\n".join(out).encode()
+
+
+def fromXml(node):
+    children = list(node)
+    if not children:
+        if node.get("{http://www.w3.org/2001/XMLSchema-instance}nil") == "true":
+            return None
+        return node.text or ""
+    result = {}
+    for child in children:
+        name = child.tag.split("}")[-1]
+        value = fromXml(child)
+        if name in ARRAYS:
+            result.setdefault(name, []).append(value)
+        else:
+            result[name] = value
+    return result
+
+
+def toXml(name, value):
+    if value is None:
+        return ""
+    if isinstance(value, list):
+        return "".join(toXml(name, item) for item in value)
+    if isinstance(value, dict):
+        return "<tns:%s>%s</tns:%s>" % (name, "".join(toXml(k, v) for k, v in value.items()), name)
+    if isinstance(value, bool):
+        value = "true" if value else "false"
+    text = str(value).replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+    return "<tns:%s>%s</tns:%s>" % (name, text, name)
+
+
+def mergeAttributes(current, change):
+    """Merge MapMap userAttributes like OX does, entries without value are removed."""
+    namespaces = {}
+    for entry in (current or {}).get("entries", []):
+        namespaces[entry["key"]] = {e["key"]: e.get("value") for e in (entry.get("value") or {}).get("entries", [])}
+    for entry in change.get("entries", []):
+        values = namespaces.setdefault(entry["key"], {})
+        for item in (entry.get("value") or {}).get("entries", []):
+            if item.get("value") is None:
+                values.pop(item["key"], None)
+            else:
+                values[item["key"]] = item["value"]
+    return {"entries": [{"key": ns, "value": {"entries": [{"key": k, "value": v} for k, v in values.items()]}}
+                        for ns, values in namespaces.items()]}
+
+
+class SoapFault(Exception):
+    pass
+
+
+class State:
+    """In-memory contexts, users and REST resources."""
+
+    def __init__(self, contexts=0, users=0):
+        self.lock = threading.Lock()
+        self.contexts = {}
+        self.users = {}
+        self.rest = {}
+        self.forwards = {}
+        self.catchalls = {}
+        self.reseller = {"id": 1, "name": "brand", "displayname": "brand",
+                         "capabilities": "", "taxonomies": "", "configuration": {}}
+        self.nextCid = 1
+        for i in range(contexts):
+            ctx = self.addContext("brand_ctx%d" % i, 1024)
+            for u in range(users):
+                self.addUser(ctx["id"], "user%d@ctx%d.example.com" % (u, i), "cloud_pim")
+
+    def addContext(self, name, quota):
+        ctx = {"id": self.nextCid, "name": name, "maxQuota": quota, "usedQuota": 0,
+               "enabled": True, "userAttributes": {"entries": [{"key": "config", "value": {
+                   "entries": [{"key": "com.openexchange.appsuite.servercontact", "value": "support@example.com"}]}}]}}
+        self.nextCid += 1
+        self.contexts[ctx["id"]] = ctx
+        self.users[ctx["id"]] = {}
+        return ctx
+
+    def addUser(self, cid, name, acn, data=None):
+        users = self.users[cid]
+        user = {"id": max(users, default=1) + 1, "name": name, "display_name": name,
+                "given_name": "", "sur_name": "", "primaryEmail": name, "email1": name,
+                "aliases": [name], "defaultSenderAddress": name, "language": "en_US",
+                "timezone": "Europe/Berlin", "maxQuota": 1024, "usedQuota": 0,
+                "mailenabled": True, "drive_user_folder_mode": "normal",
+                "userAttributes": {"entries": []}}
+        for key, value in (data or {}).items():
+            if key in dict(TYPES["User"]) and key not in ("id", "password"):
+                user[key] = value
+        user["acn"] = acn
+        users[user["id"]] = user
+        return user
+
+    def classOfService(self, key, values):
+        cos = values.get("classofservice")
+        if cos is None:
+            user = self.users.get(key[0], {}).get(key[1]) or {}
+            for entry in user.get("userAttributes", {}).get("entries", []):
+                if entry["key"] == "cloud":
+                    cos = next((e["value"] for e in (entry.get("value") or {}).get("entries", [])
+                                if e["key"] == "service"), None)
+        if isinstance(cos, str):
+            cos = [c for c in cos.split(",") if c]
+        return cos or []
+
+    def context(self, ref):
+        if ref is None:
+            raise SoapFault("No context given")
+        if ref.get("id"):
+            ctx = self.contexts.get(int(ref["id"]))
+        else:
+            ctx = next((c for c in self.contexts.values() if c["name"] == ref.get("name")), None)
+        if ctx is None:
+            raise SoapFault("Context %s does not exist" % (ref.get("id") or ref.get("name")))
+        return ctx
+
+    def user(self, cid, ref):
+        if ref.get("id"):
+            user = self.users[cid].get(int(ref["id"]))
+        else:
+            user = next((u for u in self.users[cid].values() if u["name"] == ref.get("name")), None)
+        if user is None:
+            raise SoapFault("User %s does not exist" % (ref.get("id") or ref.get("name")))
+        return user
+
+    def publicUser(self, user):
+        fields = dict(TYPES["User"])
+        return {k: v for k, v in user.items() if k in fields}
+
+    def call(self, service, op, args):
+        if service == "OXResellerContextService":
+            if op == "getData":
+                return self.context(args.get("ctx"))
+            if op == "list":
+                pattern = re.compile("^" + re.escape(args.get("search_pattern") or "*").replace("\\*", ".*") + "$")
+                return [c for c in self.contexts.values() if pattern.match(c["name"])]
+            if op == "exists":
+                try:
+                    self.context(args.get("ctx"))
+                    return True
+                except SoapFault:
+                    return False
+            if op == "change":
+                ctx = self.context(args.get("ctx"))
+                for key in ("maxQuota", "userAttributes"):
+                    if args["ctx"].get(key) not in (None, ""):
+                        ctx[key] = args["ctx"][key]
+                return None
+            if op == "delete":
+                ctx = self.context(args.get("ctx"))
+                del self.contexts[ctx["id"]]
+                del self.users[ctx["id"]]
+                return None
+            if op == "createModuleAccessByName":
+                name = args["ctx"]["name"]
+                if any(c["name"] == name for c in self.contexts.values()):
+                    raise SoapFault("Context %s already exists" % name)
+                ctx = self.addContext(name, int(args["ctx"].get("maxQuota") or 1024))
+                self.addUser(ctx["id"], args["admin_user"]["name"], args["access_combination_name"])
+                return ctx
+        if service == "OXResellerUserService":
+            ctx = self.context(args.get("ctx"))
+            cid = ctx["id"]
+            if op == "getData":
+                return self.publicUser(self.user(cid, args["user"]))
+            if op == "getMultipleData":
+                return [self.publicUser(self.user(cid, u)) for u in args.get("users", [])]
+            if op == "listAll":
+                return [{"id": u["id"], "name": u["name"]} for u in self.users[cid].values()]
+            if op == "listCaseInsensitive":
+                pattern = re.compile("^" + re.escape(args.get("search_pattern") or "*").replace("\\*", ".*") + "$", re.I)
+                return [{"id": u["id"], "name": u["name"]} for u in self.users[cid].values()
+                        if pattern.match(u["name"])]
+            if op == "getAccessCombinationName":
+                return self.user(cid, args["user"])["acn"]
+            if op == "getModuleAccess":
+                return {"editPassword": self.user(cid, args["user"]).get("editPassword", False),
+                        "webmail": True, "calendar": True, "contacts": True}
+            if op == "changeByModuleAccess":
+                self.user(cid, args["user"])["editPassword"] = args["moduleAccess"].get("editPassword") == "true"
+                return None
+            if op == "changeByModuleAccessName":
+                self.user(cid, args["user"])["acn"] = args["access_combination_name"]
+                return None
+            if op == "change":
+                user = self.user(cid, args["usrdata"])
+                for key, value in args["usrdata"].items():
+                    if key == "userAttributes" and value:
+                        user[key] = mergeAttributes(user.get(key), value)
+                    elif key not in ("id", "password") and value is not None:
+                        user[key] = value
+                return None
+            if op == "createByModuleAccessName":
+                data = args["usrdata"]
+                if any(u["name"] == data["name"] for u in self.users[cid].values()):
+                    raise SoapFault("User %s already exists" % data["name"])
+                return self.publicUser(self.addUser(cid, data["name"], args["access_combination_name"], data))
+            if op == "delete":
+                user = self.user(cid, args["user"])
+                del self.users[cid][user["id"]]
+                return None
+        if service == "OXResellerService":
+            if op == "getSelfData":
+                return self.reseller
+            if op == "changeSelf":
+                adm = args["adm"]
+                config = dict((e["key"], e["value"]) for e in self.reseller["configuration"].get("entries", []))
+                for entry in (adm.get("configurationToAdd") or {}).get("entries", []):
+                    config[entry["key"]] = entry["value"]
+                for key in adm.get("configurationToRemove") or []:
+                    config.pop(key, None)
+                self.reseller["configuration"] = {"entries": [{"key": k, "value": v} for k, v in config.items()]}
+                return None
+            if op == "list":
+                return [self.reseller]
+            if op in ("create", "delete"):
+                return args["adm"]
+        if service == "OXaaSService":
+            cid = int(args["ctxid"])
+            key = (cid, int(args.get("usrid") or 0))
+            if op == "setMailQuota":
+                self.rest.setdefault(key, {})["mailquota"] = int(args["quota"])
+                return None
+            if op == "getMailQuota":
+                return self.rest.get(key, {}).get("mailquota", 1024)
+            if op == "getQuotaUsagePerUser":
+                return {"storage": 2048, "messages": 10}
+            if op == "listDomainCatchalls":
+                return ["%s:%s" % c for c in self.catchalls.get(cid, [])]
+            if op == "createDomainCatchall":
+                self.catchalls.setdefault(cid, []).append((args["domain"], args["user"]))
+                return None
+            if op == "deleteDomainCatchall":
+                self.catchalls[cid] = [c for c in self.catchalls.get(cid, []) if c != (args["domain"], args["user"])]
+                return None
+            if op == "getPermissions":
+                return sorted(self.rest.get(key, {}).get("permissions", []))
+            if op in ("enablePermissions", "disablePermissions"):
+                perms = self.rest.setdefault(key, {}).setdefault("permissions", set())
+                for perm in args.get("perms", []):
+                    if op == "enablePermissions":
+                        perms.add(perm)
+                    else:
+                        perms.discard(perm)
+                return None
+        raise SoapFault("Unsupported operation %s.%s" % (service, op))
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # buffer headers and body into one segment, avoids Nagle delays
+    wbufsize = 65536
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def reply(self, status, body=b"", contentType="application/json"):
+        if isinstance(body, str):
+            body = body.encode()
+        self.send_response(status)
+        self.send_header("Content-Type", contentType)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def count(self, key):
+        server = self.server
+        with server.state.lock:
+            server.stats[key] = server.stats.get(key, 0) + 1
+
+    def body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def do_GET(self):
+        self.dispatch("GET")
+
+    def do_POST(self):
+        self.dispatch("POST")
+
+    def do_PUT(self):
+        self.dispatch("PUT")
+
+    def do_DELETE(self):
+        self.dispatch("DELETE")
+
+    def dispatch(self, method):
+        url = urlparse(self.path)
+        path = unquote(url.path)
+        data = self.body()
+        if path == "/_stats":
+            with self.server.state.lock:
+                stats = dict(self.server.stats)
+                if method == "DELETE":
+                    self.server.stats.clear()
+            return self.reply(200, json.dumps(stats))
+        match = re.match(r"^/webservices/(\w+)$", path)
+        if match and method == "GET" and url.query == "wsdl":
+            self.count("wsdl:" + match.group(1))
+            host = "http://%s:%d/" % self.server.server_address[:2]
+            etag = '"%s"' % match.group(1)
+            if self.headers.get("If-None-Match") == etag:
+                return self.reply(304)
+            body = wsdl(match.group(1), host)
+            self.send_response(200)
+            self.send_header("Content-Type", "text/xml")
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        time.sleep(self.server.latency)
+        if random.random() < self.server.errorRate:
+            self.count("error")
+            return self.reply(503, "{}")
+        if match and method == "POST":
+            return self.soap(match.group(1), data)
+        return self.restCall(method, path, parse_qs(url.query), data)
+
+    def soap(self, service, data):
+        body = ElementTree.fromstring(data).find("{%s}Body" % SOAPNS)
+        request = list(body)[0]
+        op = request.tag.split("}")[-1]
+        self.count("soap:%s.%s" % (service, op))
+        args = fromXml(request)
+        if not isinstance(args, dict):
+            args = {}
+        try:
+            with self.server.state.lock:
+                result = self.server.state.call(service, op, args)
+        except SoapFault as e:
+            fault = ('<soap:Envelope xmlns:soap="%s"><soap:Body><soap:Fault><faultcode>soap:Server</faultcode>'
+                     '<faultstring>%s</faultstring></soap:Fault></soap:Body></soap:Envelope>') % (SOAPNS, e)
+            return self.reply(500, fault, "text/xml")
+        envelope = ('<soap:Envelope xmlns:soap="%s" xmlns:tns="%s"><soap:Body><tns:%sResponse>%s'
+                    '</tns:%sResponse></soap:Body></soap:Envelope>') % (
+                        SOAPNS, NS, op, toXml("return", result), op)
+        self.reply(200, envelope, "text/xml")
+
+    def restCall(self, method, path, query, data):
+        state = self.server.state
+        match = re.match(r"^/oxaas/v1/admin/contexts/(\d+)/users/(\d+)/(classofservice|spamlevel)$", path)
+        if match:
+            self.count("rest:%s %s" % (method, match.group(3)))
+            key = (int(match.group(1)), int(match.group(2)))
+            with state.lock:
+                values = state.rest.setdefault(key, {})
+                if method == "PUT":
+                    values.update(json.loads(data or b"{}"))
+                    return self.reply(200, json.dumps(values))
+                if match.group(3) == "classofservice":
+                    # like OX the COS is a list, by default the cloud/service attribute of the user
+                    return self.reply(200, json.dumps({"classofservice": state.classOfService(key, values)}))
+                return self.reply(200, json.dumps({match.group(3): values.get(match.group(3), "")}))
+        match = re.match(r"^/api/oxaas/v1/admin/forwards/([^/]+)(?:/([^/]+))?$", path)
+        if match:
+            self.count("rest:%s forwards" % method)
+            with state.lock:
+                forwards = state.forwards.setdefault(match.group(1), {})
+                alias = match.group(2)
+                if method == "GET":
+                    return self.reply(200, json.dumps([{"alias": a, "targets": t} for a, t in forwards.items()]))
+                if method == "POST":
+                    forwards[alias] = json.loads(data or b"[]")
+                    return self.reply(201)
+                if method == "DELETE":
+                    if alias is None:
+                        forwards.clear()
+                    else:
+                        forwards.pop(alias, None)
+                    return self.reply(200)
+        if path.startswith("/api/oxaas/v1/admin/") or path.startswith("/oxaas/v1/admin/"):
+            self.count("rest:%s %s" % (method, path.split("/admin/")[1].split("/")[0]))
+            if method == "GET":
+                return self.reply(200, "[]")
+            return self.reply(200, "{}")
+        self.reply(404, "{}")
+
+
+def serve(port=0, latency=0.0, contexts=0, users=0, errorRate=0.0):
+    """Start the server in a background thread and return it."""
+    ThreadingHTTPServer.request_queue_size = 1024
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.errorRate = errorRate
+    server.stats = {}
+    server.state = State(contexts, users)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Stand-in OX Cloud provisioning server.')
+    parser.add_argument("-p", "--port", help="Port to listen on.", type=int, default=8080)
+    parser.add_argument("--latency", help="Latency per API call in seconds.", type=float, default=0.0)
+    parser.add_argument("--contexts", help="Number of contexts to prepopulate.", type=int, default=1)
+    parser.add_argument("--users", help="Number of users per context.", type=int, default=10)
+    parser.add_argument("--error-rate", help="Share of API calls answered with 503.", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = serve(args.port, args.latency, args.contexts, args.users, args.error_rate)
+    print("Listening on http://%s:%d/" % server.server_address[:2])
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+
+# Copyright (C) 2022  OX Software GmbH
+#                     Wolfgang Rosenauer
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Guard the startup time of the tools.
+
+Imports each module in a fresh interpreter with -X importtime and fails if
+it pulls in a forbidden heavy dependency or exceeds its time budget.
+"""
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SOAP = ["zeep", "lxml"]
+
+# module: (budget in milliseconds, modules it must not import)
+BUDGETS = {
+    "settings": (20, SOAP + ["requests"]),
+    "oxcloud": (20, SOAP + ["requests"]),
+    "soapclient": (40, SOAP + ["requests"]),
+    "contextcache": (40, SOAP + ["requests"]),
+    "restclient": (30, SOAP + ["requests"]),
+    "forwarder": (40, SOAP + ["requests"]),
+    "announcements": (40, SOAP + ["requests"]),
+    "shareddomain": (40, SOAP + ["requests"]),
+    "closesessions": (40, SOAP + ["requests"]),
+    "listcontext": (60, SOAP),
+    "deletecontext": (60, SOAP),
+}
+
+
+def importtime(module, env):
+    """Return (cumulative import time in ms, imported module names)."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import " + module],
+                            env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr)
+    cumulative = 0
+    modules = set()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line or "self [us]" in line:
+            continue
+        self, total, name = line[len("import time:"):].split("|")
+        name = name.strip()
+        modules.add(name)
+        if name == module:
+            cumulative = int(total) / 1000
+    return cumulative, modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check import times of the tools against their budgets.')
+    parser.add_argument("--factor", help="Scale all budgets, e.g. for slow machines. (Default: 1.0)",
+                        type=float, default=1.0)
+    parser.add_argument("--repeat", help="Take the best of this many runs. (Default: 3)", type=int, default=3)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="oxbudget-")
+    with open(os.path.join(workdir, "target.py"), "w") as target:
+        target.write('soapHost = "http://localhost/"\nrestHost = "http://localhost/"\n'
+                     'login = "brand"\npassword = "secret"\n')
+    env = dict(os.environ, PYTHONPATH=workdir + os.pathsep + REPO)
+
+    failed = False
+    try:
+        for module, (budget, forbidden) in BUDGETS.items():
+            runs = [importtime(module, env) for i in range(args.repeat)]
+            elapsed = min(run[0] for run in runs)
+            heavy = sorted(name for name in forbidden if name in runs[0][1])
+            ok = elapsed <= budget * args.factor and not heavy
+            failed = failed or not ok
+            print("{:<4} {:<16} {:>7.1f} ms (budget {:>5.1f} ms){}".format(
+                "OK" if ok else "FAIL", module, elapsed, budget * args.factor,
+                " imports " + ", ".join(heavy) if heavy else ""))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
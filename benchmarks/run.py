@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+
+# Copyright (C) 2022  OX Software GmbH
+#                     Wolfgang Rosenauer
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Benchmark the tools against the stand-in server in fakeserver.py.
+
+Measures import time, WSDL load time, wall time and round trips per
+command and bulk throughput, and writes the results as JSON.
+"""
+
+import argparse
+import fakeserver
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SERVICES = ["OXResellerContextService", "OXResellerUserService", "OXResellerService", "OXaaSService"]
+
+MODULES = ["settings", "restclient", "soapclient", "forwarder", "listuser", "createuser"]
+
+COMMANDS = [
+    ("listcontext", ["listcontext.py"]),
+    ("listuser", ["listuser.py", "-c", "1"]),
+    ("createuser", ["createuser.py", "-c", "1", "-e", "bench@example.com", "-p", "secret", "-g", "Bench",
+                    "-s", "User", "-q", "100", "-a", "cloud_pim", "--spamlevel", "high"]),
+    ("changeuser", ["changeuser.py", "-c", "1", "-e", "bench@example.com", "--config", "a=b"]),
+    ("deleteuser", ["deleteuser.py", "-c", "1", "-e", "bench@example.com"]),
+    ("listcatchall", ["listcatchall.py", "-c", "1"]),
+    ("forwarder", ["forwarder.py", "list", "-c", "1"]),
+]
+
+TARGET = """soapHost = "{host}"
+restHost = "{host}"
+login = "brand"
+password = "secret"
+wsdlCache = "{workdir}/cache/wsdl.sqlite"
+contextCache = "{workdir}/cache/contexts.sqlite"
+inventory = "{workdir}/cache/inventory.sqlite"
+"""
+
+
+class Bench:
+    def __init__(self, server, workdir):
+        self.host = "http://%s:%d/" % server.server_address[:2]
+        self.workdir = workdir
+        self.env = dict(os.environ, PYTHONPATH=workdir + os.pathsep + REPO)
+        with open(os.path.join(workdir, "target.py"), "w") as target:
+            target.write(TARGET.format(host=self.host, workdir=workdir))
+
+    def python(self, argv, stdin=None):
+        """Run python with argv, return (elapsed seconds, stdout)."""
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable] + argv, cwd=self.workdir, env=self.env, input=stdin,
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        elapsed = time.perf_counter() - start
+        if result.returncode != 0:
+            raise RuntimeError("%s failed: %s" % (" ".join(argv), result.stderr.strip()))
+        return elapsed, result.stdout
+
+    def tool(self, argv):
+        return self.python([os.path.join(REPO, argv[0])] + argv[1:])
+
+    def stats(self):
+        """Return and reset the request counters of the server."""
+        request = urllib.request.Request(self.host + "_stats", method="DELETE")
+        with urllib.request.urlopen(request) as response:
+            return json.loads(response.read())
+
+    def clearCache(self):
+        shutil.rmtree(os.path.join(self.workdir, "cache"), ignore_errors=True)
+
+
+def median(values):
+    return round(statistics.median(values), 4)
+
+
+def measureImports(bench, repeat):
+    results = {}
+    for module in ["sys"] + MODULES:
+        code = "import time; t = time.perf_counter(); import %s; print(time.perf_counter() - t)" % module
+        results[module] = median([float(bench.python(["-c", code])[1]) for i in range(repeat)])
+    results["interpreter"] = median([bench.python(["-c", "pass"])[0] for i in range(repeat)])
+    return results
+
+
+def measureWsdl(bench, repeat):
+    code = ("import soapclient, time; t = time.perf_counter()\n"
+            "for s in %r: soapclient.getService(s)\n"
+            "print(time.perf_counter() - t)" % SERVICES)
+    cold = []
+    for i in range(repeat):
+        bench.clearCache()
+        cold.append(float(bench.python(["-c", code])[1]))
+    warm = [float(bench.python(["-c", code])[1]) for i in range(repeat)]
+    return {"cold": median(cold), "warm": median(warm)}
+
+
+def measureCommands(bench, repeat):
+    times = {name: [] for name, argv in COMMANDS}
+    trips = {}
+    bench.tool(["listcontext.py"])
+    bench.stats()
+    for i in range(repeat):
+        for name, argv in COMMANDS:
+            times[name].append(bench.tool(argv)[0])
+            stats = bench.stats()
+            trips[name] = {
+                "roundTrips": sum(count for key, count in stats.items() if not key.startswith("wsdl:")),
+                "wsdlFetches": sum(count for key, count in stats.items() if key.startswith("wsdl:")),
+                "calls": stats
+            }
+    return {name: dict(wallTime=median(times[name]), **trips[name]) for name, argv in COMMANDS}
+
+
+def measureBulk(bench, users, rows):
+    results = {}
+    elapsed = bench.tool(["listuser.py", "-c", "2"])[0]
+    results["listuser"] = {"users": users, "wallTime": round(elapsed, 4),
+                           "usersPerSecond": round(users / elapsed, 1), "roundTrips": sum(bench.stats().values())}
+
+    batch = os.path.join(bench.workdir, "batch.csv")
+    with open(batch, "w") as batchfile:
+        batchfile.write("email,password,firstname,lastname\n")
+        for i in range(rows):
+            batchfile.write("bulk%d@example.com,secret,Bulk,User%d\n" % (i, i))
+    elapsed = bench.tool(["createuser.py", "-c", "3", "--batch", batch, "-q", "100", "-a", "cloud_pim"])[0]
+    results["createuser"] = {"users": rows, "wallTime": round(elapsed, 4),
+                             "usersPerSecond": round(rows / elapsed, 1), "roundTrips": sum(bench.stats().values())}
+    return results
+
+
+def compare(old, new, path=""):
+    """Print relative changes of all numbers in new against old."""
+    for key, value in new.items():
+        if key not in old or key == "meta":
+            continue
+        if isinstance(value, dict):
+            compare(old[key], value, path + key + ".")
+        elif isinstance(value, (int, float)) and old[key]:
+            change = (value - old[key]) / old[key] * 100
+            print("{:<50} {:>12} {:>12} {:>+8.1f}%".format(path + key, old[key], value, change))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the provisioning tools against a local stand-in server.')
+    parser.add_argument("--latency", help="Simulated latency per API call in seconds. (Default: 0.005)",
+                        type=float, default=0.005)
+    parser.add_argument("--users", help="Users per context for listing. (Default: 200)", type=int, default=200)
+    parser.add_argument("--bulk", help="Users created in the bulk run. (Default: 200)", type=int, default=200)
+    parser.add_argument("--repeat", help="Repetitions per measurement. (Default: 3)", type=int, default=3)
+    parser.add_argument("-o", "--output", help="Write results to this JSON file (default: stdout).")
+    parser.add_argument("--compare", help="Compare the results with a previous JSON result file.")
+    args = parser.parse_args()
+
+    server = fakeserver.serve(latency=args.latency, contexts=3, users=args.users)
+    workdir = tempfile.mkdtemp(prefix="oxbench-")
+    try:
+        bench = Bench(server, workdir)
+        revision = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO,
+                                  stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True).stdout.strip()
+        results = {
+            "meta": {"time": time.strftime("%Y-%m-%dT%H:%M:%S"), "revision": revision,
+                     "python": platform.python_version(), "latency": args.latency,
+                     "users": args.users, "bulk": args.bulk, "repeat": args.repeat},
+            "imports": measureImports(bench, args.repeat),
+            "wsdl": measureWsdl(bench, args.repeat),
+            "commands": measureCommands(bench, args.repeat),
+            "bulk": measureBulk(bench, args.users, args.bulk),
+        }
+    finally:
+        server.shutdown()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as outputfile:
+            outputfile.write(output + "\n")
+    else:
+        print(output)
+
+    if args.compare:
+        with open(args.compare) as previous:
+            compare(json.load(previous), results)
+
+
+if __name__ == "__main__":
+    main()
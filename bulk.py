@@ -0,0 +1,109 @@
+# Copyright (C) 2022  OX Software GmbH
+#                     Wolfgang Rosenauer
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Helpers shared by the bulk modes of the tools."""
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import csv
+import json
+import resilience
+import time
+
+
+def readRows(path):
+  """Yield dicts from a CSV (with header line) or JSONL file."""
+  with open(path, newline='') as fileinput:
+    if path.endswith(".csv"):
+      for row in csv.DictReader(fileinput):
+        yield row
+      return
+    for line in fileinput:
+      line = line.strip()
+      if line and not line.startswith('#'):
+        yield json.loads(line)
+
+def readList(path):
+  """Yield the non-empty lines of a file (e.g. IDs or email addresses), skipping # comments."""
+  with open(path) as fileinput:
+    for line in fileinput:
+      line = line.strip()
+      if line and not line.startswith('#'):
+        yield line
+
+def imap(func, items, workers=4):
+  """Run func on items in a thread pool and yield (item, result, error).
+
+  Results are yielded in the order of items and at most 2*workers items
+  are in flight, so items can be an arbitrarily long iterator.
+  """
+  resilience.getLimiter().expect(workers)
+  with ThreadPoolExecutor(max_workers=workers) as executor:
+    pending = deque()
+    for item in items:
+      pending.append((item, executor.submit(func, item)))
+      if len(pending) >= 2 * workers:
+        yield _result(*pending.popleft())
+    while pending:
+      yield _result(*pending.popleft())
+
+def _result(item, future):
+  try:
+    return item, future.result(), None
+  except Exception as e:
+    return item, None, e
+
+def toBool(value):
+  if isinstance(value, str):
+    return value.strip().lower() in ("1", "true", "yes", "y", "on")
+  return bool(value)
+
+
+class Summary:
+    """Counts succeeded and failed items and reports the throughput."""
+
+    def __init__(self):
+        self.start = time.time()
+        self.succeeded = 0
+        self.failed = 0
+
+    def add(self, error=None):
+        if error is None:
+            self.succeeded += 1
+        else:
+            self.failed += 1
+
+    def __str__(self):
+        elapsed = time.time() - self.start
+        total = self.succeeded + self.failed
+        return "Processed {} items: {} succeeded, {} failed in {:.1f}s ({:.1f} items/s)".format(
+            total, self.succeeded, self.failed, elapsed, total / elapsed if elapsed > 0 else 0)
+
+
+class ResultFile:
+    """Writes one JSON line per processed item, does nothing without a path."""
+
+    def __init__(self, path=None):
+        self.file = open(path, "w") if path else None
+
+    def add(self, **record):
+        if self.file is not None:
+            self.file.write(json.dumps(record) + "\n")
+            self.file.flush()
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
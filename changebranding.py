@@ -31,13 +31,16 @@ def main():
     parser.add_argument(
         "--config", help="Additional config properties including in format PROPERTY=VALUE")
     parser.add_argument(
-        "--remove-config", help="Wipe specified property from config")
+        "--remove-config", help="Wipe specified property (comma separated for several) from config")
     parser.add_argument(
         "--capabilities-to-add", help="One or more capabilities (comma separated) to add.")
     parser.add_argument(
         "--capabilities-to-remove", help="One or more capabilities (comma separated) to remove (=false).")
     parser.add_argument(
         "--capabilities-to-drop", help="One or more capabilities (comma separated) to delete.")
+    parser.add_argument("--plan", action="store_true",
+                        help="Only show which config properties would be added, changed or removed.")
+    soapclient.addArguments(parser)
     args = parser.parse_args()
 
     resellerService = soapclient.getService("OXResellerService")
@@ -46,42 +49,43 @@ def main():
         "name": settings.getCreds()["login"]
     }
 
-    config = []
+    config = {}
 
     if args.configimport is not None:
-        fileinput = open(args.configimport, 'r')
-        lines = fileinput.readlines()
-        for line in lines:
-            if line.startswith('#') or line.startswith(' '):
-                continue
-            line = line.strip()
-            config.append({"key": line.split('=', 1)[
-                          0], "value": line.split('=', 1)[1]})
-
-        fileinput.close()
+        config.update(readProperties(args.configimport))
 
     if args.servercontact:
-        config.append(
-            {"key": "com.openexchange.appsuite.servercontact", "value": args.servercontact})
+        config["com.openexchange.appsuite.servercontact"] = args.servercontact
 
     if args.config:
-        for key, value in kv_pairs(args.config).items():
-            config.append(
-                {
-                    "key": key,
-                    "value": value
-                }
-            )
-
-    removeConfig = None
-    if args.remove_config:
-        removeConfig = args.remove_config
+        config.update(kv_pairs(args.config))
 
-    if config is not None:
-        admin["configurationToAdd"] = {"entries": config}
-
-    if removeConfig is not None:
-        admin["configurationToRemove"] = removeConfig
+    removeConfig = []
+    if args.remove_config:
+        removeConfig = [key.strip() for key in args.remove_config.split(",") if key.strip()]
+
+    if config or removeConfig:
+        # only what differs from the current configuration is sent
+        reseller = resellerService.getSelfData(admin["name"], None, settings.getCreds())
+        current = {}
+        if reseller.configuration is not None:
+            current = {entry.key: entry.value for entry in reseller.configuration.entries or []}
+        changed = {key: value for key, value in config.items() if current.get(key) != value}
+        removed = [key for key in removeConfig if key in current]
+
+        if args.plan:
+            printPlan(current, changed, removed, len(config) - len(changed))
+            return
+
+        if changed:
+            admin["configurationToAdd"] = {"entries": [{"key": key, "value": value} for key, value in changed.items()]}
+        if removed:
+            admin["configurationToRemove"] = removed
+        print("Configuration: {} added or changed, {} removed, {} unchanged".format(
+            len(changed), len(removed), len(config) - len(changed)))
+    elif args.plan:
+        print("Nothing to change in the configuration")
+        return
 
     if args.capabilities_to_add:
        admin["capabilitiesToAdd"] = args.capabilities_to_add.split(',')
@@ -92,10 +96,35 @@ def main():
     if args.capabilities_to_remove:
        admin["capabilitiesToRemove"] = args.capabilities_to_remove.split(',')
 
+    if len(admin) == 1:
+        print("Configuration already up to date")
+        return
+
     resellerService.changeSelf(admin, settings.getCreds())
     print("Changed configuration")
 
 
+def readProperties(path):
+    """Yield (key, value) from a properties file, lines starting with # or a space are skipped."""
+    with open(path, 'r') as fileinput:
+        for line in fileinput:
+            if line.startswith('#') or line.startswith(' ') or not line.strip():
+                continue
+            key, value = line.strip().split('=', 1)
+            yield key, value
+
+
+def printPlan(current, changed, removed, unchanged):
+    for key, value in changed.items():
+        if key in current:
+            print("~ {}: {} -> {}".format(key, current[key], value))
+        else:
+            print("+ {}={}".format(key, value))
+    for key in removed:
+        print("- {}".format(key))
+    print("{} to add or change, {} to remove, {} unchanged".format(len(changed), len(removed), unchanged))
+
+
 def kv_pairs(text, item_sep=r";", value_sep="="):
     split_regex = r"""
         (?P<key>[\w\.\-/]+)=    # Key consists of only alphanumerics and '-' character
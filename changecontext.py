@@ -17,6 +17,7 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import argparse
+import contextcache
 import settings
 import soapclient
 
@@ -29,6 +30,7 @@ def main():
         "-c", "--cid", help="Context ID to be changed.", type=int)
     parser.add_argument(
         "-q", "--quota", help="New quota of the context in MiB", type=int)
+    soapclient.addArguments(parser)
     args = parser.parse_args()
 
     if args.context_name is None and args.cid is None:
@@ -42,12 +44,14 @@ def main():
     else:
         ctx["name"] = settings.getCreds()["login"] + "_" + args.context_name
 
-    ctx = contextService.getData(ctx, settings.getCreds())
+    ctx = contextcache.resolve(ctx)
 
+    # only the given attributes are changed
+    change = {"id": ctx.id}
     if args.quota is not None:
-        ctx.maxQuota = args.quota
+        change["maxQuota"] = args.quota
 
-    contextService.change(ctx, settings.getCreds())
+    contextService.change(change, settings.getCreds())
     print("Changed context", ctx.id)
 
 
@@ -17,6 +17,7 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import argparse
+import contextcache
 import settings
 import soapclient
 
@@ -35,6 +36,7 @@ def main():
         "--enable", help="Enable permissions (comma separated) for the user.")
     parser.add_argument(
         "--disable", help="Disable permissions (comma separated) for the user.")
+    soapclient.addArguments(parser)
     args = parser.parse_args()
 
     if args.context_name is None and args.cid is None:
@@ -47,9 +49,8 @@ def main():
     if args.cid is not None:
         ctx["id"] = args.cid
     else:
-        contextService = soapclient.getService("OXResellerContextService")
         ctx["name"] = settings.getCreds()["login"] + "_" + args.context_name
-        ctx = contextService.getData(ctx, settings.getCreds())
+        ctx = contextcache.resolve(ctx)
 
     user = {}
     if args.email is not None:
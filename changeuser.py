@@ -17,9 +17,14 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import argparse
+import bulk
+import contextcache
+import journal
 import json
+import listuser
 import re
-import requests
+import records
+import restclient
 import settings
 import soapclient
 from os.path import exists
@@ -63,12 +68,29 @@ def main():
                         action="store_true")
     parser.add_argument(
         "--dump", help="Dump XML request/response to file.", action="store_true")
+    parser.add_argument("--match",
+                        help="Apply --config/--remove-config to all users whose name matches this pattern (e.g. '*').")
+    parser.add_argument("-w", "--workers", default=4, type=int,
+                        help="Number of users changed concurrently with --match. (Default: 4)")
+    parser.add_argument("--chunksize", default=100, type=int,
+                        help="Fetch user data in chunks of this many users with --match. (Default: 100)")
+    journal.addArguments(parser)
+    soapclient.addArguments(parser)
     args = parser.parse_args()
 
     if args.context_name is None and args.cid is None:
         parser.error("Context must be specified by either -n or -c !")
 
-    if args.userid is None and args.email is None:
+    if args.match is not None:
+        if not (args.config or args.remove_config):
+            parser.error("--match requires --config or --remove-config !")
+        for option in ("email", "userid", "aliases", "newmail", "password", "firstname", "lastname", "language",
+                       "timezone", "quota", "mailquota", "access_combination", "cos", "editpassword", "spamlevel"):
+            if getattr(args, option) is not None:
+                parser.error("--match only supports --config and --remove-config !")
+        if args.disable or args.enable:
+            parser.error("--match only supports --config and --remove-config !")
+    elif args.userid is None and args.email is None:
         parser.error("User must be specified by either -u or -e !")
 
     ctx = {}
@@ -77,8 +99,11 @@ def main():
     else:
         ctx["name"] = settings.getCreds()["login"] + "_" + args.context_name
 
-    contextService = soapclient.getService("OXResellerContextService")
-    ctx = contextService.getData(ctx, settings.getCreds())
+    ctx = contextcache.resolve(ctx)
+
+    if args.match is not None:
+        changeConfigBulk(ctx, args)
+        return
 
     user = {}
     if args.email is not None:
@@ -173,24 +198,7 @@ def main():
                 for configitem in entry.value.entries:
                     userConfig[configitem.key] = configitem.value
 
-        if args.config:
-            if exists(args.config):
-                fileinput = open(args.config, 'r')
-                lines = fileinput.readlines()
-                for line in lines:
-                    if line.startswith('#') or line.startswith(' '):
-                        continue
-                    line = line.strip()
-                    key, value = line.split('=', 1)
-                    userConfig[key] = value
-                fileinput.close()
-            else:
-                newconfig = kv_pairs(args.config)
-                for configitem in newconfig:
-                    userConfig[configitem] = newconfig[configitem]
-
-        if args.remove_config:
-            userConfig[args.remove_config] = None
+        userConfig.update(readConfig(args))
 
         # write dict back in correct format
         # TODO: handle append case if configFound=False
@@ -223,8 +231,8 @@ def main():
     # apply spamlevel
     if args.spamlevel:
         data = json.loads('{"spamlevel": "'+args.spamlevel+'"}')
-        r = requests.put(settings.getRestHost()+"oxaas/v1/admin/contexts/"+str(
-            ctx.id)+"/users/"+str(user.id)+"/spamlevel", auth=(settings.getRestCreds()), json=data, verify=settings.getVerifyTls())
+        r = restclient.put(settings.getRestHost()+"oxaas/v1/admin/contexts/"+str(
+            ctx.id)+"/users/"+str(user.id)+"/spamlevel", json=data)
         print(r.status_code)
         if r.status_code == 200:
             print("Applied spamlevel ", args.spamlevel,
@@ -233,6 +241,82 @@ def main():
             print("Failed to set requested spamlevel")
 
 
+def changeConfigBulk(ctx, args):
+    """Apply the config changes to all users matching args.match.
+
+    User data is fetched in chunks, users already having the wanted config
+    are skipped and only the differing properties are sent.
+    """
+    wanted = readConfig(args)
+    userService = soapclient.getService("OXResellerUserService", dump=args.dump)
+    users = userService.raw("listCaseInsensitive", ctx, args.match, settings.getCreds(), fields=listuser.ID_FIELDS)
+    log = journal.newJournal(args)
+
+    def key(user):
+        return str(user.id)
+
+    # users done in a previous run are not even fetched again
+    users = list(log.pending(users, key))
+    compliant = 0
+
+    def pending():
+        nonlocal compliant
+        for user in listuser.fetchUsers(ctx, users, userService, args.chunksize, records.User):
+            delta = configDelta(user, wanted)
+            if delta:
+                yield user, delta
+            else:
+                log.finish(key(user))
+                compliant += 1
+
+    def change(item):
+        user, delta = item
+        # userAttributes are merged by the server, a missing value removes the property
+        entries = [{"key": key, "value": value} for key, value in delta.items()]
+        userService.change(ctx, {"id": user.id, "userAttributes": {
+            "entries": [{"key": "config", "value": {"entries": entries}}]}}, settings.getCreds())
+
+    summary = bulk.Summary()
+    for (user, delta), result, error in bulk.imap(change, pending(), args.workers):
+        summary.add(error)
+        log.finish(key(user), error)
+        if error is None:
+            print("Changed user", user.id, user.name, ",".join(sorted(delta)))
+        else:
+            print("FAILED", user.id, user.name, error)
+    log.close()
+    if args.resume:
+        print(log)
+    print("Skipped", compliant, "users already compliant")
+    print(summary)
+
+
+def readConfig(args):
+    """Return the config properties to set, properties to remove map to None."""
+    config = {}
+    if args.config:
+        if exists(args.config):
+            with open(args.config, 'r') as fileinput:
+                for line in fileinput:
+                    if line.startswith('#') or line.startswith(' '):
+                        continue
+                    line = line.strip()
+                    key, value = line.split('=', 1)
+                    config[key] = value
+        else:
+            config.update(kv_pairs(args.config))
+
+    if args.remove_config:
+        config[args.remove_config] = None
+    return config
+
+
+def configDelta(user, wanted):
+    """Return the part of wanted which differs from the user's config."""
+    current = records.config(user.userAttributes)
+    return {key: value for key, value in wanted.items() if current.get(key) != value}
+
+
 def kv_pairs(text, item_sep=r",", value_sep="="):
     split_regex = r"""
         (?P<key>[\w\.\-/]+)=    # Key consists of only alphanumerics and '-' character
@@ -16,25 +16,27 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-from zeep import Client
 import argparse
+import records
 import settings
+import soapclient
 
 def main():
     parser = argparse.ArgumentParser(
         description='Check existance of a contexts for an OX Cloud reseller.')
     parser.add_argument("-s", "--searchpattern", help="The search pattern which is used for listing.")
     parser.add_argument("--long", help="Verbose output (incl. settings).", action="store_true")
+    soapclient.addArguments(parser)
     args = parser.parse_args()
 
-    client = Client(settings.getHost()+"OXResellerContextService?wsdl")
+    client = soapclient.getService("OXResellerContextService")
 
     if args.searchpattern is not None:
         search = "*" + args.searchpattern + "*"
     else:
         search = "*"
 
-    contexts = client.service.list(search, settings.getCreds())
+    contexts = client.raw("list", search, settings.getCreds(), record=records.Context)
 
     if not args.long:
         print ("{:<7} {:<40} {:<10}".format('CID', 'Name', 'maxQuota'))
@@ -46,12 +48,12 @@ def main():
             print("{:<7} {:<40} {:<10}".format(
                 context.id, context.name, str(context.usedQuota) + "/" + str(context.maxQuota)))
 
-            for entries in context.userAttributes.entries:
-                if entries.key == 'config':
-                    print ("Configuration")
-                    for prop in entries.value.entries:
-                        print (prop.key, ":", prop.value)
-                    print ("\n")
+            config = records.config(context.userAttributes)
+            if config:
+                print ("Configuration")
+                for key, value in config.items():
+                    print (key, ":", value)
+                print ("\n")
 
 
 if __name__ == "__main__":
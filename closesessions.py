@@ -17,7 +17,7 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import argparse
-import requests
+import restclient
 import settings
 
 
@@ -40,8 +40,8 @@ def main():
     if args.user is not None:
         params.update = {"userName": args.user}
 
-    r = requests.delete(settings.getRestHost()+"oxaas/v1/admin/sessions/",
-                        params=params, auth=(settings.getRestCreds()), verify=settings.getVerifyTls())
+    r = restclient.delete(settings.getRestHost()+"oxaas/v1/admin/sessions/",
+                          params=params)
     if r.status_code == 200:
         print(r.json())
     else:
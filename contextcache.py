@@ -0,0 +1,94 @@
+# Copyright (C) 2022  OX Software GmbH
+#                     Wolfgang Rosenauer
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from contextlib import contextmanager
+import os
+import settings
+import soapclient
+import sqlite3
+import time
+
+
+class ContextRef(dict):
+    """Context reference ({"id", "name"}) usable in place of a zeep context.
+
+    It can be passed to SOAP operations and supports ctx.id as well as
+    ctx["id"] access.
+    """
+
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name)
+
+
+def connect():
+  path = settings.getContextCache()
+  os.makedirs(os.path.dirname(path), exist_ok=True)
+  conn = sqlite3.connect(path, timeout=30)
+  # contexts are cached per SOAP host and reseller, IDs and names of other environments never match
+  conn.execute("""CREATE TABLE IF NOT EXISTS contextref (scope TEXT, id INTEGER, name TEXT, cached REAL,
+                                                         PRIMARY KEY (scope, id), UNIQUE (scope, name))""")
+  return conn
+
+@contextmanager
+def transaction():
+  """Yield a connection, commit on success and close it afterwards."""
+  conn = connect()
+  try:
+    with conn:
+      yield conn
+  finally:
+    conn.close()
+
+def scope():
+  return settings.getHost() + " " + settings.getCreds()["login"]
+
+def lookup(ctx):
+  """Return the cached ContextRef for ctx or None."""
+  with transaction() as conn:
+    if ctx.get("id") is not None:
+      row = conn.execute("SELECT id, name, cached FROM contextref WHERE scope = ? AND id = ?",
+                         (scope(), ctx["id"])).fetchone()
+    else:
+      row = conn.execute("SELECT id, name, cached FROM contextref WHERE scope = ? AND name = ?",
+                         (scope(), ctx["name"])).fetchone()
+  if row is None or time.time() - row[2] > settings.getContextCacheTtl():
+    return None
+  return ContextRef(id=row[0], name=row[1])
+
+def store(cid, name):
+  with transaction() as conn:
+    conn.execute("DELETE FROM contextref WHERE scope = ? AND (id = ? OR name = ?)", (scope(), cid, name))
+    conn.execute("INSERT INTO contextref VALUES (?, ?, ?, ?)", (scope(), cid, name, time.time()))
+
+def invalidate(cid=None, name=None):
+  with transaction() as conn:
+    conn.execute("DELETE FROM contextref WHERE scope = ? AND (id = ? OR name = ?)", (scope(), cid, name))
+
+def resolve(ctx):
+  """Resolve a {"id": ...} or {"name": ...} context to a ContextRef.
+
+  Only unknown or expired contexts cost a getData round trip.
+  """
+  ref = lookup(ctx)
+  if ref is None:
+    contextService = soapclient.getService("OXResellerContextService")
+    data = contextService.getData(ctx, settings.getCreds())
+    store(data.id, data.name)
+    ref = ContextRef(id=data.id, name=data.name)
+  return ref
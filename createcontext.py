@@ -17,6 +17,9 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import argparse
+import bulk
+import contextcache
+import journal
 import random
 import settings
 import soapclient
@@ -30,21 +33,37 @@ def genPasswd(length=10, chars=string.ascii_letters+string.digits):
 def main():
     parser = argparse.ArgumentParser(
         description='Creates an OX Cloud context.')
-    parser.add_argument("-n", dest="context_name",
-                        required=True, help="Context name to be created.")
+    parser.add_argument("-n", dest="context_name", help="Context name to be created.")
     parser.add_argument("-e", "--email", help="Name/email (optional)")
     parser.add_argument("-p", "--password",
-                        help="Password for the user.", default=genPasswd())
+                        help="Password for the user. (Default: generated)")
     parser.add_argument("-q", "--quota", default=1024,
                         help="Quota of the context in MiB", type=int)
     parser.add_argument("-a", "--access-combination",
                         default="cloud_pim", help="Default access-combination")
     parser.add_argument("--supportcontact",
                         help="Contact information for about dialog")
+    parser.add_argument(
+        "--batch", help="Create all contexts from a CSV or JSONL file. Columns are named like the long options "
+        "and context_name, options given on the command line are used as defaults.")
+    parser.add_argument("-w", "--workers", default=4, type=int,
+                        help="Number of contexts created concurrently in batch mode. (Default: 4)")
+    journal.addArguments(parser, "<batch file>.journal")
+    soapclient.addArguments(parser)
     args = parser.parse_args()
 
+    if args.context_name is None and args.batch is None:
+        parser.error("Context must be specified by either -n or --batch !")
+
     client = soapclient.getService("OXResellerContextService")
 
+    if args.batch is not None:
+        createBatch(client, args)
+        return
+
+    if args.password is None:
+        args.password = genPasswd()
+
     # check if a context with that name already exists
     context = client.list(
         settings.getCreds()["login"] + "_" + args.context_name, settings.getCreds())
@@ -53,20 +72,100 @@ def main():
             print("Context", ctx.name, "already exists:", ctx.id)
         sys.exit(1)
 
-    # create context
+    context = createContext(client, args.context_name, args.quota, args.email, args.password,
+                            args.access_combination, args.supportcontact)
+
+    print("Created context:", context.id, context.name,
+          "with password", args.password, "and quota", args.quota)
+
+
+def createBatch(client, args):
+    """Create the contexts of args.batch which do not exist yet.
+
+    The existing context names are fetched with a single list call, the
+    missing contexts are created concurrently. If a creation fails but the
+    context exists now (created by someone else in the meantime), it counts
+    as success.
+    """
+    from zeep.exceptions import Fault
+
+    prefix = settings.getCreds()["login"] + "_"
+    existing = {ctx.name: ctx.id for ctx in client.raw("list", prefix + "*", settings.getCreds(), fields=("id", "name"))}
+    log = journal.newJournal(args, args.batch + ".journal")
+    queued = set()
+    skipped = 0
+    invalid = 0
+
+    def rowName(row):
+        return (row.get("context_name") or row.get("name") or "").strip()
+
+    def missing():
+        nonlocal skipped, invalid
+        for row in log.pending(bulk.readRows(args.batch), rowName):
+            name = rowName(row)
+            if not name:
+                print("INVALID row without context_name:", row)
+                log.finish(name, "missing context_name")
+                invalid += 1
+            elif prefix + name in existing:
+                print("EXISTS", name, existing[prefix + name])
+                log.finish(name)
+                skipped += 1
+            elif name in queued:
+                # the same name twice in the file is only created once
+                print("DUPLICATE", name, "in the batch file")
+                skipped += 1
+            else:
+                queued.add(name)
+                yield row
+
+    def create(row):
+        name = rowName(row)
+        password = row.get("password") or args.password or genPasswd()
+        try:
+            context = createContext(client, name, int(row.get("quota") or args.quota), row.get("email") or args.email,
+                                    password, row.get("access_combination") or row.get("access-combination")
+                                    or args.access_combination, row.get("supportcontact") or args.supportcontact)
+        except Fault:
+            # created concurrently by another run?
+            if not client.raw("list", prefix + name, settings.getCreds(), fields=("id", "name")):
+                raise
+            return None, None
+        return context, password
+
+    summary = bulk.Summary()
+    for row, result, error in bulk.imap(create, missing(), args.workers):
+        summary.add(error)
+        log.finish(rowName(row), error)
+        if error is not None:
+            print("FAILED", rowName(row), error)
+        elif result[0] is None:
+            print("EXISTS", rowName(row), "(created concurrently)")
+        else:
+            context, password = result
+            print("Created context:", context.id, context.name, "with password", password)
+    log.close()
+    if args.resume:
+        print(log)
+    print("Skipped", skipped, "existing contexts")
+    print(summary)
+    if summary.failed or invalid:
+        sys.exit(1)
+
+
+def createContext(client, contextName, quota, email, password, accessCombination, supportcontact=None):
+    """Create the context brand_contextName with its admin user and return it."""
     newContext = {
-        "name": settings.getCreds()["login"] + "_" + args.context_name,
-        "maxQuota": args.quota
+        "name": settings.getCreds()["login"] + "_" + contextName,
+        "maxQuota": quota
     }
-    if args.email is not None:
-        email = args.email
-    else:
-        email = "admin@"+args.context_name
+    if email is None:
+        email = "admin@"+contextName
     adminUser = {
         "name": email,
-        "password": args.password,
+        "password": password,
         "display_name": "admin",
-        "sur_name": args.context_name,
+        "sur_name": contextName,
         "given_name": "admin",
         "primaryEmail": email,
         "email1": email
@@ -74,11 +173,11 @@ def main():
 
     # we need some userAttributes, e.g. support string and dynamic theme
     # in most cases meanwhile should be set on the reselleradmin
-    if args.supportcontact:
+    if supportcontact:
         supportAttributes = [
             {
                 "key": "com.openexchange.appsuite.servercontact",
-                "value": args.supportcontact
+                "value": supportcontact
             }
         ]
 
@@ -86,10 +185,9 @@ def main():
             {"key": "config", "value": {"entries": supportAttributes}}]}
 
     context = client.createModuleAccessByName(
-        newContext, adminUser, args.access_combination, settings.getCreds())
-
-    print("Created context:", context.id, context.name,
-          "with password", args.password, "and quota", args.quota)
+        newContext, adminUser, accessCombination, settings.getCreds())
+    contextcache.store(context.id, context.name)
+    return context
 
 
 if __name__ == "__main__":
@@ -33,6 +33,7 @@ def main():
                         required=True, help="Reseller name to be created.")
     parser.add_argument("-p", "--password",
                         help="Password for the reseller.", default=genPasswd())
+    soapclient.addArguments(parser)
     args = parser.parse_args()
 
     client = soapclient.getService("OXResellerService")
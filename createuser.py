@@ -17,9 +17,12 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import argparse
+import bulk
+import contextcache
+import journal
 import json
 import re
-import requests
+import restclient
 import settings
 import soapclient
 
@@ -30,22 +33,22 @@ def main():
                         help="Context name the user should be created in.")
     parser.add_argument(
         "-c", "--cid", help="Context ID the user should be created in.", type=int)
-    parser.add_argument("-e", "--email", required=True,
+    parser.add_argument("-e", "--email",
                         help="E-Mail address / login name of the user.")
-    parser.add_argument("-p", "--password", required=True,
+    parser.add_argument("-p", "--password",
                         help="Password for the user.")
-    parser.add_argument("-g", "--firstname", required=True,
+    parser.add_argument("-g", "--firstname",
                         help="First name of the user.")
-    parser.add_argument("-s", "--lastname", required=True,
+    parser.add_argument("-s", "--lastname",
                         help="Last name of the user.")
     parser.add_argument(
         "-l", "--language", help="Initial language of the user. (Default: en_US)", default="en_US")
     parser.add_argument(
         "-t", "--timezone", help="Initial timezone of the user. (Default: Europe/Berlin)", default="Europe/Berlin")
-    parser.add_argument("-q", "--quota", required=True,
+    parser.add_argument("-q", "--quota",
                         help="Quota of the user in MiB (-1 for unlimited)", type=int)
     parser.add_argument("--mailquota", help="Mailquota (if set quota won't be unified; if unset unified quota applies)")
-    parser.add_argument("-a", "--access-combination", required=True,
+    parser.add_argument("-a", "--access-combination",
                         help="Access combination name for the user.")
     parser.add_argument(
         "--cos", help="The Class of Service for that mailbox. If left undefined the access-combination name is used.")
@@ -55,26 +58,115 @@ def main():
         "--spamlevel", help="Specify spamlevel to use for the mailbox (no default). Options 'low', 'medium', and 'high'.")
     parser.add_argument(
         "--config", help="Additional config properties including in format PROPERTY=VALUE")
+    parser.add_argument(
+        "--batch", help="Create all users from a CSV or JSONL file. Columns are named like the long options, "
+        "options given on the command line are used as defaults.")
+    parser.add_argument("-w", "--workers", default=4, type=int,
+                        help="Number of users created concurrently in batch mode. (Default: 4)")
+    journal.addArguments(parser, "<batch file>.journal")
+    soapclient.addArguments(parser)
     args = parser.parse_args()
 
     if args.context_name is None and args.cid is None:
         parser.error("Context must be specified by either -n or -c !")
 
+    if args.batch is None:
+        for option in ("email", "password", "firstname", "lastname", "quota", "access_combination"):
+            if getattr(args, option) is None:
+                parser.error("the following argument is required: --" + option.replace("_", "-"))
+
     ctx = {}
     if args.cid is not None:
         ctx["id"] = args.cid
     else:
         ctx["name"] = settings.getCreds()["login"] + "_" + args.context_name
 
+    ctx = contextcache.resolve(ctx)
+
+    userService = soapclient.getService("OXResellerUserService")
+    oxaasService = soapclient.getService("OXaaSService")
+
+    if args.batch is not None:
+        createBatch(ctx, args, userService, oxaasService)
+        return
+
     if args.cos is None:
         args.cos = args.access_combination
 
-    contextService = soapclient.getService("OXResellerContextService")
-    ctx = contextService.getData(ctx, settings.getCreds())
+    user = createUser(ctx, args, userService, oxaasService)
 
-    userService = soapclient.getService("OXResellerUserService")
-    oxaasService = soapclient.getService("OXaaSService")
+    print("Created user", user.id, "with password", args.password,
+          "in context", ctx.id, "and unified quota", args.quota)
+
+    # apply spamlevel
+    if args.spamlevel:
+        r = applySpamlevel(ctx, user, args.spamlevel)
+        print(r.status_code)
+        if r.status_code == 200:
+            print("Applied spamlevel ", args.spamlevel,
+                  " for ", user.id, "in context", ctx.id)
+        else:
+            print("Failed to set requested spamlevel")
+
+
+def createBatch(ctx, args, userService, oxaasService):
+    from zeep.exceptions import Fault
+
+    defaults = vars(args)
+    log = journal.newJournal(args, args.batch + ".journal")
 
+    def rowKey(row):
+        return row.get("email") or ""
+
+    def create(row):
+        options = argparse.Namespace(**defaults)
+        for key, value in row.items():
+            key = key.replace("-", "_")
+            if value not in (None, "") and key in defaults:
+                setattr(options, key, value)
+        for option in ("email", "password", "firstname", "lastname", "quota", "access_combination"):
+            if getattr(options, option) is None:
+                raise ValueError("missing " + option)
+        options.quota = int(options.quota)
+        options.editpassword = bulk.toBool(options.editpassword)
+        if options.cos is None:
+            options.cos = options.access_combination
+
+        user = None
+        if log.attempted(rowKey(row)):
+            # the previous run may have created the user before it stopped or
+            # failed on a later step, then only the settings following the
+            # creation are applied again
+            try:
+                user = userService.getData(ctx, {"name": options.email}, settings.getCreds())
+            except Fault:
+                pass
+            else:
+                completeUser(ctx, user, options, userService, oxaasService, mailQuota(options))
+        if user is None:
+            user = createUser(ctx, options, userService, oxaasService)
+        if options.spamlevel:
+            r = applySpamlevel(ctx, user, options.spamlevel)
+            if r.status_code != 200:
+                raise RuntimeError("created as " + str(user.id) + " but failed to set requested spamlevel")
+        return user
+
+    summary = bulk.Summary()
+    rows = log.pending(bulk.readRows(args.batch), rowKey)
+    for row, user, error in bulk.imap(create, rows, args.workers):
+        summary.add(error)
+        log.finish(rowKey(row), error)
+        if error is None:
+            print("OK", row.get("email"), user.id)
+        else:
+            print("FAILED", row.get("email"), error)
+    log.close()
+    if args.resume:
+        print(log)
+    print(summary)
+
+
+def createUser(ctx, args, userService, oxaasService):
     # prepare user
     user = {
         "name": args.email,
@@ -116,12 +208,8 @@ def main():
             }]
         )
         if args.quota == -1:
-            dcQuota = 0
             user["maxQuota"] = 1  # to force creation of userfilestore
-        else:
-            dcQuota = args.mailquota
-    else:
-        dcQuota = args.quota
+    dcQuota = mailQuota(args)
 
     userCOS = {
         "key": "cloud",
@@ -136,6 +224,12 @@ def main():
 
     user = userService.createByModuleAccessName(
         ctx, user, args.access_combination, settings.getCreds())
+    completeUser(ctx, user, args, userService, oxaasService, dcQuota)
+    return user
+
+
+def completeUser(ctx, user, args, userService, oxaasService, dcQuota):
+    """Apply the settings following the creation of user, they can be applied again."""
     if args.editpassword:
         user_access = userService.getModuleAccess(
             ctx, user, settings.getCreds())
@@ -145,25 +239,25 @@ def main():
     if args.quota == -1:
         # change maxQuota to -1 finally
         user["maxQuota"] = -1
-        userService.change(ctx, user, settings.getCreds())
+        userService.change(ctx, {"id": user.id, "maxQuota": -1}, settings.getCreds())
 
     oxaasService.setMailQuota(
         ctx.id, user.id, dcQuota, settings.getCreds())
 
-    print("Created user", user.id, "with password", args.password,
-          "in context", ctx.id, "and unified quota", args.quota)
 
-    # apply spamlevel
-    if args.spamlevel:
-        data = json.loads('{"spamlevel": "'+args.spamlevel+'"}')
-        r = requests.put(settings.getRestHost()+"oxaas/v1/admin/contexts/"+str(
-            ctx.id)+"/users/"+str(user.id)+"/spamlevel", auth=(settings.getRestCreds()), json=data, verify=settings.getVerifyTls())
-        print(r.status_code)
-        if r.status_code == 200:
-            print("Applied spamlevel ", args.spamlevel,
-                  " for ", user.id, "in context", ctx.id)
-        else:
-            print("Failed to set requested spamlevel")
+def mailQuota(args):
+    """Return the Dovecot quota for args.quota and args.mailquota."""
+    if args.quota == -1:
+        return 0
+    if args.mailquota is not None:
+        return args.mailquota
+    return args.quota
+
+
+def applySpamlevel(ctx, user, spamlevel):
+    data = json.loads('{"spamlevel": "'+spamlevel+'"}')
+    return restclient.put(settings.getRestHost()+"oxaas/v1/admin/contexts/"+str(
+        ctx.id)+"/users/"+str(user.id)+"/spamlevel", json=data)
 
 
 def kv_pairs(text, item_sep=r",", value_sep="="):
@@ -17,6 +17,7 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import argparse
+import contextcache
 import settings
 import soapclient
 
@@ -29,6 +30,7 @@ def main():
         "-c", "--cid", help="Context ID", type=int)
     parser.add_argument("-d", "--domain", help="Domain for which to delete catch all.")
     parser.add_argument("-u", "--user", help="To be removed recipient user for the catch all.")
+    soapclient.addArguments(parser)
     args = parser.parse_args()
 
     if args.context_name is None and args.cid is None:
@@ -40,8 +42,7 @@ def main():
     else:
         ctx["name"] = settings.getCreds()["login"] + "_" + args.context_name
 
-    contextService = soapclient.getService("OXResellerContextService")
-    ctx = contextService.getData(ctx, settings.getCreds())
+    ctx = contextcache.resolve(ctx)
 
     oxaasService = soapclient.getService("OXaaSService")
 
@@ -17,30 +17,127 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import argparse
+import bulk
+import contextcache
+import journal
 import settings
 import soapclient
+import sys
 
 
 def main():
-    parser = argparse.ArgumentParser(description='Deletes an OX Cloud context.')
+    parser = argparse.ArgumentParser(description='Deletes OX Cloud contexts.')
     parser.add_argument("-n", dest="context_name",
                         help="Context name to be deleted.")
     parser.add_argument(
         "-c", "--cid", help="Context ID to be deleted.", type=int)
+    parser.add_argument("--file", help="File with one context ID or name per line of the contexts to be deleted.")
+    parser.add_argument("-s", "--search", help="Delete all contexts whose name matches this pattern.")
+    parser.add_argument("--dry-run", help="Only list the contexts which would be deleted.", action="store_true")
+    parser.add_argument("-w", "--workers", default=4, type=int,
+                        help="Number of contexts deleted concurrently. (Default: 4)")
+    parser.add_argument("--results", help="Write the result per context as JSON lines to this file.")
+    journal.addArguments(parser, "<file>.journal with --file")
+    soapclient.addArguments(parser)
     args = parser.parse_args()
 
-    if args.context_name is None and args.cid is None:
-        parser.error("Context must be specified by either -n or -c !")
+    if args.context_name is None and args.cid is None and args.file is None and args.search is None:
+        parser.error("Context must be specified by either -n, -c, --file or -s !")
 
     client = soapclient.getService("OXResellerContextService")
 
+    if args.file is None and args.search is None and not args.dry_run:
+        if args.cid is not None:
+            ctx = {"id": args.cid}
+        else:
+            ctx = {"name": settings.getCreds()["login"] + "_" + args.context_name}
+        client.delete(ctx, settings.getCreds())
+        contextcache.invalidate(ctx.get("id"), ctx.get("name"))
+
+        print("Deleted context", args.cid or ctx["name"])
+        return
+
+    prefix = settings.getCreds()["login"] + "_"
+    wanted = []
     if args.cid is not None:
-        ctx = {"id": args.cid}
+        wanted.append(str(args.cid))
+    if args.context_name is not None:
+        wanted.append(args.context_name)
+    if args.file is not None:
+        wanted.extend(bulk.readList(args.file))
+
+    # one list call resolves all names and IDs
+    results = bulk.ResultFile(args.results)
+    if args.dry_run:
+        log = journal.Journal()
     else:
-        ctx = {"name": settings.getCreds()["login"] + "_" + args.context_name}
-    client.delete(ctx, settings.getCreds())
+        log = journal.newJournal(args, args.file + ".journal" if args.file else None)
+    wanted = list(log.pending(wanted, str))
+    contexts = []
+    keys = {}
+    missing = 0
+    if wanted:
+        byKey = {}
+        for ctx in client.list(prefix + "*", settings.getCreds()) or []:
+            byKey[str(ctx.id)] = ctx
+            byKey[ctx.name] = ctx
+        for key in wanted:
+            ctx = byKey.get(key) or byKey.get(prefix + key)
+            if ctx is None and log.interrupted(key):
+                # deleted by the previous run before it stopped
+                print("Deleted context", key, "in the previous run")
+                results.add(id=None, name=key, status="deleted")
+                log.finish(key)
+            elif ctx is None:
+                print("NOT FOUND", key)
+                results.add(id=None, name=key, status="not found")
+                log.finish(key, "not found")
+                missing += 1
+            else:
+                contexts.append(ctx)
+                keys.setdefault(ctx.id, []).append(key)
+    if args.search is not None:
+        for ctx in log.pending(client.list(prefix + args.search, settings.getCreds()) or [], lambda ctx: ctx.name):
+            contexts.append(ctx)
+            keys.setdefault(ctx.id, []).append(ctx.name)
+
+    deleteBulk(client, contexts, args, results, log, keys)
+    if missing:
+        sys.exit(1)
+
+
+def deleteBulk(client, contexts, args, results, log, keys):
+    contexts = list({ctx.id: ctx for ctx in contexts}.values())
+
+    if args.dry_run:
+        for ctx in contexts:
+            print("Would delete context", ctx.id, ctx.name)
+        print(len(contexts), "contexts would be deleted")
+        results.close()
+        return
+
+    def delete(ctx):
+        client.delete({"id": ctx.id}, settings.getCreds())
+        contextcache.invalidate(ctx.id, ctx.name)
 
-    print("Deleted context", args.cid)
+    summary = bulk.Summary()
+    for count, (ctx, result, error) in enumerate(bulk.imap(delete, contexts, args.workers), 1):
+        summary.add(error)
+        for key in keys[ctx.id]:
+            log.finish(key, error)
+        if error is None:
+            print("[{}/{}] Deleted context {} {}".format(count, len(contexts), ctx.id, ctx.name))
+            results.add(id=ctx.id, name=ctx.name, status="deleted")
+        else:
+            print("[{}/{}] FAILED context {} {}: {}".format(count, len(contexts), ctx.id, ctx.name, error))
+            results.add(id=ctx.id, name=ctx.name, status="failed", error=str(error))
+    results.close()
+    log.close()
+    if args.resume:
+        print(log)
+    print(summary)
+    if summary.failed:
+        sys.exit(1)
 
 
 if __name__ == "__main__":
@@ -26,6 +26,7 @@ def main():
         description='Deletes an OX Cloud reseller admin.')
     parser.add_argument("-u", dest="reseller_name",
                         required=True, help="Reseller to be deleted.")
+    soapclient.addArguments(parser)
     args = parser.parse_args()
 
     client = soapclient.getService("OXResellerService")
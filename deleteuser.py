@@ -17,26 +17,41 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import argparse
+import bulk
+import contextcache
+import journal
 import settings
 import soapclient
+import sys
 
 
 def main():
-    parser = argparse.ArgumentParser(description='Deletes an OX Cloud user.')
+    parser = argparse.ArgumentParser(description='Deletes OX Cloud users.')
     parser.add_argument("-n", dest="context_name",
                         help="Context name of the user to be deleted.")
     parser.add_argument(
         "-c", "--cid", help="Context ID the user to be deleted.", type=int)
-    parser.add_argument("-u", "--userid", help="UID of the user to be deleted.")
-    parser.add_argument("-e", "--email", help="E-Mail address / login name of the user.")
+    parser.add_argument("-u", "--userid", type=uidList,
+                        help="UID of the user to be deleted (comma separated for several).")
+    parser.add_argument("-e", "--email", help="E-Mail address / login name of the user (comma separated for several).")
+    parser.add_argument("--file", help="File with one UID or email address per line of the users to be deleted.")
+    parser.add_argument("-s", "--search", help="Delete all users whose name matches this pattern.")
     parser.add_argument("--reassign", help="Which userid to reassign shared data. Default=none")
+    parser.add_argument("--dry-run", help="Only list the users which would be deleted.", action="store_true")
+    parser.add_argument("-w", "--workers", default=4, type=int,
+                        help="Number of users deleted concurrently. (Default: 4)")
+    parser.add_argument("--chunksize", default=100, type=int,
+                        help="Look up users in chunks of this many users. (Default: 100)")
+    parser.add_argument("--results", help="Write the result per user as JSON lines to this file.")
+    journal.addArguments(parser, "<file>.journal with --file")
+    soapclient.addArguments(parser)
     args = parser.parse_args()
 
     if args.context_name is None and args.cid is None:
         parser.error("Context must be specified by either -n or -c !")
 
-    if args.userid is None and args.email is None:
-        parser.error("User must be specified by either -u or -e !")
+    if args.userid is None and args.email is None and args.file is None and args.search is None:
+        parser.error("User must be specified by either -u, -e, --file or -s !")
 
     ctx = {}
     if args.cid is not None:
@@ -44,25 +59,137 @@ def main():
     else:
         ctx["name"] = settings.getCreds()["login"] + "_" + args.context_name
 
-    contextService = soapclient.getService("OXResellerContextService")
-    ctx = contextService.getData(ctx, settings.getCreds())
+    ctx = contextcache.resolve(ctx)
 
     userService = soapclient.getService("OXResellerUserService")
-    user = {}
     if args.reassign is not None:
         reassign = args.reassign
     else:
         reassign = 0
-    if args.userid is not None:
-        user["id"] = args.userid
-        user = userService.delete(ctx, user, settings.getCreds(), reassign)
 
-    if args.userid is None:
-        user["name"] = args.email
-        user = userService.getData(ctx, user, settings.getCreds())
-        user = userService.delete(ctx, user, settings.getCreds(), reassign)
+    bulkMode = args.file is not None or args.search is not None or args.dry_run or \
+        len(args.userid or []) > 1 or "," in (args.email or "") or (args.userid is not None and args.email is not None)
+    if not bulkMode:
+        # the server resolves the login name itself, no getData needed
+        if args.userid is not None:
+            user = {"id": args.userid[0]}
+        else:
+            user = {"name": args.email}
+        userService.delete(ctx, user, settings.getCreds(), reassign)
+        print("Deleted user", user.get("id") or args.email, "from context", ctx.id)
+        return
 
-    print("Deleted user", args.userid, "from context", ctx.id)
+    refs = [{"id": uid} for uid in args.userid or []]
+    for value in (args.email or "").split(","):
+        if value.strip():
+            refs.append({"name": value.strip()})
+    if args.file is not None:
+        for line in bulk.readList(args.file):
+            refs.append({"id": int(line)} if line.isdigit() else {"name": line})
+    if args.search is not None:
+        # the context admin cannot be deleted
+        refs.extend({"id": user.id} for user in userService.listCaseInsensitive(
+            ctx, args.search, settings.getCreds()) or [] if user.id != 2)
+
+    deleteBulk(ctx, refs, args, userService, reassign)
+
+
+def uidList(value):
+    """Parse the comma separated UIDs of -u."""
+    try:
+        uids = [int(uid) for uid in value.split(",") if uid.strip()]
+    except ValueError:
+        uids = []
+    if not uids:
+        raise argparse.ArgumentTypeError("expected numeric UIDs, comma separated: " + value)
+    return uids
+
+
+def deleteBulk(ctx, refs, args, userService, reassign):
+    results = bulk.ResultFile(args.results)
+    if args.dry_run:
+        log = journal.Journal()
+    else:
+        log = journal.newJournal(args, args.file + ".journal" if args.file else None)
+
+    def key(ref):
+        return str(ref.get("id") or ref.get("name"))
+
+    users = []
+    keys = {}
+    failed = 0
+    for ref, user in resolveUsers(ctx, list(log.pending(refs, key)), userService, args.chunksize):
+        if user is None and log.interrupted(key(ref)):
+            # deleted by the previous run before it stopped
+            print("Deleted user", key(ref), "in the previous run")
+            results.add(id=ref.get("id"), name=ref.get("name"), status="deleted")
+            log.finish(key(ref))
+        elif user is None:
+            print("NOT FOUND", key(ref))
+            results.add(id=ref.get("id"), name=ref.get("name"), status="not found")
+            log.finish(key(ref), "not found")
+            failed += 1
+        elif user.id not in keys:
+            keys[user.id] = [key(ref)]
+            users.append(user)
+        else:
+            keys[user.id].append(key(ref))
+
+    if args.dry_run:
+        for user in users:
+            print("Would delete user", user.id, user.name, "from context", ctx.id)
+        print(len(users), "users would be deleted")
+        results.close()
+        return
+
+    def delete(user):
+        userService.delete(ctx, {"id": user.id}, settings.getCreds(), reassign)
+
+    summary = bulk.Summary()
+    for count, (user, result, error) in enumerate(bulk.imap(delete, users, args.workers), 1):
+        summary.add(error)
+        for ref in keys[user.id]:
+            log.finish(ref, error)
+        if error is None:
+            print("[{}/{}] Deleted user {} {}".format(count, len(users), user.id, user.name))
+            results.add(id=user.id, name=user.name, status="deleted")
+        else:
+            print("[{}/{}] FAILED user {} {}: {}".format(count, len(users), user.id, user.name, error))
+            results.add(id=user.id, name=user.name, status="failed", error=str(error))
+    results.close()
+    log.close()
+    if args.resume:
+        print(log)
+    print(summary)
+    if summary.failed or failed:
+        sys.exit(1)
+
+
+def resolveUsers(ctx, refs, userService, chunksize=100):
+    """Yield (ref, user) for the user references, user is None if it does not exist.
+
+    Users are looked up in chunks with getMultipleData, only a chunk
+    containing unknown users is looked up user by user.
+    """
+    from zeep.exceptions import Fault
+
+    def fetch(chunk):
+        try:
+            return list(zip(chunk, userService.getMultipleData(ctx, chunk, settings.getCreds())))
+        except Fault:
+            found = []
+            for ref in chunk:
+                try:
+                    found.append((ref, userService.getData(ctx, ref, settings.getCreds())))
+                except Fault:
+                    found.append((ref, None))
+            return found
+
+    chunks = (refs[i:i + chunksize] for i in range(0, len(refs), chunksize))
+    for chunk, result, error in bulk.imap(fetch, chunks, 2):
+        if error is not None:
+            raise error
+        yield from result
 
 
 if __name__ == "__main__":
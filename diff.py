@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+
+# Copyright (C) 2022  OX Software GmbH
+#                     Wolfgang Rosenauer
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import argparse
+import gzip
+import hashlib
+import itertools
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+
+TYPES = ("reseller", "context", "user", "forwarder", "catchall")
+
+# entries compared per index lookup
+BATCH = 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Show what changed between two snapshots (see snapshot.py).')
+    parser.add_argument("old", help="Older snapshot archive.")
+    parser.add_argument("new", help="Newer snapshot archive.")
+    parser.add_argument("--format", choices=["text", "jsonl"], default="text",
+                        help="Output format. (Default: text)")
+    parser.add_argument("-o", "--output", help="Write the differences to this file instead of stdout.")
+    parser.add_argument("-t", "--type", action="append", choices=TYPES,
+                        help="Only compare entries of this type, can be given multiple times. (Default: all)")
+    parser.add_argument("--ignore", action="append",
+                        help="Ignore changes of this field, can be given multiple times. (Default: usedQuota)")
+    parser.add_argument("--tmpdir", help="Directory for the temporary index of the old snapshot. (Default: system temp dir)")
+    args = parser.parse_args()
+
+    ignore = set(args.ignore or ["usedQuota"])
+    types = set(args.type or TYPES)
+    output = open(args.output, "w") if args.output else sys.stdout
+    write = writeJson if args.format == "jsonl" else writeText
+    counts = {"added": 0, "removed": 0, "changed": 0}
+
+    with tempfile.TemporaryDirectory(dir=args.tmpdir) as tmpdir:
+        conn = buildIndex(os.path.join(tmpdir, "index.db"), entries(args.old, types, ignore))
+        for change in compare(conn, entries(args.new, types, ignore)):
+            counts[change["change"]] += 1
+            write(output, change)
+        conn.close()
+
+    if output is not sys.stdout:
+        output.close()
+    print("{added} added, {removed} removed, {changed} changed".format(**counts),
+          file=sys.stderr if args.format == "jsonl" and not args.output else sys.stdout)
+
+
+def openArchive(path):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt")
+    return open(path)
+
+
+def entries(path, types, ignore):
+    """Yield (key, type, label, fields) for the entries of a snapshot.
+
+    fields is a flat dict path -> value, forwarders and catchalls are split
+    up into one entry per alias or address.
+    """
+    with openArchive(path) as archive:
+        for line in archive:
+            record = json.loads(line)
+            kind = record["type"]
+            if kind == "reseller" and "reseller" in types:
+                yield "reseller", kind, record["data"].get("name"), flatten(record["data"], ignore)
+            elif kind == "context" and "context" in types:
+                yield ("context/%d" % record["id"], kind, record["data"].get("name"),
+                       flatten(record["data"], ignore))
+            elif kind == "user" and "user" in types:
+                fields = flatten(record.get("details", {}), ignore, "details.", flatten(record["data"], ignore))
+                yield "user/%d/%d" % (record["cid"], record["id"]), kind, record["data"].get("name"), fields
+            elif kind == "forwarders" and "forwarder" in types:
+                for alias, targets in record["data"].items():
+                    yield "forwarder/%d/%s" % (record["cid"], alias), "forwarder", alias, {"targets": targets}
+            elif kind == "catchalls" and "catchall" in types:
+                for address in record["data"]:
+                    yield "catchall/%d/%s" % (record["cid"], address), "catchall", address, {}
+
+
+def flatten(data, ignore, prefix="", fields=None):
+    """Return data as flat dict path -> value, userAttributes become <namespace>:<key>."""
+    fields = {} if fields is None else fields
+    for name, value in data.items():
+        if name in ignore:
+            continue
+        if type(value) is not dict:
+            fields[prefix + name] = value
+        elif name == "userAttributes":
+            for namespace, values in value.items():
+                for key, item in (values or {}).items():
+                    if namespace + ":" + key not in ignore:
+                        fields[namespace + ":" + key] = item
+        else:
+            flatten(value, ignore, prefix + name + ".", fields)
+    return fields
+
+
+def encode(fields):
+    return json.dumps(fields, sort_keys=True)
+
+
+def digest(text):
+    return hashlib.sha1(text.encode()).digest()
+
+
+def buildIndex(path, items):
+    """Write the entries of the old snapshot to an SQLite index keyed by entry."""
+    conn = sqlite3.connect(path)
+    # a throwaway file, no need to survive a crash
+    conn.execute("PRAGMA journal_mode = OFF")
+    conn.execute("PRAGMA synchronous = OFF")
+    conn.execute("""CREATE TABLE entry (key TEXT PRIMARY KEY, type TEXT, label TEXT,
+                                        hash BLOB, fields TEXT)""")
+    rows = ((key, kind, label, digest(text), text) for key, kind, label, text in
+            ((key, kind, label, encode(fields)) for key, kind, label, fields in items))
+    while True:
+        chunk = list(itertools.islice(rows, BATCH * 10))
+        if not chunk:
+            break
+        conn.executemany("INSERT OR REPLACE INTO entry VALUES (?, ?, ?, ?, ?)", chunk)
+    conn.commit()
+    return conn
+
+
+def compare(conn, items):
+    """Yield the changes of items against the index, the removed entries last.
+
+    Entries of the new snapshot are looked up by key in batches, the fields
+    of the old entry are only loaded when the hashes differ. Matched entries
+    are deleted from the index, whatever is left has been removed.
+    """
+    while True:
+        chunk = list(itertools.islice(items, BATCH))
+        if not chunk:
+            break
+        keys = [item[0] for item in chunk]
+        old = dict(conn.execute(
+            "SELECT key, hash FROM entry WHERE key IN (%s)" % ",".join("?" * len(keys)), keys))
+        for key, kind, label, fields in chunk:
+            if key not in old:
+                yield change("added", key, kind, label, fields=fields)
+            elif old[key] != digest(encode(fields)):
+                previous = json.loads(conn.execute("SELECT fields FROM entry WHERE key = ?", (key,)).fetchone()[0])
+                yield change("changed", key, kind, label, changes=changes(previous, fields))
+        conn.executemany("DELETE FROM entry WHERE key = ?", ((key,) for key in old))
+    for key, kind, label, fields in conn.execute("SELECT key, type, label, fields FROM entry ORDER BY rowid"):
+        yield change("removed", key, kind, label, fields=json.loads(fields))
+
+
+def change(kind, key, entryType, label, fields=None, changes=None):
+    result = {"change": kind, "type": entryType, "key": key, "label": label}
+    if fields is not None:
+        result["fields"] = fields
+    if changes is not None:
+        result["changes"] = changes
+    return result
+
+
+def changes(old, new):
+    """Return path -> [old, new] for the fields that differ, None for missing ones."""
+    return {path: [old.get(path), new.get(path)]
+            for path in sorted(old.keys() | new.keys()) if old.get(path) != new.get(path)}
+
+
+def writeJson(output, change):
+    output.write(json.dumps(change) + "\n")
+
+
+def writeText(output, change):
+    marker = {"added": "+", "removed": "-", "changed": "~"}[change["change"]]
+    line = "{} {:<9} {:<30} {}".format(marker, change["type"], change["key"], change["label"] or "")
+    if change["change"] == "changed":
+        line += ": " + ", ".join("{} {} -> {}".format(path, json.dumps(old), json.dumps(new))
+                                 for path, (old, new) in change["changes"].items())
+    output.write(line + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -17,8 +17,13 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import argparse
-import requests
+import bulk
+import csv
+import json
+import re
+import restclient
 import settings
+import sys
 
 
 def main():
@@ -59,6 +64,26 @@ def main():
     parser_list.add_argument(
         "-c", "--context", help="Context id or name", required=True)
     parser_list.set_defaults(func=list)
+
+    parser_import = subparsers.add_parser("import", help="Import forwarders from a CSV file")
+    parser_import.add_argument(
+        "-c", "--context", help="Context ID or name", required=True)
+    parser_import.add_argument(
+        "-f", "--file", help="CSV file with the alias in the first column and the target(s) in the next ones "
+        "(several targets in one column separated by ';').", required=True)
+    parser_import.add_argument(
+        "--delete", help="Delete forwarders missing in the file.", default=False, action='store_true')
+    parser_import.add_argument("-w", "--workers", default=8, type=int,
+                               help="Number of forwarders changed concurrently. (Default: 8)")
+    parser_import.set_defaults(func=importForwards)
+
+    parser_export = subparsers.add_parser("export", help="Export forwarders as CSV or JSONL")
+    parser_export.add_argument(
+        "-c", "--context", help="Context ID or name", required=True)
+    parser_export.add_argument("--format", choices=["csv", "jsonl"], default="csv",
+                               help="Output format. (Default: csv)")
+    parser_export.add_argument("-o", "--output", help="Write to this file instead of stdout.")
+    parser_export.set_defaults(func=exportForwards)
     args = parser.parse_args()
 
     try:
@@ -71,8 +96,8 @@ def main():
 
 def create(args):
     data = args.target.split(",")
-    r = requests.post(settings.getRestHost()+"api/oxaas/v1/admin/forwards/"+str(
-        args.context)+"/"+str(args.alias), auth=(settings.getRestCreds()), json=data, verify=settings.getVerifyTls())
+    r = restclient.post(settings.getRestHost()+"api/oxaas/v1/admin/forwards/"+str(
+        args.context)+"/"+str(args.alias), json=data)
     if r.status_code == 201:
         print("Created forwarder", args.alias,
               "to", args.target, "in context", args.context)
@@ -85,8 +110,8 @@ def create(args):
 
 def update_target(args):
     data = args.target.split(",")
-    r = requests.post(settings.getRestHost()+"api/oxaas/v1/admin/forwards/"+str(
-        args.context)+"/"+str(args.alias), auth=(settings.getRestCreds()), json=data, verify=settings.getVerifyTls())
+    r = restclient.post(settings.getRestHost()+"api/oxaas/v1/admin/forwards/"+str(
+        args.context)+"/"+str(args.alias), json=data)
     if r.status_code == 201:
         print("Updated forwarder", args.alias,
               "to", args.target, "in context", args.context)
@@ -96,12 +121,10 @@ def update_target(args):
 
 def delete(args):
     if args.alias is not None:
-        r = requests.delete(settings.getRestHost()+"api/oxaas/v1/admin/forwards/"+str(args.context)+"/"+str(args.alias),
-                            auth=(settings.getRestCreds()), verify=settings.getVerifyTls())
+        r = restclient.delete(settings.getRestHost()+"api/oxaas/v1/admin/forwards/"+str(args.context)+"/"+str(args.alias))
     else:
         if args.all:
-            r = requests.delete(settings.getRestHost()+"api/oxaas/v1/admin/forwards/"+str(args.context),
-                                auth=(settings.getRestCreds()), verify=settings.getVerifyTls())
+            r = restclient.delete(settings.getRestHost()+"api/oxaas/v1/admin/forwards/"+str(args.context))
     if r.ok:
         if args.all:
             print("Deleted all forwarders from context")
@@ -111,9 +134,88 @@ def delete(args):
         r.raise_for_status()
 
 
+def listForwards(context):
+    """Return the forwarders of context as dict alias -> sorted targets."""
+    r = restclient.get(settings.getRestHost()+"api/oxaas/v1/admin/forwards/"+str(context))
+    r.raise_for_status()
+    return {entry["alias"]: sorted(entry["targets"]) for entry in r.json()}
+
+
+def readForwards(path):
+    """Return alias -> sorted targets from a CSV file, rows of the same alias are merged.
+
+    A header line is skipped, aliases without any target map to an empty list.
+    """
+    forwards = {}
+    with open(path, newline='') as fileinput:
+        for row in csv.reader(fileinput):
+            if not row or not row[0].strip() or row[0].startswith('#') or row[0].strip().lower() == "alias":
+                continue
+            targets = forwards.setdefault(row[0].strip(), set())
+            targets.update(t for field in row[1:] for t in re.split(r"[,;\s]+", field) if t)
+    return {alias: sorted(targets) for alias, targets in forwards.items()}
+
+
+def importForwards(args):
+    current = listForwards(args.context)
+    wanted = readForwards(args.file)
+    unchanged = 0
+    invalid = 0
+
+    def changes():
+        nonlocal unchanged, invalid
+        for alias, targets in wanted.items():
+            if not targets:
+                print("INVALID forwarder", alias, "without targets, skipped")
+                invalid += 1
+            elif current.get(alias) != targets:
+                yield "POST", alias, targets
+            else:
+                unchanged += 1
+        if args.delete:
+            for alias in sorted(set(current) - set(wanted)):
+                yield "DELETE", alias, None
+
+    def apply(change):
+        method, alias, targets = change
+        url = settings.getRestHost()+"api/oxaas/v1/admin/forwards/"+str(args.context)+"/"+alias
+        if method == "POST":
+            r = restclient.post(url, json=targets)
+        else:
+            r = restclient.delete(url)
+        r.raise_for_status()
+
+    summary = bulk.Summary()
+    for (method, alias, targets), result, error in bulk.imap(apply, changes(), args.workers):
+        summary.add(error)
+        action = "Deleted" if method == "DELETE" else "Updated" if alias in current else "Created"
+        if error is None:
+            print(action, "forwarder", alias, *(["to", ",".join(targets)] if targets else []))
+        else:
+            print("FAILED", action.lower(), "forwarder", alias, error)
+    print("Skipped", unchanged, "unchanged forwarders")
+    print(summary)
+    if summary.failed or invalid:
+        sys.exit(1)
+
+
+def exportForwards(args):
+    output = open(args.output, "w", newline='') if args.output else sys.stdout
+    forwards = listForwards(args.context)
+    if args.format == "csv":
+        writer = csv.writer(output)
+        writer.writerow(["alias", "targets"])
+        for alias, targets in sorted(forwards.items()):
+            writer.writerow([alias, ";".join(targets)])
+    else:
+        for alias, targets in sorted(forwards.items()):
+            output.write(json.dumps({"alias": alias, "targets": targets}) + "\n")
+    if args.output:
+        output.close()
+
+
 def list(args):
-    r = requests.get(settings.getRestHost()+"api/oxaas/v1/admin/forwards/"+str(args.context),
-                     auth=(settings.getRestCreds()), verify=settings.getVerifyTls())
+    r = restclient.get(settings.getRestHost()+"api/oxaas/v1/admin/forwards/"+str(args.context))
     print(r.json())
 
 
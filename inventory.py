@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+
+# Copyright (C) 2022  OX Software GmbH
+#                     Wolfgang Rosenauer
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import argparse
+import bulk
+import hashlib
+import json
+import os
+import records
+import settings
+import soapclient
+import sqlite3
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS contexts (
+  id INTEGER PRIMARY KEY,
+  name TEXT NOT NULL,
+  maxQuota INTEGER,
+  usedQuota INTEGER,
+  enabled INTEGER,
+  config TEXT,
+  fingerprint TEXT,
+  synced REAL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS contexts_name ON contexts (name);
+CREATE TABLE IF NOT EXISTS users (
+  cid INTEGER NOT NULL,
+  id INTEGER NOT NULL,
+  name TEXT,
+  primaryEmail TEXT,
+  usedQuota INTEGER,
+  maxQuota INTEGER,
+  mailenabled INTEGER,
+  aliases TEXT,
+  config TEXT,
+  PRIMARY KEY (cid, id)
+);
+CREATE INDEX IF NOT EXISTS users_name ON users (name);
+CREATE INDEX IF NOT EXISTS users_primaryEmail ON users (primaryEmail);
+CREATE TABLE IF NOT EXISTS catchalls (
+  cid INTEGER NOT NULL,
+  catchall TEXT
+);
+CREATE INDEX IF NOT EXISTS catchalls_cid ON catchalls (cid);
+"""
+
+
+def connect():
+    path = settings.getInventory()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.executescript(SCHEMA)
+    return conn
+
+def attributes(userAttributes, key="config"):
+    """Return the key/value map stored under key in userAttributes."""
+    return records.config(userAttributes, key)
+
+def fingerprint(ctx):
+    summary = [ctx.id, ctx.name, ctx.maxQuota, ctx.usedQuota, getattr(ctx, "enabled", None),
+                          attributes(ctx.userAttributes)]
+    return hashlib.sha1(json.dumps(summary, sort_keys=True, default=str).encode()).hexdigest()
+
+def pattern(search):
+    """Turn a * wildcard search pattern into a LIKE pattern."""
+    return search.replace("%", "\\%").replace("_", "\\_").replace("*", "%")
+
+def getContext(conn, ctx):
+    if ctx.get("id") is not None:
+        row = conn.execute("SELECT * FROM contexts WHERE id = ?", (ctx["id"],)).fetchone()
+    else:
+        row = conn.execute("SELECT * FROM contexts WHERE name = ?", (ctx["name"],)).fetchone()
+    if row is None:
+        raise LookupError("Context " + str(ctx.get("id") or ctx.get("name")) + " not in inventory, run inventory.py sync")
+    return row
+
+def listContexts(conn, search="*"):
+    return conn.execute("SELECT * FROM contexts WHERE name LIKE ? ESCAPE '\\' ORDER BY id", (pattern(search),))
+
+def listUsers(conn, cid, search="*"):
+    return conn.execute("SELECT * FROM users WHERE cid = ? AND name LIKE ? ESCAPE '\\' ORDER BY id",
+                                            (cid, pattern(search)))
+
+def listCatchalls(conn, cid):
+    return [row["catchall"] for row in conn.execute("SELECT catchall FROM catchalls WHERE cid = ?", (cid,))]
+
+def fetchContext(ctx, chunksize=500):
+    """Fetch users and catchalls of ctx from the API."""
+    userService = soapclient.getService("OXResellerUserService")
+    oxaasService = soapclient.getService("OXaaSService")
+    ids = userService.raw("listAll", ctx.ref(), settings.getCreds(), True, fields=("id", "name"))
+    users = []
+    for i in range(0, len(ids), chunksize):
+        users.extend(userService.raw("getMultipleData", ctx.ref(), ids[i:i + chunksize], settings.getCreds(),
+                                     record=records.User))
+    catchalls = oxaasService.listDomainCatchalls(ctx.id, settings.getCreds()) or []
+    return users, catchalls
+
+def storeContext(conn, ctx, users, catchalls):
+    conn.execute("DELETE FROM users WHERE cid = ?", (ctx.id,))
+    conn.execute("DELETE FROM catchalls WHERE cid = ?", (ctx.id,))
+    conn.executemany("INSERT INTO users VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", [
+        (ctx.id, user.id, user.name, user.primaryEmail, user.usedQuota, user.maxQuota,
+            user.mailenabled, json.dumps(list(user.aliases or [])), json.dumps(attributes(user.userAttributes)))
+        for user in users])
+    conn.executemany("INSERT INTO catchalls VALUES (?, ?)", [(ctx.id, str(c)) for c in catchalls])
+    conn.execute("INSERT OR REPLACE INTO contexts VALUES (?, ?, ?, ?, ?, ?, ?, ?)", (
+        ctx.id, ctx.name, ctx.maxQuota, ctx.usedQuota, getattr(ctx, "enabled", None),
+        json.dumps(attributes(ctx.userAttributes)), fingerprint(ctx), time.time()))
+
+def sync(conn, full=False, workers=4):
+    """Refresh the inventory, only contexts whose summary changed are fetched again."""
+    contextService = soapclient.getService("OXResellerContextService")
+    contexts = contextService.raw("list", "*", settings.getCreds(), record=records.Context)
+
+    known = {row["id"]: row["fingerprint"] for row in conn.execute("SELECT id, fingerprint FROM contexts")}
+    current = set(ctx.id for ctx in contexts)
+    for cid in set(known) - current:
+        conn.execute("DELETE FROM contexts WHERE id = ?", (cid,))
+        conn.execute("DELETE FROM users WHERE cid = ?", (cid,))
+        conn.execute("DELETE FROM catchalls WHERE cid = ?", (cid,))
+    conn.commit()
+
+    changed = [ctx for ctx in contexts if full or known.get(ctx.id) != fingerprint(ctx)]
+    summary = bulk.Summary()
+    for ctx, result, error in bulk.imap(fetchContext, changed, workers):
+        summary.add(error)
+        if error is not None:
+            print("Failed to sync context", ctx.id, error)
+            continue
+        users, catchalls = result
+        storeContext(conn, ctx, users, catchalls)
+        conn.commit()
+    print("Synced", len(changed), "of", len(contexts), "contexts,", len(set(known) - current), "removed")
+    print(summary)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Manage the local inventory of contexts and users.')
+    subparsers = parser.add_subparsers(title="subcommands",
+                                       description="valid subcommands",
+                                       required=True,
+                                       help="Subcommand help")
+    parser_sync = subparsers.add_parser("sync", help="Synchronize the inventory with OX Cloud")
+    parser_sync.add_argument(
+        "--full", help="Refetch all contexts, not only changed ones.", action="store_true")
+    parser_sync.add_argument("-w", "--workers", default=4, type=int,
+                             help="Number of contexts fetched concurrently. (Default: 4)")
+    parser_sync.set_defaults(func=syncCommand)
+
+    parser_stats = subparsers.add_parser("stats", help="Show inventory statistics")
+    parser_stats.add_argument("--over", type=int, default=90,
+                              help="List contexts using more than this percentage of their quota. (Default: 90)")
+    parser_stats.set_defaults(func=stats)
+    args = parser.parse_args()
+
+    args.func(args)
+
+
+def syncCommand(args):
+    conn = connect()
+    sync(conn, args.full, args.workers)
+    conn.close()
+
+
+def stats(args):
+    conn = connect()
+    contexts, users, synced = conn.execute(
+        "SELECT COUNT(*), (SELECT COUNT(*) FROM users), MIN(synced) FROM contexts").fetchone()
+    print("Contexts:", contexts)
+    print("Users:", users)
+    if synced is not None:
+        print("Oldest sync:", time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(synced)))
+    print("\nContexts over", str(args.over) + "% quota:")
+    for row in conn.execute("SELECT * FROM contexts WHERE maxQuota > 0 AND usedQuota * 100 > maxQuota * ? ORDER BY id",
+                            (args.over,)):
+        print("{:<7} {:<40} {:<10}".format(row["id"], row["name"], str(row["usedQuota"]) + "/" + str(row["maxQuota"])))
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
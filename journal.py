@@ -0,0 +1,165 @@
+# Copyright (C) 2022  OX Software GmbH
+#                     Wolfgang Rosenauer
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Checkpoint journal for the bulk modes of the tools.
+
+Every item of a bulk run is appended to the journal when it is started
+and when it is done or failed. A run with --resume skips the items which
+are done according to the journal and only retries failed or interrupted
+ones.
+"""
+
+import atexit
+import json
+import os
+import threading
+import time
+
+STARTED = "started"
+DONE = "done"
+FAILED = "failed"
+
+# started records are fsynced before their items are dispatched, in batches of
+# SYNC_RECORDS; outcomes are fsynced after SYNC_RECORDS records or SYNC_INTERVAL
+# seconds, items done since the last sync count as interrupted after a crash
+SYNC_RECORDS = 200
+SYNC_INTERVAL = 1.0
+
+
+class Journal:
+    """Append-only log of the items of a bulk run, does nothing without a path.
+
+    Items are identified by a string key. The records are JSON lines and
+    buffered, they are written and fsynced in batches.
+    """
+
+    def __init__(self, path=None, resume=False):
+        self.path = path
+        self.states = {}
+        self.skipped = 0
+        self.lock = threading.Lock()
+        self.buffer = []
+        self.synced = time.time()
+        self.file = None
+        if path is None:
+            return
+        if resume and os.path.exists(path):
+            self.states = readStates(path)
+        self.file = open(path, "a")
+        # an interrupted run (e.g. Ctrl-C) still writes what it buffered
+        atexit.register(self.close)
+
+    def completed(self, key):
+        """Return True if key was done in a previous run."""
+        return self.states.get(key) == DONE
+
+    def interrupted(self, key):
+        """Return True if key was started but not finished in a previous run."""
+        return self.states.get(key) == STARTED
+
+    def attempted(self, key):
+        """Return True if key was started in a previous run and not done, whether it failed or not."""
+        return self.states.get(key) in (STARTED, FAILED)
+
+    def pending(self, items, key):
+        """Yield the items not completed in a previous run, recording them as started.
+
+        key(item) returns the journal key of an item. Items are read ahead in
+        batches whose started records are fsynced before the first of them is
+        yielded, so every item dispatched is known to the journal after a crash.
+        """
+        items = iter(items)
+        while True:
+            batch = []
+            for item in items:
+                if self.completed(key(item)):
+                    self.skipped += 1
+                    continue
+                batch.append(item)
+                if len(batch) >= SYNC_RECORDS:
+                    break
+            if not batch:
+                return
+            for item in batch:
+                self.start(key(item), sync=False)
+            if self.file is not None:
+                with self.lock:
+                    self.sync()
+            yield from batch
+
+    def start(self, key, sync=True):
+        self.write({"key": key, "state": STARTED}, sync)
+
+    def finish(self, key, error=None):
+        if error is None:
+            self.write({"key": key, "state": DONE})
+        else:
+            self.write({"key": key, "state": FAILED, "error": str(error)})
+
+    def write(self, record, sync=True):
+        if self.file is None:
+            return
+        record["time"] = round(time.time(), 3)
+        with self.lock:
+            self.buffer.append(json.dumps(record) + "\n")
+            if sync and (len(self.buffer) >= SYNC_RECORDS or time.time() - self.synced >= SYNC_INTERVAL):
+                self.sync()
+
+    def sync(self):
+        if self.buffer:
+            self.file.write("".join(self.buffer))
+            self.buffer = []
+            self.file.flush()
+            os.fsync(self.file.fileno())
+        self.synced = time.time()
+
+    def close(self):
+        if self.file is None:
+            return
+        with self.lock:
+            self.sync()
+        self.file.close()
+        self.file = None
+
+    def __str__(self):
+        return "Skipped {} items done in a previous run (journal {})".format(self.skipped, self.path)
+
+
+def readStates(path):
+  """Return key -> last state of the journal at path, a torn last line is ignored."""
+  states = {}
+  with open(path) as fileinput:
+    for line in fileinput:
+      try:
+        record = json.loads(line)
+      except ValueError:
+        continue
+      states[record["key"]] = record["state"]
+  return states
+
+def addArguments(parser, default=None):
+  """Add --journal and --resume, default describes the default journal in the help."""
+  parser.add_argument("--journal", help="Record the progress of the run in this file. (Default: {})".format(
+    default or "no journal"))
+  parser.add_argument("--resume", action="store_true",
+                      help="Skip the items done according to the journal, retry failed and interrupted ones.")
+
+def newJournal(args, default=None):
+  """Return the Journal selected by --journal (or default) and --resume."""
+  path = args.journal or default
+  if args.resume and path is None:
+    raise SystemExit("--resume needs a journal, use --journal")
+  return Journal(path, args.resume)
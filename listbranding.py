@@ -16,11 +16,17 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import argparse
 import settings
 import soapclient
 
 
 def main():
+    parser = argparse.ArgumentParser(
+        description='Lists global reseller settings.')
+    soapclient.addArguments(parser)
+    parser.parse_args()
+
     resellerService = soapclient.getService("OXResellerService")
 
     admin = {
@@ -17,6 +17,8 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import argparse
+import contextcache
+import inventory
 import settings
 import soapclient
 
@@ -27,6 +29,8 @@ def main():
                         help="Context name to list.")
     parser.add_argument(
         "-c", "--cid", help="Context ID to list.", type=int)
+    parser.add_argument("--offline", help="Answer from the local inventory (see inventory.py sync).", action="store_true")
+    soapclient.addArguments(parser)
     args = parser.parse_args()
 
     if args.context_name is None and args.cid is None:
@@ -38,8 +42,13 @@ def main():
     else:
         ctx["name"] = settings.getCreds()["login"] + "_" + args.context_name
 
-    contextService = soapclient.getService("OXResellerContextService")
-    ctx = contextService.getData(ctx, settings.getCreds())
+    if args.offline:
+        conn = inventory.connect()
+        ctx = inventory.getContext(conn, ctx)
+        print (inventory.listCatchalls(conn, ctx["id"]))
+        return
+
+    ctx = contextcache.resolve(ctx)
 
     oxaasService = soapclient.getService("OXaaSService")
 
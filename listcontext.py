@@ -17,6 +17,9 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import argparse
+import inventory
+import json
+import records
 import settings
 import soapclient
 
@@ -29,8 +32,14 @@ def main():
     parser.add_argument("-c", "--cid", help="Context ID.", type=int)
     parser.add_argument("-n", dest="context_name", help="Context name.")
     parser.add_argument("--long", help="Verbose output (incl. settings).", action="store_true")
+    parser.add_argument("--offline", help="Answer from the local inventory (see inventory.py sync).", action="store_true")
+    soapclient.addArguments(parser)
     args = parser.parse_args()
 
+    if args.offline:
+        listOffline(parser, args)
+        return
+
     client = soapclient.getService("OXResellerContextService")
 
     if args.exists is True:
@@ -55,7 +64,7 @@ def main():
         else:
             search = "*"
 
-        contexts = client.list(search, settings.getCreds())
+        contexts = client.raw("list", search, settings.getCreds(), record=records.Context)
 
         if not args.long:
             print ("{:<7} {:<40} {:<10}".format('CID', 'Name', 'maxQuota'))
@@ -67,12 +76,49 @@ def main():
                 print("{:<7} {:<40} {:<10}".format(
                     context.id, context.name, str(context.usedQuota) + "/" + str(context.maxQuota)))
 
-                for entries in context.userAttributes.entries:
-                    if entries.key == 'config':
-                        print ("Configuration")
-                        for prop in entries.value.entries:
-                            print (prop.key, ":", prop.value)
-                        print ("\n")
+                config = records.config(context.userAttributes)
+                if config:
+                    print ("Configuration")
+                    for key, value in config.items():
+                        print (key, ":", value)
+                    print ("\n")
+
+
+def listOffline(parser, args):
+    conn = inventory.connect()
+    if args.exists is True:
+        if args.context_name is None and args.cid is None:
+            parser.error("Context must be specified by either -n or -c !")
+        ctx = {"id": args.cid}
+        if args.cid is None:
+            ctx["name"] = settings.getCreds()["login"] + "_" + args.context_name
+        try:
+            inventory.getContext(conn, ctx)
+            print("The context exists!")
+        except LookupError:
+            print("The context does not exist!")
+        return
+
+    if args.searchpattern is not None:
+        search = "*" + args.searchpattern + "*"
+    else:
+        search = "*"
+
+    if not args.long:
+        print ("{:<7} {:<40} {:<10}".format('CID', 'Name', 'maxQuota'))
+        for context in inventory.listContexts(conn, search):
+            print ("{:<7} {:<40} {:<10}".format(context["id"], context["name"], str(context["maxQuota"])))
+    else:
+        print("{:<7} {:<40} {:<10}".format('CID', 'Name', 'Quota'))
+        for context in inventory.listContexts(conn, search):
+            print("{:<7} {:<40} {:<10}".format(
+                context["id"], context["name"], str(context["usedQuota"]) + "/" + str(context["maxQuota"])))
+            config = json.loads(context["config"])
+            if config:
+                print ("Configuration")
+                for key, value in config.items():
+                    print (key, ":", value)
+                print ("\n")
 
 
 if __name__ == "__main__":
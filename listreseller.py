@@ -25,6 +25,7 @@ def main():
     parser = argparse.ArgumentParser(
         description='Lists all OX Cloud reseller admins.')
     parser.add_argument("-s", "--searchpattern", help="The search pattern which is used for listing.")
+    soapclient.addArguments(parser)
     args = parser.parse_args()
 
     client = soapclient.getService("OXResellerService")
@@ -16,10 +16,22 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+from requests import RequestException
 import argparse
-import requests
+import bulk
+import contextcache
+import csv
+import inventory
+import json
+import records
+import restclient
 import settings
 import soapclient
+import sys
+
+
+# fields of the user lists passed on to getMultipleData
+ID_FIELDS = ("id", "name")
 
 
 def main():
@@ -38,6 +50,14 @@ def main():
         "-d", "--dump", help="Dump raw object.", action="store_true")
     parser.add_argument("--includeguests",
                         help="Include guests.", action="store_true")
+    parser.add_argument("-w", "--workers", default=4, type=int,
+                        help="Number of users looked up concurrently. (Default: 4)")
+    parser.add_argument("--chunksize", type=int,
+                        help="Fetch user data in chunks of this many users (Default: all at once)")
+    parser.add_argument("--format", choices=["table", "jsonl", "csv"], default="table",
+                        help="Output format, jsonl and csv rows are written as they arrive. (Default: table)")
+    parser.add_argument("--offline", help="Answer from the local inventory (see inventory.py sync).", action="store_true")
+    soapclient.addArguments(parser)
     args = parser.parse_args()
 
     if args.context_name is None and args.cid is None:
@@ -49,79 +69,180 @@ def main():
     else:
         ctx["name"] = settings.getCreds()["login"] + "_" + args.context_name
 
-    contextService = soapclient.getService("OXResellerContextService")
-    ctx = contextService.getData(ctx, settings.getCreds())
+    if args.offline:
+        listOffline(ctx, args)
+        return
+
+    ctx = contextcache.resolve(ctx)
 
     oxaasService = soapclient.getService("OXaaSService")
 
     userService = soapclient.getService("OXResellerUserService")
+    # --dump shows the complete objects, otherwise compact records are parsed from the raw responses
+    record = None if args.dump else records.User
     if args.search is not None:
-        users = userService.listCaseInsensitive(
-            ctx, "*"+args.search+"*", settings.getCreds())
+        users = userService.raw("listCaseInsensitive",
+            ctx, "*"+args.search+"*", settings.getCreds(), fields=ID_FIELDS)
     else:
-        users = userService.listAll(
-            ctx, settings.getCreds(), args.includeguests)
+        users = userService.raw("listAll",
+            ctx, settings.getCreds(), args.includeguests, fields=ID_FIELDS)
+
+    users = fetchUsers(ctx, users, userService, args.chunksize, record)
 
-    users = userService.getMultipleData(
-        ctx, users, settings.getCreds())
+    if args.format != "table":
+        writeRows(ctx, users, args, userService, oxaasService)
+        return
 
     # code.interact(local=locals())
     print("{:<3} {:<40} {:<30} {:<12} {:<12} {:<15} {:<20} {:<15}".format(
         'UID', 'Name', 'Primary email', 'File Quota', 'Mail Quota', 'ACN', 'COS', 'Spamlevel'))
 
-    for user in users:
-        cos = '<skipped>'
-        acn = "<skipped>"
-        spamlevel = '<skipped>'
-        # fetching COS via SOAP cannot be trusted therefore use REST below
-        # for userAttributes in user.userAttributes.entries:
-        #    # find COS in array (currently cloud should only have one entry)
-        #    if userAttributes['key'] == 'cloud':
-        #        cos = userAttributes['value'].entries[0]['value']
-
-        if not args.dump:
-
-            if user.id != 2:
-                if not args.skip_cos:
-                    cos = "unset"
-                    r = requests.get(settings.getRestHost()+"oxaas/v1/admin/contexts/"+str(
-                        ctx.id)+"/users/"+str(user.id)+"/classofservice", auth=(settings.getRestCreds()), verify=settings.getVerifyTls())
-                    if r.status_code == 200:
-                        if r.json()['classofservice'] != '':
-                            cos = r.json()['classofservice']
-
-                if not args.skip_acn:
-                    acn = userService.getAccessCombinationName(
-                        ctx, user, settings.getCreds())
-
-                if not args.skip_spamlevel:
-                    r = requests.get(settings.getRestHost()+"oxaas/v1/admin/contexts/"+str(
-                        ctx.id)+"/users/"+str(user.id)+"/spamlevel", auth=(settings.getRestCreds()), verify=settings.getVerifyTls())
-                    if r.status_code == 200:
-                        if r.json()['spamlevel'] != '':
-                            spamlevel = r.json()['spamlevel']
-                try:
-                    # fails for Guest users w/o LDAP entry
-                    mailquota = oxaasService.getMailQuota(
-                        ctx.id, user.id, settings.getCreds())
-                    # can error if Dovecot has no mailbox/quotausage yet OPS-13238
-                    mailquotaUsage = oxaasService.getQuotaUsagePerUser(
-                        ctx.id, user.id, settings.getCreds())
-                    mailquotaUsage = str(round(mailquotaUsage.storage/1024))
-                except:
-                    mailquota = "-"
-                    mailquotaUsage = "-"
-                print("{:<3} {:<40} {:<30} {:<12} {:<12} {:<15} {:<20} {:<15}".format(
-                    user.id, user.name, user.primaryEmail, str(user.usedQuota) + "/" + str(user.maxQuota), mailquotaUsage + "/" + str(mailquota), str(acn), ','.join(cos), spamlevel))
-            else:
-                print("{:<3} {:<40} {:<30} {:<12} {:<12} {:<15} {:<20} {:<15}".format(
-                    user.id, user.name, user.primaryEmail, str(user.usedQuota) + "/" + str(user.maxQuota), str(acn), "n/a", "n/a", "n/a"))
-
-        else:
+    if args.dump:
+        for user in users:
             print(user)
             permissions = userService.getModuleAccess(ctx, user, settings.getCreds())
             print(permissions)
+        return
+
+    def details(user):
+        return getUserDetails(ctx, user, args, userService, oxaasService)
+
+    # lookups run concurrently, results come back in the order of users
+    for user, result, error in bulk.imap(details, users, args.workers):
+        if error is not None:
+            raise error
+        acn, cos, spamlevel, mailquota, mailquotaUsage = result
+        if user.id != 2:
+            print("{:<3} {:<40} {:<30} {:<12} {:<12} {:<15} {:<20} {:<15}".format(
+                user.id, user.name, user.primaryEmail, str(user.usedQuota) + "/" + str(user.maxQuota), mailquotaUsage + "/" + str(mailquota), str(acn), ','.join(cos), spamlevel))
+        else:
+            print("{:<3} {:<40} {:<30} {:<12} {:<12} {:<15} {:<20} {:<15}".format(
+                user.id, user.name, user.primaryEmail, str(user.usedQuota) + "/" + str(user.maxQuota), str(acn), "n/a", "n/a", "n/a"))
+
 
+def listOffline(ctx, args):
+    conn = inventory.connect()
+    ctx = inventory.getContext(conn, ctx)
+    if args.search is not None:
+        users = inventory.listUsers(conn, ctx["id"], "*"+args.search+"*")
+    else:
+        users = inventory.listUsers(conn, ctx["id"])
+
+    print("{:<3} {:<40} {:<30} {:<12}".format('UID', 'Name', 'Primary email', 'File Quota'))
+    for user in users:
+        print("{:<3} {:<40} {:<30} {:<12}".format(
+            user["id"], user["name"], user["primaryEmail"], str(user["usedQuota"]) + "/" + str(user["maxQuota"])))
+
+
+def fetchUsers(ctx, users, userService, chunksize=None, record=None):
+    """Yield the full user data, fetched in chunks of chunksize users.
+
+    The next chunks are already requested while the current one is consumed.
+    With a record type (e.g. records.User) the users are parsed from the raw
+    responses (see soapclient.Service.raw), otherwise zeep objects are returned.
+    """
+    def fetch(chunk):
+        if record is None:
+            return userService.getMultipleData(ctx, chunk, settings.getCreds())
+        return userService.raw("getMultipleData", ctx, chunk, settings.getCreds(), record=record)
+
+    if not chunksize:
+        yield from fetch(users)
+        return
+
+    chunks = (users[i:i + chunksize] for i in range(0, len(users), chunksize))
+    for chunk, result, error in bulk.imap(fetch, chunks, 2):
+        if error is not None:
+            raise error
+        yield from result
+
+
+def writeRows(ctx, users, args, userService, oxaasService):
+    fields = ["id", "name", "primaryEmail", "usedQuota", "maxQuota", "mailQuotaUsage",
+              "mailQuota", "acn", "cos", "spamlevel"]
+    if args.format == "csv":
+        writer = csv.DictWriter(sys.stdout, fieldnames=fields)
+        writer.writeheader()
+        write = writer.writerow
+    else:
+        def write(row):
+            print(json.dumps(row))
+
+    def details(user):
+        return getUserDetails(ctx, user, args, userService, oxaasService)
+
+    for user, result, error in bulk.imap(details, users, args.workers):
+        if error is not None:
+            raise error
+        acn, cos, spamlevel, mailquota, mailquotaUsage = result
+        write({
+            "id": user.id,
+            "name": user.name,
+            "primaryEmail": user.primaryEmail,
+            "usedQuota": user.usedQuota,
+            "maxQuota": user.maxQuota,
+            "mailQuotaUsage": mailquotaUsage,
+            "mailQuota": mailquota,
+            "acn": acn,
+            "cos": cos if isinstance(cos, str) else ','.join(cos),
+            "spamlevel": spamlevel
+        })
+
+
+def getUserDetails(ctx, user, args, userService, oxaasService):
+    cos = '<skipped>'
+    acn = "<skipped>"
+    spamlevel = '<skipped>'
+    mailquota = "-"
+    mailquotaUsage = "-"
+    # fetching COS via SOAP cannot be trusted therefore use REST below
+    # for userAttributes in user.userAttributes.entries:
+    #    # find COS in array (currently cloud should only have one entry)
+    #    if userAttributes['key'] == 'cloud':
+    #        cos = userAttributes['value'].entries[0]['value']
+
+    if user.id == 2:
+        return acn, cos, spamlevel, mailquota, mailquotaUsage
+
+    if not args.skip_cos:
+        cos = "unset"
+        try:
+            r = restclient.get(settings.getRestHost()+"oxaas/v1/admin/contexts/"+str(
+                ctx.id)+"/users/"+str(user.id)+"/classofservice", retry=False)
+            if r.status_code == 200:
+                if r.json()['classofservice'] != '':
+                    cos = r.json()['classofservice']
+        except RequestException:
+            pass
+
+    if not args.skip_acn:
+        try:
+            acn = userService.getAccessCombinationName(
+                ctx, {"id": user.id}, settings.getCreds())
+        except Exception:
+            pass
+
+    if not args.skip_spamlevel:
+        try:
+            r = restclient.get(settings.getRestHost()+"oxaas/v1/admin/contexts/"+str(
+                ctx.id)+"/users/"+str(user.id)+"/spamlevel", retry=False)
+            if r.status_code == 200:
+                if r.json()['spamlevel'] != '':
+                    spamlevel = r.json()['spamlevel']
+        except RequestException:
+            pass
+    try:
+        # fails for Guest users w/o LDAP entry
+        mailquota = oxaasService.getMailQuota(
+            ctx.id, user.id, settings.getCreds())
+        # can error if Dovecot has no mailbox/quotausage yet OPS-13238
+        mailquotaUsage = oxaasService.getQuotaUsagePerUser(
+            ctx.id, user.id, settings.getCreds())
+        mailquotaUsage = str(round(mailquotaUsage.storage/1024))
+    except:
+        mailquota = "-"
+        mailquotaUsage = "-"
+    return acn, cos, spamlevel, mailquota, mailquotaUsage
 
 if __name__ == "__main__":
     main()
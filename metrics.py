@@ -0,0 +1,172 @@
+# Copyright (C) 2022  OX Software GmbH
+#                     Wolfgang Rosenauer
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Latency, size and error metrics of SOAP operations and REST calls.
+
+Every request is recorded under its kind ("soap" or "rest") and operation
+name. If a metrics file is configured (OXCLOUD_METRICS environment variable
+or metricsFile in target.py) the metrics are written at process exit, as
+JSON if the file name ends with .json, as Prometheus textfile otherwise.
+"""
+
+import atexit
+import json
+import os
+import re
+import settings
+import tempfile
+import threading
+import time
+
+BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, float("inf")]
+
+_lock = threading.Lock()
+_local = threading.local()
+_operations = {}
+
+
+class Operation:
+    """Metrics of one operation."""
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.retries = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self.buckets = [0] * len(BUCKETS)
+        self.bytesSent = 0
+        self.bytesReceived = 0
+
+    def toDict(self):
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "retries": self.retries,
+            "sum": round(self.sum, 6),
+            "mean": round(self.sum / self.count, 6) if self.count else 0,
+            "max": round(self.max, 6),
+            "buckets": {str(le): n for le, n in zip(BUCKETS, self.buckets)},
+            "bytesSent": self.bytesSent,
+            "bytesReceived": self.bytesReceived
+        }
+
+
+def _get(kind, name):
+  key = (kind, name)
+  if key not in _operations:
+    _operations[key] = Operation()
+  return _operations[key]
+
+def observe(kind, name, seconds, error=False):
+  with _lock:
+    operation = _get(kind, name)
+    operation.count += 1
+    operation.sum += seconds
+    operation.max = max(operation.max, seconds)
+    if error:
+      operation.errors += 1
+    for index, le in enumerate(BUCKETS):
+      if seconds <= le:
+        operation.buckets[index] += 1
+
+def addBytes(sent, received, kind=None, name=None):
+  """Add transferred bytes, by default to the operation running in this thread."""
+  if kind is None:
+    kind, name = getattr(_local, "current", (None, None))
+    if kind is None:
+      return
+  with _lock:
+    operation = _get(kind, name)
+    operation.bytesSent += sent
+    operation.bytesReceived += received
+
+def retry(kind, name):
+  with _lock:
+    _get(kind, name).retries += 1
+
+def timed(kind, name, func, failed=None):
+  """Call func() and record its latency under kind/name.
+
+  failed(result) can mark a returned result (e.g. an HTTP error response)
+  as error.
+  """
+  _local.current = (kind, name)
+  start = time.perf_counter()
+  try:
+    result = func()
+  except Exception:
+    observe(kind, name, time.perf_counter() - start, error=True)
+    raise
+  finally:
+    _local.current = (None, None)
+  observe(kind, name, time.perf_counter() - start, error=failed is not None and failed(result))
+  return result
+
+def restName(method, url):
+  """Turn a REST url into an operation name without ids, names or addresses."""
+  path = re.sub(r"^\w+://[^/]+", "", url.split("?")[0]).rstrip("/")
+  segments = [s if re.match(r"^(v\d+|[A-Za-z]+)$", s) or not s else "{}" for s in path.split("/")]
+  return method + " " + "/".join(segments)
+
+def summary():
+  with _lock:
+    return {kind + ":" + name: operation.toDict() for (kind, name), operation in sorted(_operations.items())}
+
+def prometheus():
+  lines = [
+    "# HELP oxcloud_request_duration_seconds Latency of OX Cloud API requests.",
+    "# TYPE oxcloud_request_duration_seconds histogram"
+  ]
+  counters = []
+  with _lock:
+    for (kind, name), operation in sorted(_operations.items()):
+      labels = 'kind="%s",operation="%s"' % (kind, name.replace('"', '\\"'))
+      for le, count in zip(BUCKETS, operation.buckets):
+        lines.append('oxcloud_request_duration_seconds_bucket{%s,le="%s"} %d' % (
+          labels, "+Inf" if le == float("inf") else le, count))
+      lines.append("oxcloud_request_duration_seconds_sum{%s} %f" % (labels, operation.sum))
+      lines.append("oxcloud_request_duration_seconds_count{%s} %d" % (labels, operation.count))
+      counters.append((labels, operation))
+  for metric, help, attribute in [("errors", "Failed OX Cloud API requests.", "errors"),
+                                  ("retries", "Retried OX Cloud API requests.", "retries"),
+                                  ("sent_bytes", "Bytes sent to the OX Cloud API.", "bytesSent"),
+                                  ("received_bytes", "Bytes received from the OX Cloud API.", "bytesReceived")]:
+    lines.append("# HELP oxcloud_request_%s_total %s" % (metric, help))
+    lines.append("# TYPE oxcloud_request_%s_total counter" % metric)
+    for labels, operation in counters:
+      lines.append("oxcloud_request_%s_total{%s} %d" % (metric, labels, getattr(operation, attribute)))
+  return "\n".join(lines) + "\n"
+
+def export(path=None):
+  path = path or settings.getMetricsFile()
+  if not path or not _operations:
+    return
+  content = json.dumps(summary(), indent=2) + "\n" if path.endswith(".json") else prometheus()
+  # write atomically, the node exporter textfile collector may read at any time;
+  # a temporary file of its own per process, concurrent runs do not clobber each other
+  fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix=".tmp")
+  try:
+    with os.fdopen(fd, "w") as metricsfile:
+      metricsfile.write(content)
+    os.chmod(tmp, 0o644)
+    os.replace(tmp, path)
+  except BaseException:
+    os.unlink(tmp)
+    raise
+
+
+atexit.register(export)
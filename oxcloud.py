@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+
+# Copyright (C) 2022  OX Software GmbH
+#                     Wolfgang Rosenauer
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Single entry point for all tools: oxcloud.py <command> [options].
+
+Only the module of the requested command is imported.
+"""
+
+import importlib
+import sys
+
+COMMANDS = {
+    "announcements": "Manage announcements.",
+    "changebranding": "Change global reseller settings.",
+    "changecontext": "Change a context.",
+    "changepermissions": "Change service permissions of a user.",
+    "changeuser": "Change a user.",
+    "checkcontext": "Check existance of contexts.",
+    "closesessions": "Close context sessions.",
+    "createcatchall": "Create a domain catch all.",
+    "createcontext": "Create a context.",
+    "createreseller": "Create a reseller admin.",
+    "createuser": "Create a user.",
+    "deletecatchall": "Delete a domain catch all.",
+    "deletecontext": "Delete a context.",
+    "deletereseller": "Delete a reseller admin.",
+    "deleteuser": "Delete a user.",
+    "diff": "Show what changed between two snapshots.",
+    "forwarder": "Manage mail forwarders.",
+    "inventory": "Manage the local inventory.",
+    "listbranding": "List global reseller settings.",
+    "listcatchall": "List catch all targets of a context.",
+    "listcontext": "List (or check) contexts.",
+    "listreseller": "List reseller admins.",
+    "listuser": "List users of a context.",
+    "oxshell": "Run commands in an interactive shell.",
+    "quotareport": "Report quota usage of all users in all contexts.",
+    "reconcile": "Apply a manifest of contexts, users, forwarders and catchalls.",
+    "snapshot": "Write a snapshot of the reseller, contexts and users.",
+    "shareddomain": "Manage shared domains.",
+}
+
+
+def run(command, argv):
+    """Run the main() of command with argv, return True on success."""
+    module = importlib.import_module(command)
+    saved = sys.argv
+    sys.argv = [command + ".py"] + argv
+    try:
+        module.main()
+    except SystemExit as e:
+        return e.code in (None, 0)
+    finally:
+        sys.argv = saved
+    return True
+
+
+def usage(out=sys.stdout):
+    print("usage: oxcloud.py <command> [options]\n\ncommands:", file=out)
+    for command, help in COMMANDS.items():
+        print("  {:<20} {}".format(command, help), file=out)
+    print("\nUse oxcloud.py <command> -h for the options of a command.", file=out)
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] in ("-h", "--help"):
+        usage()
+        sys.exit(0 if len(sys.argv) >= 2 else 2)
+
+    command = sys.argv[1].removesuffix(".py")
+    if command not in COMMANDS:
+        print("oxcloud.py: unknown command", command, file=sys.stderr)
+        usage(sys.stderr)
+        sys.exit(2)
+
+    sys.exit(0 if run(command, sys.argv[2:]) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+
+# Copyright (C) 2022  OX Software GmbH
+#                     Wolfgang Rosenauer
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import argparse
+import cmd
+import oxcloud
+import shlex
+import soapclient
+import sys
+
+COMMANDS = [command for command in oxcloud.COMMANDS if command != "oxshell"]
+
+
+def run(command, argv):
+    """Run a tool in this process, return True on success."""
+    try:
+        return oxcloud.run(command, argv)
+    except Exception as e:
+        print("Error:", e, file=sys.stderr)
+        return False
+    finally:
+        # --refresh-wsdl applies to this command only
+        soapclient.refreshWsdl = False
+
+
+class OXShell(cmd.Cmd):
+    intro = "OX Cloud provisioning shell. Type help for the list of commands, <command> -h for its options."
+    prompt = "oxcloud> "
+
+    def __init__(self, stopOnError=False, stdin=None):
+        super().__init__(stdin=stdin)
+        if stdin is not None:
+            self.use_rawinput = False
+            self.intro = None
+            self.prompt = ""
+        self.stopOnError = stopOnError
+        self.failed = 0
+
+    def emptyline(self):
+        pass
+
+    def default(self, line):
+        if line.startswith("#"):
+            return False
+        try:
+            argv = shlex.split(line)
+        except ValueError as e:
+            print("Error:", e, file=sys.stderr)
+            self.failed += 1
+            return self.stopOnError
+        command = argv[0].removesuffix(".py")
+        if command in ("exit", "quit", "EOF"):
+            return True
+        if command not in COMMANDS:
+            print("Unknown command:", command, file=sys.stderr)
+            self.failed += 1
+            return self.stopOnError
+        if not run(command, argv[1:]):
+            self.failed += 1
+            return self.stopOnError
+        return False
+
+    def do_help(self, arg):
+        if arg:
+            command = arg.removesuffix(".py")
+            if command in COMMANDS:
+                run(command, ["-h"])
+            else:
+                print(self.nohelp % (arg,))
+            return
+        print("Commands (use <command> -h for help):")
+        self.columnize(COMMANDS)
+        print("\nexit, quit")
+
+    def completenames(self, text, *ignored):
+        return [command for command in COMMANDS + ["exit", "quit"] if command.startswith(text)]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Interactive shell running the provisioning tools in one process, keeping clients warm.')
+    parser.add_argument("-f", "--file", help="Read commands from file ('-' for stdin) instead of prompting.")
+    parser.add_argument("--stop-on-error", help="Stop at the first failing command.", action="store_true")
+    args = parser.parse_args()
+
+    if args.file is None and not sys.stdin.isatty():
+        args.file = "-"
+
+    if args.file is None:
+        shell = OXShell(args.stop_on_error)
+        try:
+            shell.cmdloop()
+        except KeyboardInterrupt:
+            print()
+    else:
+        script = sys.stdin if args.file == "-" else open(args.file)
+        shell = OXShell(args.stop_on_error, script)
+        shell.cmdloop()
+        if script is not sys.stdin:
+            script.close()
+    sys.exit(1 if shell.failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+
+# Copyright (C) 2022  OX Software GmbH
+#                     Wolfgang Rosenauer
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import argparse
+import bulk
+import csv
+import heapq
+import json
+import listuser
+import records
+import settings
+import soapclient
+import sys
+
+FIELDS = ["record", "cid", "context", "uid", "name", "usedQuota", "maxQuota", "mailUsage", "mailQuota"]
+
+
+class Report:
+    """Aggregates the rows: totals, top-N and counts over the threshold."""
+
+    def __init__(self, top, threshold):
+        self.top = top
+        self.threshold = threshold
+        self.totals = {"contexts": 0, "users": 0, "usedQuota": 0, "maxQuota": 0, "mailUsage": 0, "mailQuota": 0}
+        self.over = {"contexts": 0, "users": 0, "mailboxes": 0}
+        self.largest = {"contexts": [], "users": [], "mailboxes": []}
+        self.failed = []
+
+    def add(self, row):
+        if row["record"] == "failed":
+            self.failed.append(row["context"])
+            return
+        if row["record"] == "context":
+            self.totals["contexts"] += 1
+            self.track("contexts", row["usedQuota"], row["maxQuota"], row)
+            return
+        self.totals["users"] += 1
+        for key in ("usedQuota", "maxQuota", "mailUsage", "mailQuota"):
+            if isinstance(row[key], int) and row[key] > 0:
+                self.totals[key] += row[key]
+        self.track("users", row["usedQuota"], row["maxQuota"], row)
+        self.track("mailboxes", row["mailUsage"], row["mailQuota"], row)
+
+    def track(self, kind, used, limit, row):
+        if not isinstance(used, int):
+            return
+        if isinstance(limit, int) and limit > 0 and used * 100 > limit * self.threshold:
+            self.over[kind] += 1
+        # keep only the top entries, the heap never grows beyond top
+        entry = (used, row["cid"], row["uid"] or 0, row["name"])
+        if len(self.largest[kind]) < self.top:
+            heapq.heappush(self.largest[kind], entry)
+        else:
+            heapq.heappushpop(self.largest[kind], entry)
+
+    def write(self, output):
+        print("Totals: {contexts} contexts, {users} users, file storage {usedQuota}/{maxQuota} MiB, "
+              "mail storage {mailUsage}/{mailQuota} MiB".format(**self.totals), file=output)
+        print("Over {}% of quota: {} contexts, {} users (file), {} users (mail)".format(
+            self.threshold, self.over["contexts"], self.over["users"], self.over["mailboxes"]), file=output)
+        for kind, title in (("contexts", "contexts"), ("users", "users by file usage"), ("mailboxes", "users by mail usage")):
+            print("Top", self.top, title + ":", file=output)
+            for used, cid, uid, name in sorted(self.largest[kind], reverse=True):
+                print("  {:>10} MiB  {:<6} {}".format(used, cid, name), file=output)
+        if self.failed:
+            print("Failed to fetch", len(self.failed), "contexts, not included above:", file=output)
+            for name in self.failed:
+                print("  " + name, file=output)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Report file and mail quota usage of all users in all contexts.')
+    parser.add_argument("-s", "--search", default="*", help="Only report contexts matching this pattern. (Default: *)")
+    parser.add_argument("--format", choices=["csv", "jsonl"], default="csv", help="Output format. (Default: csv)")
+    parser.add_argument("-o", "--output", help="Write the rows to this file instead of stdout.")
+    parser.add_argument("-w", "--workers", default=8, type=int,
+                        help="Number of concurrent lookups. (Default: 8)")
+    parser.add_argument("--skip-mail", help="Skip the mail quota lookups (two per user).", action="store_true")
+    parser.add_argument("--top", default=10, type=int, help="Number of largest entries in the summary. (Default: 10)")
+    parser.add_argument("--threshold", default=90, type=int,
+                        help="Count entries using more than this percentage of their quota. (Default: 90)")
+    soapclient.addArguments(parser)
+    args = parser.parse_args()
+
+    contextService = soapclient.getService("OXResellerContextService")
+    contexts = contextService.raw("list", settings.getCreds()["login"] + "_" + args.search, settings.getCreds(),
+                                  record=records.Context)
+
+    output = open(args.output, "w", newline='') if args.output else sys.stdout
+    if args.format == "csv":
+        writer = csv.DictWriter(output, fieldnames=FIELDS)
+        writer.writeheader()
+        write = writer.writerow
+    else:
+        def write(row):
+            output.write(json.dumps(row) + "\n")
+
+    report = Report(args.top, args.threshold)
+    for row in collect(contexts, args):
+        write(row)
+        report.add(row)
+    if args.output:
+        output.close()
+    # keep stdout parseable when the rows go there
+    report.write(sys.stderr if args.output is None else sys.stdout)
+    if report.failed:
+        sys.exit(1)
+
+
+def collect(contexts, args):
+    """Yield a context row followed by its user rows for all contexts.
+
+    Contexts are fetched and users looked up concurrently, rows come out in
+    the order of contexts. A context which cannot be fetched yields a single
+    row with record "failed" and the error as name.
+    """
+    userService = soapclient.getService("OXResellerUserService")
+    oxaasService = soapclient.getService("OXaaSService")
+
+    def fetchContext(ctx):
+        ids = userService.raw("listAll", ctx.ref(), settings.getCreds(), False, fields=listuser.ID_FIELDS)
+        return list(listuser.fetchUsers(ctx.ref(), ids, userService, 500, records.User))
+
+    def users():
+        for ctx, ctxUsers, error in bulk.imap(fetchContext, contexts, max(1, args.workers // 4)):
+            if error is not None:
+                # report the context as failed and go on with the others
+                yield ctx, None, error
+                continue
+            yield ctx, None, None
+            for user in ctxUsers:
+                yield ctx, user, None
+
+    def lookup(item):
+        ctx, user, failure = item
+        if user is None or args.skip_mail or user.id == 2:
+            return "-", "-"
+        try:
+            # fails for Guest users w/o LDAP entry or without mailbox yet
+            mailquota = oxaasService.getMailQuota(ctx.id, user.id, settings.getCreds())
+            usage = oxaasService.getQuotaUsagePerUser(ctx.id, user.id, settings.getCreds())
+            return round(usage.storage/1024), mailquota
+        except Exception:
+            return "-", "-"
+
+    for (ctx, user, failure), result, error in bulk.imap(lookup, users(), args.workers):
+        if failure is not None:
+            print("FAILED context", ctx.id, ctx.name, failure, file=sys.stderr)
+            yield {"record": "failed", "cid": ctx.id, "context": ctx.name, "uid": None, "name": str(failure),
+                   "usedQuota": None, "maxQuota": None, "mailUsage": None, "mailQuota": None}
+            continue
+        mailUsage, mailQuota = result if error is None else ("-", "-")
+        if user is None:
+            yield {"record": "context", "cid": ctx.id, "context": ctx.name, "uid": None, "name": ctx.name,
+                   "usedQuota": ctx.usedQuota, "maxQuota": ctx.maxQuota, "mailUsage": None, "mailQuota": None}
+        else:
+            yield {"record": "user", "cid": ctx.id, "context": ctx.name, "uid": user.id, "name": user.name,
+                   "usedQuota": user.usedQuota, "maxQuota": user.maxQuota, "mailUsage": mailUsage,
+                   "mailQuota": mailQuota}
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+
+# Copyright (C) 2022  OX Software GmbH
+#                     Wolfgang Rosenauer
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import argparse
+import bulk
+import contextcache
+import createcontext
+import createuser
+import forwarder
+import json
+import listuser
+import records
+import restclient
+import settings
+import soapclient
+import sys
+import userdetails
+
+# operations run phase by phase, so contexts exist before their users and
+# users before the catchalls pointing to them
+CONTEXTS, USERS, ROUTING, CLEANUP, PRUNE = range(5)
+
+
+class Operation:
+    """One planned change, calls is the number of API calls it makes."""
+
+    def __init__(self, phase, description, calls, func):
+        self.phase = phase
+        self.description = description
+        self.calls = calls
+        self.func = func
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Bring contexts, users, forwarders and catchalls to the state described in a manifest.')
+    parser.add_argument("manifest", help="YAML or JSON manifest with the desired state.")
+    parser.add_argument("--plan", help="Only show the changes and the number of API calls needed.",
+                        action="store_true")
+    parser.add_argument("-w", "--workers", default=4, type=int,
+                        help="Number of operations run concurrently. (Default: 4)")
+    soapclient.addArguments(parser)
+    args = parser.parse_args()
+
+    manifest = loadManifest(args.manifest)
+    errors = checkManifest(manifest)
+    if errors:
+        for error in errors:
+            print(error)
+        sys.exit(1)
+
+    live, contexts = fetchState(manifest, args.workers)
+    operations = plan(manifest, live, contexts)
+
+    for operation in operations:
+        print(operation.description)
+    print(len(operations), "operations,", sum(o.calls for o in operations), "API calls")
+    if args.plan or not operations:
+        return
+
+    summary = bulk.Summary()
+    for phase in sorted(set(o.phase for o in operations)):
+        for operation, result, error in bulk.imap(lambda o: o.func(), [o for o in operations if o.phase == phase],
+                                                  args.workers):
+            summary.add(error)
+            if error is None:
+                print("OK", operation.description)
+            else:
+                print("FAILED", operation.description, error)
+    print(summary)
+    if summary.failed:
+        sys.exit(1)
+
+
+def loadManifest(path):
+    with open(path) as fileinput:
+        if path.endswith((".yaml", ".yml")):
+            try:
+                import yaml
+            except ImportError:
+                sys.exit("Reading " + path + " needs PyYAML (pip install PyYAML), or use a JSON manifest")
+            return yaml.safe_load(fileinput) or {}
+        return json.load(fileinput)
+
+
+def checkManifest(manifest):
+    errors = []
+    for spec in manifest.get("contexts") or []:
+        if not spec.get("name"):
+            errors.append("context without name")
+            continue
+        for user in spec.get("users") or []:
+            if not user.get("email"):
+                errors.append("user without email in context " + spec["name"])
+        for catchall in spec.get("catchalls") or []:
+            if not catchall.get("domain") or not catchall.get("user"):
+                errors.append("catchall without domain or user in context " + spec["name"])
+    return errors
+
+
+def fullName(spec):
+    return settings.getCreds()["login"] + "_" + spec["name"]
+
+
+def fetchState(manifest, workers):
+    """Fetch the live state of all contexts in manifest.
+
+    Returns the state per context name and the ContextRef of every existing
+    context, which operations on not yet created contexts find filled in.
+    """
+    contextService = soapclient.getService("OXResellerContextService")
+    existing = {ctx.name: ctx for ctx in contextService.raw("list", "*", settings.getCreds(), record=records.Context)}
+
+    specs = {fullName(spec): spec for spec in manifest.get("contexts") or []}
+    contexts = {}
+    for name in specs:
+        if name in existing:
+            contexts[name] = contextcache.ContextRef(id=existing[name].id, name=name)
+            contextcache.store(existing[name].id, name)
+
+    live = {}
+    for name, state, error in bulk.imap(lambda name: fetchContext(contexts[name]), list(contexts), workers):
+        if error is not None:
+            raise error
+        state["context"] = existing[name]
+        live[name] = state
+
+    # acn, cos and spamlevel need a request per user, only fetch what the manifest manages
+    details = []
+    for name, spec in specs.items():
+        if name not in live:
+            continue
+        for user in spec.get("users") or []:
+            liveUser = live[name]["users"].get(user["email"].lower())
+            wanted = [key for key in userdetails.DETAILS if key in user]
+            if liveUser is not None and wanted:
+                details.append((contexts[name], liveUser, wanted))
+    for (ctx, liveUser, wanted), values, error in bulk.imap(lambda item: userdetails.fetchDetails(*item), details, workers):
+        if error is not None:
+            raise error
+        live[ctx.name]["details"][liveUser.id] = values
+    return live, contexts
+
+
+def fetchContext(ctx):
+    userService = soapclient.getService("OXResellerUserService")
+    oxaasService = soapclient.getService("OXaaSService")
+    ids = userService.raw("listAll", ctx, settings.getCreds(), False, fields=listuser.ID_FIELDS)
+    users = {user.name.lower(): user for user in listuser.fetchUsers(ctx, ids, userService, 500, records.User)}
+
+    forwarders = forwarder.listForwards(ctx.id)
+
+    catchalls = set(parseCatchall(c) for c in oxaasService.listDomainCatchalls(ctx.id, settings.getCreds()) or [])
+    return {"users": users, "forwarders": forwarders, "catchalls": catchalls, "details": {}}
+
+
+def parseCatchall(catchall):
+    domain, _, user = str(catchall).partition(":")
+    return domain, user
+
+
+def plan(manifest, live, contexts):
+    """Return the operations needed to get from live to the manifest state."""
+    operations = []
+    for spec in manifest.get("contexts") or []:
+        name = fullName(spec)
+        state = live.get(name, {"users": {}, "forwarders": {}, "catchalls": set(), "details": {}})
+        if name not in live:
+            operations.append(Operation(CONTEXTS, "+ context " + name, 1, createContext(spec, contexts)))
+        elif spec.get("quota") is not None and spec["quota"] != state["context"].maxQuota:
+            operations.append(Operation(
+                CONTEXTS, "~ context " + name + ": quota " + str(state["context"].maxQuota) + " -> " + str(spec["quota"]),
+                1, changeContext(name, spec["quota"], contexts)))
+
+        wanted = set()
+        for user in spec.get("users") or []:
+            wanted.add(user["email"].lower())
+            liveUser = state["users"].get(user["email"].lower())
+            if liveUser is None:
+                operations.append(createUserOperation(name, user, contexts))
+            else:
+                operation = changeUserOperation(name, user, liveUser, state["details"].get(liveUser.id, {}), contexts)
+                if operation is not None:
+                    operations.append(operation)
+
+        forwarders = {alias: sorted(targets) for alias, targets in (spec.get("forwarders") or {}).items()}
+        for alias, targets in forwarders.items():
+            if state["forwarders"].get(alias) != targets:
+                operations.append(Operation(
+                    ROUTING, ("~" if alias in state["forwarders"] else "+") + " forwarder " + alias + " -> " + ",".join(targets) + " in " + name, 1,
+                    setForwarder(name, alias, targets, contexts)))
+
+        catchalls = set((c["domain"], c["user"]) for c in spec.get("catchalls") or [])
+        for domain, user in sorted(catchalls - state["catchalls"]):
+            operations.append(Operation(
+                ROUTING, "+ catchall " + domain + " -> " + user + " in " + name, 1,
+                catchallOperation("createDomainCatchall", name, domain, user, contexts)))
+
+        if not spec.get("prune"):
+            continue
+        # prune removes everything in the context the manifest does not mention
+        for domain, user in sorted(state["catchalls"] - catchalls):
+            operations.append(Operation(
+                CLEANUP, "- catchall " + domain + " -> " + user + " in " + name, 1,
+                catchallOperation("deleteDomainCatchall", name, domain, user, contexts)))
+        for alias in sorted(set(state["forwarders"]) - set(forwarders)):
+            operations.append(Operation(
+                CLEANUP, "- forwarder " + alias + " in " + name, 1, deleteForwarder(name, alias, contexts)))
+        for login, liveUser in sorted(state["users"].items()):
+            # the context admin cannot be deleted
+            if login not in wanted and liveUser.id != 2:
+                operations.append(Operation(
+                    PRUNE, "- user " + liveUser.name + " in " + name, 1, deleteUser(name, liveUser.id, contexts)))
+    return operations
+
+
+def createContext(spec, contexts):
+    def run():
+        client = soapclient.getService("OXResellerContextService")
+        context = createcontext.createContext(
+            client, spec["name"], spec.get("quota", 1024), spec.get("adminEmail"),
+            spec.get("password") or createcontext.genPasswd(), spec.get("acn", "cloud_pim"), spec.get("supportcontact"))
+        contexts[context.name] = contextcache.ContextRef(id=context.id, name=context.name)
+    return run
+
+
+def changeContext(name, quota, contexts):
+    def run():
+        contextService = soapclient.getService("OXResellerContextService")
+        contextService.change({"id": contexts[name].id, "maxQuota": quota}, settings.getCreds())
+    return run
+
+
+def createUserOperation(name, spec, contexts):
+    options = argparse.Namespace(
+        email=spec["email"], password=spec.get("password") or createcontext.genPasswd(),
+        firstname=spec.get("firstname", spec["email"].split("@")[0]), lastname=spec.get("lastname", ""),
+        language=spec.get("language", "en_US"), timezone=spec.get("timezone", "Europe/Berlin"),
+        quota=spec.get("quota", 1024), mailquota=None, access_combination=spec.get("acn", "cloud_pim"),
+        cos=userdetails.normalizeCos(spec.get("cos", spec.get("acn", "cloud_pim"))),
+        editpassword=spec.get("editpassword", False), config=None)
+    # createByModuleAccessName, setMailQuota, optional editpassword/unlimited quota changes
+    calls = 2 + (2 if options.editpassword else 0) + (1 if options.quota == -1 else 0)
+    calls += (1 if spec.get("aliases") else 0) + (1 if spec.get("spamlevel") else 0)
+
+    def run():
+        ctx = contexts[name]
+        user = createuser.createUser(ctx, options, soapclient.getService("OXResellerUserService"),
+                                     soapclient.getService("OXaaSService"))
+        if spec.get("aliases"):
+            changeUser(ctx, user.id, {"aliases": userAliases(spec)})
+        if spec.get("spamlevel"):
+            setSpamlevel(ctx, user.id, spec["spamlevel"])
+    return Operation(USERS, "+ user " + spec["email"] + " in " + name, calls, run)
+
+
+def changeUserOperation(name, spec, liveUser, details, contexts):
+    changes = {}
+    if spec.get("quota") is not None and spec["quota"] != liveUser.maxQuota:
+        changes["quota"] = (liveUser.maxQuota, spec["quota"])
+    if spec.get("aliases") is not None:
+        aliases = userAliases(spec)
+        if aliases != sorted(set(liveUser.aliases or [])):
+            changes["aliases"] = (sorted(set(liveUser.aliases or [])), aliases)
+    for key in ("acn", "cos", "spamlevel"):
+        value = userdetails.normalizeCos(spec.get(key)) if key == "cos" else spec.get(key)
+        if value is not None and value != details.get(key):
+            changes[key] = (details.get(key), value)
+    if not changes:
+        return None
+
+    calls = (1 if set(changes) & {"quota", "aliases", "cos"} else 0) + len(set(changes) & {"quota", "acn", "spamlevel"})
+
+    def run():
+        ctx = contexts[name]
+        change = {}
+        if "quota" in changes:
+            oxaasService = soapclient.getService("OXaaSService")
+            # for Dovecot unlimited means 0
+            oxaasService.setMailQuota(ctx.id, liveUser.id, max(spec["quota"], 0), settings.getCreds())
+            change["maxQuota"] = spec["quota"]
+        if "aliases" in changes:
+            change["aliases"] = changes["aliases"][1]
+        if "cos" in changes:
+            change["userAttributes"] = {"entries": [
+                {"key": "cloud", "value": {"entries": [{"key": "service", "value": changes["cos"][1]}]}}]}
+        if change:
+            changeUser(ctx, liveUser.id, change)
+        if "acn" in changes:
+            userService = soapclient.getService("OXResellerUserService")
+            userService.changeByModuleAccessName(ctx, {"id": liveUser.id}, spec["acn"], settings.getCreds())
+        if "spamlevel" in changes:
+            setSpamlevel(ctx, liveUser.id, spec["spamlevel"])
+
+    description = "~ user " + liveUser.name + " in " + name + ": " + ", ".join(
+        key + " " + str(old) + " -> " + str(new) for key, (old, new) in changes.items())
+    return Operation(USERS, description, calls, run)
+
+
+def userAliases(spec):
+    return sorted(set(spec.get("aliases") or []) | {spec["email"]})
+
+
+def changeUser(ctx, uid, change):
+    userService = soapclient.getService("OXResellerUserService")
+    change["id"] = uid
+    userService.change(ctx, change, settings.getCreds())
+
+
+def setSpamlevel(ctx, uid, spamlevel):
+    r = restclient.put(settings.getRestHost()+"oxaas/v1/admin/contexts/"+str(
+        ctx.id)+"/users/"+str(uid)+"/spamlevel", json={"spamlevel": spamlevel})
+    r.raise_for_status()
+
+
+def deleteUser(name, uid, contexts):
+    def run():
+        userService = soapclient.getService("OXResellerUserService")
+        userService.delete(contexts[name], {"id": uid}, settings.getCreds(), 0)
+    return run
+
+
+def setForwarder(name, alias, targets, contexts):
+    def run():
+        r = restclient.post(settings.getRestHost()+"api/oxaas/v1/admin/forwards/"+str(
+            contexts[name].id)+"/"+alias, json=targets)
+        r.raise_for_status()
+    return run
+
+
+def deleteForwarder(name, alias, contexts):
+    def run():
+        r = restclient.delete(settings.getRestHost()+"api/oxaas/v1/admin/forwards/"+str(
+            contexts[name].id)+"/"+alias)
+        r.raise_for_status()
+    return run
+
+
+def catchallOperation(operation, name, domain, user, contexts):
+    def run():
+        oxaasService = soapclient.getService("OXaaSService")
+        getattr(oxaasService, operation)(contexts[name].id, domain, user, settings.getCreds())
+    return run
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+# Copyright (C) 2022  OX Software GmbH
+#                     Wolfgang Rosenauer
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Compact record types for listed contexts and users.
+
+Full zeep objects carry every attribute of the WSDL types plus zeep's
+bookkeeping. The records only keep the fields the tools print or compare,
+in __slots__ classes without a per-instance dict, so scans over a whole
+tenant stay small. They are created by soapclient.Service.raw or
+converted from zeep objects with fromZeep().
+"""
+
+import sys
+
+
+class Slotted:
+    """Base for the record types, fields are the __slots__ of the subclass."""
+
+    __slots__ = ()
+
+    def __init__(self, **values):
+        for field in self.__slots__:
+            setattr(self, field, values.get(field))
+
+    @classmethod
+    def fromZeep(cls, obj):
+        record = cls.__new__(cls)
+        for field in cls.__slots__:
+            value = getattr(obj, field, None)
+            if field == "userAttributes":
+                value = Attributes.fromZeep(value)
+            elif field == "aliases":
+                value = tuple(value or ())
+            setattr(record, field, value)
+        return record
+
+    def __getitem__(self, field):
+        return getattr(self, field)
+
+    def toDict(self):
+        return {field: getattr(self, field) for field in self.__slots__}
+
+    def __repr__(self):
+        return type(self).__name__ + repr(self.toDict())
+
+
+class Context(Slotted):
+    __slots__ = ("id", "name", "usedQuota", "maxQuota", "enabled", "userAttributes")
+
+    def ref(self):
+        """Return the context reference to pass to SOAP operations."""
+        return {"id": self.id, "name": self.name}
+
+
+class User(Slotted):
+    __slots__ = ("id", "name", "primaryEmail", "usedQuota", "maxQuota", "mailenabled", "aliases", "userAttributes")
+
+
+class Attributes:
+    """userAttributes as a dict of namespace -> {key: value}."""
+
+    __slots__ = ("maps",)
+
+    def __init__(self, maps=None):
+        # the same keys repeat for every user, share the strings
+        self.maps = {sys.intern(ns): {sys.intern(k): v for k, v in values.items()}
+                     for ns, values in (maps or {}).items()}
+
+    @classmethod
+    def fromZeep(cls, userAttributes):
+        if userAttributes is None or isinstance(userAttributes, Attributes):
+            return userAttributes
+        maps = {}
+        for entry in userAttributes.entries or []:
+            maps[entry.key] = {item.key: item.value
+                               for item in ((entry.value.entries if entry.value is not None else None) or [])}
+        return cls(maps)
+
+    def get(self, ns):
+        return self.maps.get(ns, {})
+
+    def toDict(self):
+        return self.maps
+
+    def __repr__(self):
+        return "Attributes" + repr(self.maps)
+
+
+def config(userAttributes, ns="config"):
+  """Return the key/value map stored under ns in userAttributes (zeep object or Attributes)."""
+  if userAttributes is None:
+    return {}
+  return Attributes.fromZeep(userAttributes).get(ns)
@@ -0,0 +1,201 @@
+# Copyright (C) 2022  OX Software GmbH
+#                     Wolfgang Rosenauer
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Retry, circuit breaker and adaptive concurrency for API requests.
+
+All SOAP operations and REST calls go through call():
+
+- idempotent requests are retried with jittered exponential backoff on
+  transient errors (connection problems, timeouts, HTTP 5xx/429)
+- a circuit breaker per endpoint fails fast once an endpoint keeps failing
+- an AIMD limiter adapts the number of concurrent requests, growing it
+  slowly while requests succeed and halving it on errors or latency spikes
+"""
+
+import metrics
+import random
+import settings
+import sys
+import threading
+import time
+
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 10
+BREAKER_THRESHOLD = 5
+BREAKER_COOLDOWN = 30
+
+# SOAP operations which can safely be repeated
+IDEMPOTENT_OPERATIONS = ("get", "list", "exists", "set", "change", "enable", "disable")
+IDEMPOTENT_METHODS = ("GET", "HEAD", "PUT", "DELETE", "OPTIONS")
+
+
+class CircuitOpenError(ConnectionError):
+    """Raised without contacting an endpoint while its circuit is open."""
+
+
+class CircuitBreaker:
+    """Opens after threshold consecutive failures, allows a trial after cooldown."""
+
+    def __init__(self, threshold=BREAKER_THRESHOLD, cooldown=BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.openedAt = None
+        self.lock = threading.Lock()
+
+    def allow(self):
+        with self.lock:
+            if self.openedAt is None:
+                return True
+            if time.monotonic() - self.openedAt >= self.cooldown:
+                # half open: let one request through, the next failure reopens
+                self.openedAt = time.monotonic()
+                self.failures = self.threshold - 1
+                return True
+            return False
+
+    def success(self):
+        with self.lock:
+            self.failures = 0
+            self.openedAt = None
+
+    def failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.failures >= self.threshold:
+                self.openedAt = time.monotonic()
+
+
+class Limiter:
+    """AIMD limit for the number of requests in flight.
+
+    Latency spikes are judged against a baseline per operation, a large
+    but healthy getMultipleData does not look like congestion because
+    small requests are faster.
+    """
+
+    def __init__(self, maximum, initial=None):
+        self.maximum = maximum
+        self.limit = float(min(initial or maximum, maximum))
+        self.inFlight = 0
+        self.baselines = {}
+        self.lastDecrease = 0
+        self.condition = threading.Condition()
+
+    def expect(self, workers):
+        """Start at the number of workers of a bulk run unless congestion was seen already."""
+        with self.condition:
+            if self.lastDecrease == 0:
+                self.limit = float(max(1, min(workers, self.maximum)))
+                self.condition.notify_all()
+
+    def acquire(self):
+        with self.condition:
+            while self.inFlight >= int(self.limit):
+                self.condition.wait()
+            self.inFlight += 1
+
+    def release(self, name, latency, error=False):
+        with self.condition:
+            self.inFlight -= 1
+            baseline = self.baselines.get(name)
+            spike = baseline is not None and latency > max(3 * baseline, 0.1)
+            if error or spike:
+                # decrease at most once per round trip, concurrent failures
+                # belong to the same congestion event
+                now = time.monotonic()
+                if now - self.lastDecrease > (baseline or latency):
+                    self.limit = max(1.0, self.limit / 2)
+                    self.lastDecrease = now
+            else:
+                self.limit = min(float(self.maximum), self.limit + 1 / self.limit)
+                self.baselines[name] = latency if baseline is None else 0.9 * baseline + 0.1 * latency
+            self.condition.notify_all()
+
+
+_lock = threading.Lock()
+_breakers = {}
+_limiter = None
+
+
+def getBreaker(endpoint):
+  with _lock:
+    if endpoint not in _breakers:
+      _breakers[endpoint] = CircuitBreaker()
+    return _breakers[endpoint]
+
+def getLimiter():
+  global _limiter
+  with _lock:
+    if _limiter is None:
+      _limiter = Limiter(settings.getPoolSize())
+    return _limiter
+
+def isTransient(error):
+  """Return True for errors worth a retry (connection problems, 5xx, 429)."""
+  requests = sys.modules.get("requests")
+  if requests is not None and isinstance(error, (requests.ConnectionError, requests.Timeout)):
+    return True
+  zeepExceptions = sys.modules.get("zeep.exceptions")
+  if zeepExceptions is not None and isinstance(error, zeepExceptions.TransportError):
+    return error.status_code >= 500 or error.status_code == 429
+  return isinstance(error, (ConnectionError, TimeoutError))
+
+def backoff(attempt):
+  return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+
+def call(kind, endpoint, name, func, idempotent=False, failed=None, error=None):
+  """Call func() with retries, circuit breaker and concurrency limit.
+
+  failed(result) tells whether a returned result (e.g. an HTTP response
+  with status 503) is a transient failure. After the last attempt such a
+  result is returned as is. error(result) decides what is recorded as error
+  in the metrics and defaults to failed.
+  """
+  breaker = getBreaker(kind + ":" + endpoint)
+  limiter = getLimiter()
+  attempts = settings.getRetries() + 1 if idempotent else 1
+  for attempt in range(attempts):
+    if not breaker.allow():
+      raise CircuitOpenError("Circuit open for " + endpoint + " after repeated failures")
+    limiter.acquire()
+    start = time.perf_counter()
+    try:
+      result = metrics.timed(kind, name, func, error or failed)
+    except Exception as e:
+      transient = isTransient(e)
+      limiter.release(name, time.perf_counter() - start, error=transient)
+      if not transient:
+        # the endpoint answered (e.g. with a SOAP fault), it is alive
+        breaker.success()
+        raise
+      breaker.failure()
+      if attempt == attempts - 1:
+        raise
+    else:
+      failure = failed is not None and failed(result)
+      limiter.release(name, time.perf_counter() - start, error=failure)
+      if not failure:
+        breaker.success()
+        return result
+      breaker.failure()
+      if attempt == attempts - 1:
+        return result
+    metrics.retry(kind, name)
+    time.sleep(backoff(attempt))
+
+def isIdempotentOperation(operation):
+  return operation.startswith(IDEMPOTENT_OPERATIONS)
@@ -0,0 +1,102 @@
+# Copyright (C) 2022  OX Software GmbH
+#                     Wolfgang Rosenauer
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import metrics
+import resilience
+import settings
+import threading
+
+_lock = threading.RLock()
+_adapter = None
+_session = None
+_circuitOpenError = None
+
+
+def getAdapter():
+  """Return the connection pool shared by all REST and SOAP sessions."""
+  global _adapter
+  with _lock:
+    if _adapter is None:
+      # requests is imported on first use to keep startup of other tools fast
+      from requests.adapters import HTTPAdapter
+      _adapter = HTTPAdapter(pool_connections=4, pool_maxsize=settings.getPoolSize(), pool_block=True)
+    return _adapter
+
+def newSession():
+  from requests import Session
+  session = Session()
+  session.verify = settings.getVerifyTls()
+  session.mount("https://", getAdapter())
+  session.mount("http://", getAdapter())
+  return session
+
+def getSession():
+  global _session
+  with _lock:
+    if _session is None:
+      _session = newSession()
+      _session.auth = settings.getRestCreds()
+    return _session
+
+def circuitOpenError():
+  """Return resilience.CircuitOpenError as a requests exception.
+
+  Callers falling back on RequestException keep doing so while a circuit
+  is open instead of aborting.
+  """
+  global _circuitOpenError
+  with _lock:
+    if _circuitOpenError is None:
+      from requests import ConnectionError
+      class CircuitOpenError(resilience.CircuitOpenError, ConnectionError):
+        pass
+      _circuitOpenError = CircuitOpenError
+    return _circuitOpenError
+
+def request(method, url, retry=True, **kwargs):
+  """Send a request through the shared session.
+
+  Idempotent methods are retried on connection errors and 5xx/429
+  responses, see resilience.call. Pass retry=False for lookups which have
+  a fallback value anyway.
+  """
+  name = metrics.restName(method, url)
+  try:
+    response = resilience.call("rest", name.split(" ", 1)[1], name,
+                               lambda: getSession().request(method, url, **kwargs),
+                               retry and method in resilience.IDEMPOTENT_METHODS, isFailure, isError)
+  except resilience.CircuitOpenError as e:
+    raise circuitOpenError()(*e.args) from None
+  metrics.addBytes(len(response.request.body or b""), len(response.content), "rest", name)
+  return response
+
+def isFailure(response):
+  return response.status_code >= 500 or response.status_code == 429
+
+def isError(response):
+  return response.status_code >= 400
+
+def get(url, **kwargs):
+  return request("GET", url, **kwargs)
+
+def post(url, **kwargs):
+  return request("POST", url, **kwargs)
+
+def put(url, **kwargs):
+  return request("PUT", url, **kwargs)
+
+def delete(url, **kwargs):
+  return request("DELETE", url, **kwargs)
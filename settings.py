@@ -14,6 +14,7 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import os
 import re
 import target
 
@@ -52,3 +53,36 @@ def getProxy():
 
 def getVerifyTls():
   return getattr(target, "verifyTls", True)
+
+def getWsdlCache():
+  if hasattr(target, "wsdlCache"):
+    return os.path.expanduser(target.wsdlCache)
+  return os.path.join(os.path.expanduser("~"), ".cache", "oxcloud-provisioning", "wsdl.sqlite")
+
+def getWsdlCacheTtl():
+  return getattr(target, "wsdlCacheTtl", 86400)
+
+def getPoolSize():
+  return getattr(target, "poolSize", 32)
+
+def getInventory():
+  if hasattr(target, "inventory"):
+    return os.path.expanduser(target.inventory)
+  return os.path.join(os.path.expanduser("~"), ".cache", "oxcloud-provisioning", "inventory.sqlite")
+
+def getContextCache():
+  if hasattr(target, "contextCache"):
+    return os.path.expanduser(target.contextCache)
+  return os.path.join(os.path.expanduser("~"), ".cache", "oxcloud-provisioning", "contexts.sqlite")
+
+def getContextCacheTtl():
+  return getattr(target, "contextCacheTtl", 86400)
+
+def getMetricsFile():
+  return os.environ.get("OXCLOUD_METRICS", getattr(target, "metricsFile", None))
+
+def getRetries():
+  return getattr(target, "retries", 3)
+
+def getFastParse():
+  return getattr(target, "fastParse", True)
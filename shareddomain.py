@@ -17,7 +17,7 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import argparse
-import requests
+import restclient
 import settings
 
 
@@ -48,8 +48,8 @@ def main():
 
 
 def create(args):
-    r = requests.post(settings.getAdminRestHost()+"api/oxaas/v1/admin/sharedmaildomains/"+str(
-        args.domain), auth=(settings.getRestCreds()), verify=settings.getVerifyTls(), proxies=settings.getProxy())
+    r = restclient.post(settings.getAdminRestHost()+"api/oxaas/v1/admin/sharedmaildomains/"+str(
+        args.domain), proxies=settings.getProxy())
     print(r.status_code)
     if r.status_code == 200:
         print("Created shared domain", args.domain)
@@ -59,8 +59,7 @@ def create(args):
 
 
 def delete(args):
-    r = requests.delete(settings.getAdminRestHost()+"api/oxaas/v1/admin/sharedmaildomains/"+str(args.domain),
-                        auth=(settings.getRestCreds()), verify=settings.getVerifyTls(), proxies=settings.getProxy())
+    r = restclient.delete(settings.getAdminRestHost()+"api/oxaas/v1/admin/sharedmaildomains/"+str(args.domain), proxies=settings.getProxy())
     if r.ok:
         print("Deleted shared domain")
     else:
@@ -68,8 +67,7 @@ def delete(args):
 
 
 def list(args):
-    r = requests.get(settings.getAdminRestHost()+"api/oxaas/v1/admin/sharedmaildomains/*",
-                     auth=(settings.getRestCreds()), verify=settings.getVerifyTls(), proxies=settings.getProxy())
+    r = restclient.get(settings.getAdminRestHost()+"api/oxaas/v1/admin/sharedmaildomains/*", proxies=settings.getProxy())
     if r.ok:
         print(r.json())
     else:
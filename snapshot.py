@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+
+# Copyright (C) 2022  OX Software GmbH
+#                     Wolfgang Rosenauer
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import argparse
+import bulk
+import contextcache
+import forwarder
+import gzip
+import hashlib
+import json
+import listuser
+import os
+import records
+import settings
+import soapclient
+import sys
+import time
+import userdetails
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Write a snapshot of the reseller, all contexts and users to a compressed JSONL archive.')
+    parser.add_argument("-o", "--output", help="Archive to write. (Default: snapshot-<timestamp>.jsonl.gz)")
+    parser.add_argument("--previous", help="Previous snapshot, ACN, COS and spamlevel of users whose data did not change "
+                        "are copied from it instead of being looked up again, saving three requests per user. "
+                        "Users, forwarders and catchalls are still fetched for all contexts. The copied values "
+                        "can be stale, run without --previous from time to time.")
+    parser.add_argument("-s", "--search", default="*", help="Only include contexts matching this pattern. (Default: *)")
+    parser.add_argument("-w", "--workers", default=8, type=int,
+                        help="Number of contexts and users fetched concurrently. (Default: 8)")
+    soapclient.addArguments(parser)
+    args = parser.parse_args()
+
+    output = args.output or time.strftime("snapshot-%Y%m%d-%H%M%S.jsonl.gz")
+
+    resellerService = soapclient.getService("OXResellerService")
+    contextService = soapclient.getService("OXResellerContextService")
+    contexts = contextService.raw("list", settings.getCreds()["login"] + "_" + args.search, settings.getCreds(),
+                                  record=records.Context)
+    contexts.sort(key=lambda ctx: ctx.id)
+    previous = readGroups(args.previous) if args.previous else iter(())
+
+    counts = {"fetched": 0, "reused": 0, "detailsFailed": 0, "failed": 0, "users": 0}
+    summary = bulk.Summary()
+
+    def snapshot(item):
+        ctx, group = item
+        return snapshotContext(ctx, group, args.workers)
+
+    # written to a temporary file first, a failed run never replaces a good archive
+    with gzip.open(output + ".tmp", "wt", compresslevel=6) as archive:
+        writeLine(archive, {"type": "reseller", "data": serialize(resellerService.getSelfData(
+            settings.getCreds()["login"], None, settings.getCreds()))})
+        for (ctx, group), result, error in bulk.imap(snapshot, pair(contexts, previous), args.workers):
+            summary.add(error)
+            if error is not None:
+                counts["failed"] += 1
+                print("FAILED context", ctx.id, ctx.name, error, "(keeping the previous data)" if group else "")
+                lines = group[1] if group else []
+            else:
+                fetched, reused, detailsFailed, lines = result
+                counts["fetched"] += fetched
+                counts["reused"] += reused
+                counts["detailsFailed"] += detailsFailed
+            counts["users"] += sum(1 for line in lines if line.startswith('{"type": "user"'))
+            for line in lines:
+                archive.write(line + "\n")
+    os.replace(output + ".tmp", output)
+
+    print("Snapshot written to", output + ":", len(contexts), "contexts ({failed} failed), {users} users "
+          "(details of {fetched} looked up, {reused} reused, {detailsFailed} failed)".format(**counts))
+    print(summary)
+    if counts["failed"]:
+        sys.exit(1)
+
+
+def serialize(obj):
+    """Turn a zeep object into plain data, userAttributes as namespace -> {key: value}."""
+    from zeep.helpers import serialize_object
+    data = serialize_object(obj, dict)
+    if isinstance(data, dict):
+        if "userAttributes" in data:
+            attributes = records.Attributes.fromZeep(obj.userAttributes)
+            data["userAttributes"] = attributes.maps if attributes is not None else None
+        data = {key: value for key, value in data.items() if value is not None}
+    return data
+
+
+def encode(obj):
+    if hasattr(obj, "toDict"):
+        return obj.toDict()
+    return str(obj)
+
+
+def dumps(record, sortKeys=False):
+    return json.dumps(record, default=encode, sort_keys=sortKeys)
+
+
+def writeLine(archive, record):
+    archive.write(dumps(record) + "\n")
+
+
+def fingerprint(data):
+    return hashlib.sha1(dumps(data, True).encode()).hexdigest()
+
+
+def readGroups(path):
+    """Yield (cid, context record, lines) per context of an archive, in the order written."""
+    with gzip.open(path, "rt") as archive:
+        group = None
+        for line in archive:
+            line = line.rstrip("\n")
+            if line.startswith('{"type": "context"'):
+                if group is not None:
+                    yield group
+                record = json.loads(line)
+                group = (record["id"], record, [line])
+            elif group is not None:
+                group[2].append(line)
+        if group is not None:
+            yield group
+
+
+def pair(contexts, groups):
+    """Yield (ctx, (context record, lines) or None) merging the previous groups by context ID."""
+    group = next(groups, None)
+    for ctx in contexts:
+        while group is not None and group[0] < ctx.id:
+            group = next(groups, None)
+        if group is not None and group[0] == ctx.id:
+            yield ctx, (group[1], group[2])
+        else:
+            yield ctx, None
+
+
+def snapshotContext(ctx, group, workers):
+    """Return (details looked up, details reused, details failed, lines) for ctx.
+
+    Users, forwarders and catchalls are always fetched. ACN, COS and
+    spamlevel cost requests per user, they are only looked up for users
+    whose data changed since the previous snapshot. A user whose details
+    cannot be looked up keeps the previous ones (or none) and is marked
+    with detailsFailed, the next run looks them up again.
+    """
+    userService = soapclient.getService("OXResellerUserService")
+    oxaasService = soapclient.getService("OXaaSService")
+    ids = userService.raw("listAll", ctx.ref(), settings.getCreds(), True, fields=listuser.ID_FIELDS)
+    contextLine = dumps({"type": "context", "id": ctx.id, "data": ctx.toDict()})
+
+    from zeep.exceptions import Fault
+
+    previous = {}
+    for line in (group[1][1:] if group is not None else []):
+        record = json.loads(line)
+        if record["type"] == "user":
+            previous[record["id"]] = record
+
+    users = []
+    for user in listuser.fetchUsers(ctx.ref(), ids, userService, 500):
+        userData = serialize(user)
+        users.append({"type": "user", "cid": ctx.id, "id": user.id,
+                      "fingerprint": fingerprint({k: v for k, v in userData.items() if k != "usedQuota"}),
+                      "data": userData})
+
+    ref = contextcache.ContextRef(ctx.ref())
+
+    def details(record):
+        old = previous.get(record["id"])
+        if old is not None and old["fingerprint"] == record["fingerprint"] and not old.get("detailsFailed"):
+            return True, old.get("details", {})
+        try:
+            return False, userdetails.fetchDetails(ref, records.User(id=record["id"]))
+        except Fault:
+            # e.g. guest users without ACN
+            return False, {}
+
+    lines = [contextLine]
+    reused = 0
+    failed = 0
+    for record, result, error in bulk.imap(details, users, workers):
+        if error is not None:
+            # the user data is there, only the details are missing
+            print("FAILED details of user", record["id"], "in context", ctx.id, error)
+            failed += 1
+            record["details"] = previous.get(record["id"], {}).get("details", {})
+            record["detailsFailed"] = True
+        else:
+            cached, record["details"] = result
+            reused += cached
+        lines.append(dumps(record))
+
+    lines.append(dumps({"type": "forwarders", "cid": ctx.id, "data": forwarder.listForwards(ctx.id)}))
+    catchalls = oxaasService.listDomainCatchalls(ctx.id, settings.getCreds()) or []
+    lines.append(dumps({"type": "catchalls", "cid": ctx.id, "data": [str(c) for c in catchalls]}))
+    return len(users) - reused - failed, reused, failed, lines
+
+
+if __name__ == "__main__":
+    main()
@@ -14,34 +14,278 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-from lxml import etree
-from requests import Session
-from zeep import Client
-from zeep import Plugin
-from zeep.transports import Transport
+import argparse
+import io
+import metrics
+import os
+import records
+import resilience
+import restclient
 import settings
+import sqlite3
+import threading
+import time
 import warnings
 
 warnings.filterwarnings("ignore")
 
+# set by --refresh-wsdl, forces all WSDL/XSD documents to be fetched again
+refreshWsdl = False
 
-class MyLoggingPlugin(Plugin):
-    def ingress(self, envelope, http_headers, operation):
-        print(etree.tostring(envelope, pretty_print=False))
-        return envelope, http_headers
+_lock = threading.Lock()
+_session = None
+_services = {}
 
-    def egress(self, envelope, http_headers, operation, binding_options):
-        print(etree.tostring(envelope, pretty_print=False))
-        return envelope, http_headers
+# zeep and lxml are only imported (through soaptransport) once a service is
+# actually used, so tools not talking SOAP start faster
+
+# fields extracted by Service.raw unless others are requested
+FAST_FIELDS = ("id", "name", "primaryEmail", "usedQuota", "maxQuota", "enabled", "mailenabled", "userAttributes")
+INT_FIELDS = {"id", "usedQuota", "maxQuota", "maxUser"}
+BOOL_FIELDS = {"enabled", "mailenabled"}
+LIST_FIELDS = {"aliases"}
+
+
+class Record(dict):
+    """Object parsed by Service.raw, fields can be read as attributes like on zeep objects."""
+
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name)
+
+
+class WsdlCache:
+    """Persistent cache for WSDL and XSD documents.
+
+    Entries younger than ttl seconds are used as they are, older ones are
+    revalidated against the server using ETag/Last-Modified.
+    """
+
+    def __init__(self, path, ttl):
+        self.path = path
+        self.ttl = ttl
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self.connect() as conn:
+            conn.execute("""CREATE TABLE IF NOT EXISTS document
+                            (url TEXT PRIMARY KEY, fetched REAL, etag TEXT,
+                             modified TEXT, content BLOB)""")
+
+    def connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def get(self, url):
+        with self.connect() as conn:
+            return conn.execute(
+                "SELECT fetched, etag, modified, content FROM document WHERE url = ?", (url,)).fetchone()
+
+    def add(self, url, content, etag=None, modified=None):
+        with self.connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO document VALUES (?, ?, ?, ?, ?)",
+                         (url, time.time(), etag, modified, content))
+
+    def touch(self, url):
+        with self.connect() as conn:
+            conn.execute("UPDATE document SET fetched = ? WHERE url = ?", (time.time(), url))
+
+
+class Service:
+    """Wraps a zeep service proxy, operations go through resilience.call."""
+
+    def __init__(self, servicename, proxy, client=None):
+        self.servicename = servicename
+        self.proxy = proxy
+        self.client = client
+
+    def __getattr__(self, name):
+        operation = self.proxy[name]
+        label = self.servicename + "." + name
+        idempotent = resilience.isIdempotentOperation(name)
+
+        def call(*args, **kwargs):
+            return resilience.call("soap", self.servicename, label, lambda: operation(*args, **kwargs),
+                                   idempotent)
+
+        self.__dict__[name] = call
+        return call
+
+    def __getitem__(self, name):
+        return getattr(self, name)
+
+    def raw(self, name, *args, record=Record, fields=None, **kwargs):
+        """Call operation name and return the returned objects as list of records.
+
+        The response is not turned into zeep objects but only the fields
+        of record (a records type, or the given fields for Record) are
+        extracted with a streaming parser while the body is downloaded, which
+        takes a fraction of the CPU time and memory for large list responses.
+        """
+        if fields is None:
+            fields = record.__slots__ if issubclass(record, records.Slotted) else FAST_FIELDS
+        if not settings.getFastParse() or self.client is None:
+            result = getattr(self, name)(*args, **kwargs)
+            result = result if isinstance(result, list) else [] if result is None else [result]
+            if issubclass(record, records.Slotted):
+                return [record.fromZeep(obj) for obj in result]
+            return result
+
+        operation = self.proxy[name]
+
+        def call():
+            with self.client.settings(raw_response=True), self.client.transport.streaming():
+                response = operation(*args, **kwargs)
+            return parseRecords(response, fields, record)
+
+        return resilience.call("soap", self.servicename, self.servicename + "." + name, call,
+                               resilience.isIdempotentOperation(name))
+
+
+class RefreshWsdlAction(argparse.Action):
+    def __call__(self, parser, namespace, values, option_string=None):
+        global refreshWsdl
+        refreshWsdl = True
+        # services built before (e.g. by an earlier command in oxshell) have
+        # parsed the old documents, they are built again on next use
+        clearServices()
+        setattr(namespace, self.dest, True)
+
+
+class CountingReader:
+    """File-like view of a streamed response body, counting the bytes read."""
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.raw.decode_content = True
+        self.count = 0
+
+    def read(self, size=-1):
+        data = self.raw.read(size if size is not None and size >= 0 else None)
+        self.count += len(data)
+        return data
+
+
+def parseRecords(response, fields, record=Record):
+  """Parse the return elements of a raw SOAP response into records.
+
+  A streamed response (see soaptransport.CachingTransport.streaming) is
+  parsed while it is read from the connection, the body is never held
+  in memory as a whole.
+  """
+  from lxml import etree
+  try:
+    if response.status_code != 200:
+      raiseFault(response)
+    fields = set(fields)
+    result = []
+    body = CountingReader(response.raw) if response.raw is not None else io.BytesIO(response.content)
+    for event, element in etree.iterparse(body, tag="{*}return"):
+      parent = element.getparent()
+      if parent is None or not etree.QName(parent).localname.endswith("Response"):
+        continue
+      result.append(parseRecord(element, fields, record))
+      # drop what has been parsed, memory stays flat for large responses
+      element.clear()
+      while element.getprevious() is not None:
+        del parent[0]
+    if isinstance(body, CountingReader):
+      metrics.addBytes(0, body.count)
+    return result
+  finally:
+    response.close()
+
+def parseRecord(element, fields, record=Record):
+  from lxml import etree
+  if len(element) == 0:
+    return parseValue(None, element)
+  values = {name: [] for name in fields & LIST_FIELDS}
+  for child in element:
+    name = etree.QName(child).localname
+    if name not in fields:
+      continue
+    if name == "userAttributes":
+      # zeep returns None for an empty map as well
+      values[name] = parseAttributes(child) if len(child) else None
+    elif name in LIST_FIELDS:
+      values[name].append(child.text)
+    else:
+      values[name] = parseValue(name, child)
+  if record is Record:
+    return Record((name, values.get(name)) for name in fields)
+  for name in fields & LIST_FIELDS:
+    values[name] = tuple(values[name])
+  return record(**values)
+
+def parseAttributes(element):
+  """Parse userAttributes (a map of maps) into records.Attributes."""
+  maps = {}
+  for entry in element.iterchildren("{*}entries"):
+    maps[entry.findtext("{*}key")] = {item.findtext("{*}key"): parseValue(None, item.find("{*}value"))
+                                      for item in entry.iterfind("{*}value/{*}entries")}
+  return records.Attributes(maps)
+
+def parseValue(name, element):
+  if element is None or element.get("{http://www.w3.org/2001/XMLSchema-instance}nil") == "true":
+    return None
+  text = element.text or ""
+  if name in INT_FIELDS:
+    return int(text)
+  if name in BOOL_FIELDS:
+    return text == "true"
+  return text
+
+def raiseFault(response):
+  from lxml import etree
+  from zeep.exceptions import Fault, TransportError
+  try:
+    fault = etree.fromstring(response.content).find(".//{*}Fault")
+  except etree.XMLSyntaxError:
+    fault = None
+  if fault is not None:
+    raise Fault(message=fault.findtext("{*}faultstring"), code=fault.findtext("{*}faultcode"))
+  raise TransportError(status_code=response.status_code, content=response.content)
+
+def addArguments(parser):
+  parser.add_argument("--refresh-wsdl", nargs=0, default=False, action=RefreshWsdlAction,
+                      help="Ignore cached WSDL/XSD documents and fetch them again.")
+
+def getSession():
+  """Return the session used for SOAP, sharing the pool of restclient."""
+  global _session
+  with _lock:
+    if _session is None:
+      _session = restclient.newSession()
+      _session.proxies = settings.getProxy()
+    return _session
+
+def clearServices():
+  """Forget the memoized services."""
+  with _lock:
+    _services.clear()
 
 def getService(servicename, dump=False):
+  """Return the (memoized) service proxy for servicename."""
+  key = (servicename, dump)
+  with _lock:
+    if key in _services:
+      return _services[key]
 
-  session = Session()
-  session.verify = settings.getVerifyTls()
+  from zeep import Client
+  from soaptransport import CachingTransport, MyLoggingPlugin
 
-  transport = Transport(session = session)
-  transport.session.proxies = settings.getProxy()
+  transport = CachingTransport(WsdlCache(settings.getWsdlCache(), settings.getWsdlCacheTtl()),
+                               session = getSession())
 
   plugins = [MyLoggingPlugin()] if dump else []
 
-  return Client(settings.getHost()+servicename+"?wsdl", plugins = plugins, transport = transport).service
+  client = Client(settings.getHost()+servicename+"?wsdl", plugins = plugins, transport = transport)
+  service = Service(servicename, client.service, client)
+  with _lock:
+    return _services.setdefault(key, service)
+
+def __getattr__(name):
+  # keep soapclient.MyLoggingPlugin and soapclient.CachingTransport working
+  if name in ("MyLoggingPlugin", "CachingTransport"):
+    import soaptransport
+    return getattr(soaptransport, name)
+  raise AttributeError(name)
@@ -0,0 +1,84 @@
+# Copyright (C) 2022  OX Software GmbH
+#                     Wolfgang Rosenauer
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from contextlib import contextmanager
+from lxml import etree
+from zeep import Plugin
+from zeep.transports import Transport
+import metrics
+import soapclient
+import threading
+import time
+
+
+class MyLoggingPlugin(Plugin):
+    def ingress(self, envelope, http_headers, operation):
+        print(etree.tostring(envelope, pretty_print=False))
+        return envelope, http_headers
+
+    def egress(self, envelope, http_headers, operation, binding_options):
+        print(etree.tostring(envelope, pretty_print=False))
+        return envelope, http_headers
+
+
+class CachingTransport(Transport):
+    """Transport which serves WSDL/XSD documents from a WsdlCache."""
+
+    def __init__(self, wsdlCache, **kwargs):
+        super().__init__(**kwargs)
+        self.wsdlCache = wsdlCache
+        self.local = threading.local()
+
+    @contextmanager
+    def streaming(self):
+        """Return responses posted in this thread unread, the caller consumes and closes them."""
+        self.local.stream = True
+        try:
+            yield
+        finally:
+            self.local.stream = False
+
+    def post(self, address, message, headers):
+        if getattr(self.local, "stream", False):
+            response = self.session.post(address, data=message, headers=headers,
+                                         timeout=self.operation_timeout, stream=True)
+            # the received bytes are counted by the reader of the body
+            metrics.addBytes(len(message), 0)
+            return response
+        response = super().post(address, message, headers)
+        metrics.addBytes(len(message), len(response.content))
+        return response
+
+    def _load_remote_data(self, url):
+        entry = None if soapclient.refreshWsdl else self.wsdlCache.get(url)
+        headers = {}
+        if entry is not None:
+            fetched, etag, modified, content = entry
+            if time.time() - fetched < self.wsdlCache.ttl:
+                return bytes(content)
+            if etag:
+                headers["If-None-Match"] = etag
+            if modified:
+                headers["If-Modified-Since"] = modified
+
+        response = self.session.get(url, headers=headers, timeout=self.load_timeout)
+        if response.status_code == 304 and entry is not None:
+            self.wsdlCache.touch(url)
+            return bytes(entry[3])
+        response.raise_for_status()
+        self.wsdlCache.add(url, response.content, response.headers.get("ETag"),
+                           response.headers.get("Last-Modified"))
+        return response.content
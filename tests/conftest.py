@@ -0,0 +1,72 @@
+# Copyright (C) 2022  OX Software GmbH
+#                     Wolfgang Rosenauer
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Shared fixtures: the tools talk to the stand-in server of the benchmarks.
+
+A target module is registered before any tool is imported, so the tests
+never pick up a target.py pointing to a real server.
+"""
+
+import os
+import sys
+import types
+
+import pytest
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [REPO, os.path.join(REPO, "benchmarks")]
+
+target = types.ModuleType("target")
+target.soapHost = target.restHost = "http://127.0.0.1:1/"
+target.login = "brand"
+target.password = "secret"
+sys.modules["target"] = target
+
+import fakeserver
+import resilience
+
+CONTEXTS = 2
+USERS = 5
+
+
+@pytest.fixture(scope="session")
+def server(tmp_path_factory):
+    cache = tmp_path_factory.mktemp("cache")
+    server = fakeserver.serve()
+    target.soapHost = target.restHost = "http://%s:%d/" % server.server_address[:2]
+    target.wsdlCache = str(cache / "wsdl.sqlite")
+    target.contextCache = str(cache / "contexts.sqlite")
+    target.inventory = str(cache / "inventory.sqlite")
+    yield server
+    server.shutdown()
+
+
+@pytest.fixture
+def state(server):
+    """Return the server state, reset to CONTEXTS contexts with USERS users each."""
+    server.state = fakeserver.State(CONTEXTS, USERS)
+    server.stats = {}
+    server.errorRate = 0.0
+    yield server.state
+    server.errorRate = 0.0
+
+
+@pytest.fixture(autouse=True)
+def resilienceState(monkeypatch):
+    """Give every test closed circuits and no backoff delays."""
+    monkeypatch.setattr(resilience, "_breakers", {})
+    monkeypatch.setattr(resilience, "_limiter", None)
+    monkeypatch.setattr(resilience, "backoff", lambda attempt: 0)
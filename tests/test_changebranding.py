@@ -0,0 +1,60 @@
+# Copyright (C) 2022  OX Software GmbH
+#                     Wolfgang Rosenauer
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import sys
+
+import changebranding
+
+
+def run(monkeypatch, *argv):
+    monkeypatch.setattr(sys, "argv", ["changebranding.py"] + list(argv))
+    changebranding.main()
+
+
+def configuration(state):
+    return {entry["key"]: entry["value"] for entry in state.reseller["configuration"].get("entries", [])}
+
+
+def test_read_properties(tmp_path):
+    path = tmp_path / "theme.properties"
+    path.write_text("# comment\n indented=x\n\na=1\nb=x=y\n")
+    assert list(changebranding.readProperties(str(path))) == [("a", "1"), ("b", "x=y")]
+
+
+def test_config_import_sends_only_deltas(state, server, tmp_path, monkeypatch, capsys):
+    path = tmp_path / "theme.properties"
+    path.write_text("a=1\nb=2\n")
+    run(monkeypatch, "--configimport", str(path))
+    assert configuration(state) == {"a": "1", "b": "2"}
+    assert "2 added or changed, 0 removed, 0 unchanged" in capsys.readouterr().out
+
+    path.write_text("a=1\nb=3\n")
+    run(monkeypatch, "--configimport", str(path), "--plan")
+    assert "~ b: 2 -> 3" in capsys.readouterr().out
+    assert configuration(state) == {"a": "1", "b": "2"}
+
+    server.stats.clear()
+    run(monkeypatch, "--configimport", str(path))
+    assert configuration(state) == {"a": "1", "b": "3"}
+    run(monkeypatch, "--configimport", str(path))
+    assert "Configuration already up to date" in capsys.readouterr().out
+    assert server.stats["soap:OXResellerService.changeSelf"] == 1
+
+
+def test_remove_several_properties(state, server, monkeypatch):
+    state.reseller["configuration"] = {"entries": [{"key": key, "value": "x"} for key in ("a", "b", "c")]}
+    run(monkeypatch, "--remove-config", "a,b,missing")
+    assert configuration(state) == {"c": "x"}
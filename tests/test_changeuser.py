@@ -0,0 +1,60 @@
+# Copyright (C) 2022  OX Software GmbH
+#                     Wolfgang Rosenauer
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import argparse
+import sys
+
+import changeuser
+import records
+
+
+def user(config):
+    return records.User(id=3, userAttributes=records.Attributes({"config": config}))
+
+
+def test_config_delta_only_returns_differences():
+    wanted = {"a": "1", "b": "3", "d": "4"}
+    assert changeuser.configDelta(user({"a": "1", "b": "2"}), wanted) == {"b": "3", "d": "4"}
+
+
+def test_config_delta_removes_present_properties_only():
+    wanted = {"a": None, "c": None}
+    assert changeuser.configDelta(user({"a": "1"}), wanted) == {"a": None}
+
+
+def test_config_delta_without_attributes():
+    assert changeuser.configDelta(records.User(id=3), {"a": "1"}) == {"a": "1"}
+
+
+def test_read_config_from_file_and_option(tmp_path):
+    path = tmp_path / "config.properties"
+    path.write_text("# comment\na=1\nb=x=y\n")
+    args = argparse.Namespace(config=str(path), remove_config="c")
+    assert changeuser.readConfig(args) == {"a": "1", "b": "x=y", "c": None}
+    args = argparse.Namespace(config="a=1,b=2", remove_config=None)
+    assert changeuser.readConfig(args) == {"a": "1", "b": "2"}
+
+
+def test_bulk_change_skips_compliant_users(state, server, monkeypatch, capsys):
+    argv = ["changeuser.py", "-c", "1", "--match", "*", "--config", "com.example.flag=true"]
+    monkeypatch.setattr(sys, "argv", argv)
+    changeuser.main()
+    # the context admin is matched as well
+    assert server.stats["soap:OXResellerUserService.change"] == len(state.users[1])
+    server.stats.clear()
+    changeuser.main()
+    assert "soap:OXResellerUserService.change" not in server.stats
+    assert "Skipped {} users already compliant".format(len(state.users[1])) in capsys.readouterr().out
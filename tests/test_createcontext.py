@@ -0,0 +1,75 @@
+# Copyright (C) 2022  OX Software GmbH
+#                     Wolfgang Rosenauer
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import sys
+
+import pytest
+
+import createcontext
+
+
+def run(monkeypatch, batch, *argv):
+    monkeypatch.setattr(sys, "argv", ["createcontext.py", "--batch", str(batch)] + list(argv))
+    createcontext.main()
+
+
+def names(state):
+    return sorted(ctx["name"] for ctx in state.contexts.values())
+
+
+def test_batch_creates_missing_contexts(state, server, tmp_path, monkeypatch, capsys):
+    batch = tmp_path / "contexts.csv"
+    batch.write_text("context_name,quota\nctx0,100\nnew1,100\nnew2,200\nnew1,100\n")
+    run(monkeypatch, batch)
+    output = capsys.readouterr().out
+    assert "EXISTS ctx0 1" in output
+    assert "DUPLICATE new1 in the batch file" in output
+    assert names(state) == ["brand_ctx0", "brand_ctx1", "brand_new1", "brand_new2"]
+    # one list call for all existing names
+    assert server.stats["soap:OXResellerContextService.list"] == 1
+
+    run(monkeypatch, batch, "--resume")
+    # the duplicate row has the key of a done one as well
+    assert "Skipped 4 items done in a previous run" in capsys.readouterr().out
+    assert len(state.contexts) == 4
+
+
+def test_batch_reports_blank_names(state, server, tmp_path, monkeypatch, capsys):
+    batch = tmp_path / "contexts.csv"
+    batch.write_text("context_name,quota\n ,100\nnew1,100\n")
+    with pytest.raises(SystemExit) as exit:
+        run(monkeypatch, batch)
+    assert exit.value.code == 1
+    assert "INVALID row without context_name" in capsys.readouterr().out
+    assert "brand_new1" in names(state)
+
+
+def test_batch_detects_concurrent_creation(state, server, tmp_path, monkeypatch, capsys):
+    from zeep.exceptions import Fault
+
+    def createdElsewhere(client, name, *args):
+        if name == "race":
+            state.addContext("brand_race", 100)
+        raise Fault("Context already exists")
+
+    monkeypatch.setattr(createcontext, "createContext", createdElsewhere)
+    batch = tmp_path / "contexts.csv"
+    batch.write_text("context_name\nrace\nbroken\n")
+    with pytest.raises(SystemExit):
+        run(monkeypatch, batch)
+    output = capsys.readouterr().out
+    assert "EXISTS race (created concurrently)" in output
+    assert "FAILED broken Context already exists" in output
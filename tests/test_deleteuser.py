@@ -0,0 +1,51 @@
+# Copyright (C) 2022  OX Software GmbH
+#                     Wolfgang Rosenauer
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import argparse
+import sys
+
+import pytest
+
+import deleteuser
+
+
+def test_uid_list():
+    assert deleteuser.uidList("3") == [3]
+    assert deleteuser.uidList("3, 4,") == [3, 4]
+
+
+@pytest.mark.parametrize("value", ["abc", "3,x", ","])
+def test_uid_list_rejects_invalid(value):
+    with pytest.raises(argparse.ArgumentTypeError):
+        deleteuser.uidList(value)
+
+
+def test_invalid_uid_is_a_usage_error(monkeypatch, capsys):
+    monkeypatch.setattr(sys, "argv", ["deleteuser.py", "-c", "1", "-u", "abc"])
+    with pytest.raises(SystemExit) as exit:
+        deleteuser.main()
+    assert exit.value.code == 2
+    assert "expected numeric UIDs" in capsys.readouterr().err
+
+
+def test_bulk_delete(state, server, monkeypatch, capsys):
+    monkeypatch.setattr(sys, "argv", ["deleteuser.py", "-c", "1", "-u", "3,4", "-e", "user3@ctx0.example.com,nobody"])
+    # a user that is not found counts as failure
+    with pytest.raises(SystemExit) as exit:
+        deleteuser.main()
+    assert exit.value.code == 1
+    assert "NOT FOUND nobody" in capsys.readouterr().out
+    assert sorted(state.users[1]) == [2, 6]
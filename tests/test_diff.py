@@ -0,0 +1,91 @@
+# Copyright (C) 2022  OX Software GmbH
+#                     Wolfgang Rosenauer
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import io
+import json
+
+import pytest
+
+import diff
+
+OLD = [
+    {"type": "reseller", "data": {"name": "brand", "maxQuota": 10}},
+    {"type": "context", "id": 1, "data": {"name": "brand_ctx0", "maxQuota": 1024, "usedQuota": 5}},
+    {"type": "user", "cid": 1, "id": 2, "data": {"name": "a@example.com", "usedQuota": 1,
+                                                  "userAttributes": {"config": {"k": "v"}}},
+     "details": {"acn": "cloud_pim", "cos": "gold"}},
+    {"type": "user", "cid": 1, "id": 3, "data": {"name": "b@example.com"}, "details": {}},
+    {"type": "forwarders", "cid": 1, "data": {"info": ["a@example.com"]}},
+    {"type": "catchalls", "cid": 1, "data": ["example.com:a"]},
+]
+
+NEW = [
+    {"type": "reseller", "data": {"name": "brand", "maxQuota": 10}},
+    {"type": "context", "id": 1, "data": {"name": "brand_ctx0", "maxQuota": 2048, "usedQuota": 9}},
+    {"type": "user", "cid": 1, "id": 2, "data": {"name": "a@example.com", "usedQuota": 7,
+                                                  "userAttributes": {"config": {"k": "w"}}},
+     "details": {"acn": "cloud_pim", "cos": "silver"}},
+    {"type": "user", "cid": 1, "id": 4, "data": {"name": "c@example.com"}, "details": {}},
+    {"type": "forwarders", "cid": 1, "data": {"info": ["a@example.com", "c@example.com"]}},
+    {"type": "catchalls", "cid": 1, "data": []},
+]
+
+
+def write(path, records):
+    path.write_text("".join(json.dumps(record) + "\n" for record in records))
+    return str(path)
+
+
+def compare(tmp_path, types=diff.TYPES, ignore=("usedQuota",)):
+    old = write(tmp_path / "old.jsonl", OLD)
+    new = write(tmp_path / "new.jsonl", NEW)
+    conn = diff.buildIndex(str(tmp_path / "index.db"), diff.entries(old, set(types), set(ignore)))
+    return list(diff.compare(conn, diff.entries(new, set(types), set(ignore))))
+
+
+def test_flatten():
+    data = {"name": "a", "usedQuota": 1, "userAttributes": {"config": {"k": "v", "x": "y"}}, "nested": {"a": 1}}
+    assert diff.flatten(data, {"usedQuota", "config:x"}) == {"name": "a", "config:k": "v", "nested.a": 1}
+
+
+@pytest.mark.parametrize("batch", [1, 1000])
+def test_compare(tmp_path, monkeypatch, batch):
+    monkeypatch.setattr(diff, "BATCH", batch)
+    changes = {(change["change"], change["key"]): change for change in compare(tmp_path)}
+    assert sorted(changes) == [
+        ("added", "user/1/4"), ("changed", "context/1"), ("changed", "forwarder/1/info"), ("changed", "user/1/2"),
+        ("removed", "catchall/1/example.com:a"), ("removed", "user/1/3")]
+    assert changes[("changed", "context/1")]["changes"] == {"maxQuota": [1024, 2048]}
+    assert changes[("changed", "user/1/2")]["changes"] == {"config:k": ["v", "w"], "details.cos": ["gold", "silver"]}
+    assert changes[("removed", "user/1/3")]["label"] == "b@example.com"
+
+
+def test_compare_removed_last(tmp_path):
+    kinds = [change["change"] for change in compare(tmp_path)]
+    assert kinds.index("removed") == len(kinds) - kinds.count("removed")
+
+
+def test_compare_types_and_ignore(tmp_path):
+    changes = compare(tmp_path, types=["context"], ignore=())
+    assert [change["changes"] for change in changes] == [{"maxQuota": [1024, 2048], "usedQuota": [5, 9]}]
+
+
+def test_write_text():
+    change = diff.change("changed", "context/1", "context", "brand_ctx0", changes={"maxQuota": [1024, 2048]})
+    output = io.StringIO()
+    diff.writeText(output, change)
+    assert output.getvalue().startswith("~ context")
+    assert output.getvalue().endswith("brand_ctx0: maxQuota 1024 -> 2048\n")
@@ -0,0 +1,60 @@
+# Copyright (C) 2022  OX Software GmbH
+#                     Wolfgang Rosenauer
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import sys
+
+import pytest
+
+import forwarder
+
+
+def test_read_forwards_merges_aliases(tmp_path):
+    path = tmp_path / "forwards.csv"
+    path.write_text("alias,targets\n"
+                    "# comment\n"
+                    "info,b@example.com;a@example.com\n"
+                    "sales,c@example.com,d@example.com\n"
+                    "info,c@example.com b@example.com\n"
+                    "\n"
+                    "empty,\n")
+    assert forwarder.readForwards(str(path)) == {
+        "info": ["a@example.com", "b@example.com", "c@example.com"],
+        "sales": ["c@example.com", "d@example.com"],
+        "empty": []}
+
+
+def test_import_forwards(state, server, tmp_path, monkeypatch, capsys):
+    state.forwards["1"] = {"old": ["x@example.com"], "keep": ["y@example.com"]}
+    path = tmp_path / "forwards.csv"
+    path.write_text("keep,y@example.com\ninfo,a@example.com\ninfo,b@example.com\n")
+    monkeypatch.setattr(sys, "argv", ["forwarder.py", "import", "-c", "1", "-f", str(path), "--delete"])
+    forwarder.main()
+    output = capsys.readouterr().out
+    assert "Created forwarder info to a@example.com,b@example.com" in output
+    assert "Deleted forwarder old" in output
+    assert "Skipped 1 unchanged forwarders" in output
+    assert forwarder.listForwards(1) == {"info": ["a@example.com", "b@example.com"], "keep": ["y@example.com"]}
+
+
+def test_import_reports_empty_targets(state, server, tmp_path, monkeypatch, capsys):
+    path = tmp_path / "forwards.csv"
+    path.write_text("info,a@example.com\nempty,\n")
+    monkeypatch.setattr(sys, "argv", ["forwarder.py", "import", "-c", "1", "-f", str(path)])
+    with pytest.raises(SystemExit) as exit:
+        forwarder.main()
+    assert exit.value.code == 1
+    assert "INVALID forwarder empty without targets" in capsys.readouterr().out
+    assert forwarder.listForwards(1) == {"info": ["a@example.com"]}
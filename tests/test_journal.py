@@ -0,0 +1,106 @@
+# Copyright (C) 2022  OX Software GmbH
+#                     Wolfgang Rosenauer
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import argparse
+import json
+import sys
+import types
+
+import pytest
+
+import createuser
+import journal
+
+
+def states(path):
+    return [(record["key"], record["state"]) for record in map(json.loads, open(path))]
+
+
+def test_pending_syncs_started_records_before_yielding(tmp_path):
+    path = str(tmp_path / "run.journal")
+    log = journal.Journal(path)
+    items = log.pending(["a", "b"], str)
+    assert next(items) == "a"
+    # both started records are on disk before the first item is processed
+    assert states(path) == [("a", journal.STARTED), ("b", journal.STARTED)]
+    log.finish("a")
+    log.finish("b", "boom")
+    assert list(items) == ["b"]
+    log.close()
+    assert states(path)[2:] == [("a", journal.DONE), ("b", journal.FAILED)]
+
+
+def test_resume_skips_done_items(tmp_path):
+    path = str(tmp_path / "run.journal")
+    log = journal.Journal(path)
+    for key in log.pending(["a", "b", "c"], str):
+        if key == "a":
+            log.finish(key)
+        elif key == "b":
+            log.finish(key, "boom")
+    log.close()
+
+    log = journal.Journal(path, resume=True)
+    assert list(log.pending(["a", "b", "c", "d"], str)) == ["b", "c", "d"]
+    assert log.skipped == 1
+    assert log.completed("a")
+    assert log.interrupted("c") and not log.interrupted("b")
+    assert log.attempted("b") and log.attempted("c")
+    assert not log.attempted("a") and not log.attempted("d")
+    log.close()
+
+
+def test_torn_last_line_is_ignored(tmp_path):
+    path = tmp_path / "run.journal"
+    path.write_text('{"key": "a", "state": "done"}\n{"key": "b", "sta')
+    assert journal.readStates(str(path)) == {"a": journal.DONE}
+
+
+def test_without_path_nothing_is_written():
+    log = journal.Journal()
+    assert list(log.pending(["a"], str)) == ["a"]
+    log.finish("a")
+    log.close()
+
+
+def test_resume_needs_a_journal():
+    with pytest.raises(SystemExit):
+        journal.newJournal(argparse.Namespace(journal=None, resume=True))
+
+
+def test_createuser_resume_completes_failed_rows(state, server, tmp_path, monkeypatch, capsys):
+    batch = tmp_path / "users.csv"
+    batch.write_text("email,password,firstname,lastname,quota,access_combination,spamlevel\n"
+                     "new1@ctx0.example.com,secret,A,B,100,cloud_pim,high\n"
+                     "new2@ctx0.example.com,secret,A,B,100,cloud_pim,\n")
+    monkeypatch.setattr(sys, "argv", ["createuser.py", "-c", "1", "--batch", str(batch)])
+    applySpamlevel = createuser.applySpamlevel
+    # the user is created, setting its spamlevel fails
+    monkeypatch.setattr(createuser, "applySpamlevel", lambda *args: types.SimpleNamespace(status_code=500))
+    createuser.main()
+    assert "FAILED new1@ctx0.example.com created as" in capsys.readouterr().out
+    count = len(state.users[1])
+
+    monkeypatch.setattr(createuser, "applySpamlevel", applySpamlevel)
+    monkeypatch.setattr(sys, "argv", sys.argv + ["--resume"])
+    server.stats.clear()
+    createuser.main()
+    output = capsys.readouterr().out
+    assert "OK new1@ctx0.example.com" in output
+    assert "Skipped 1 items done in a previous run" in output
+    assert len(state.users[1]) == count
+    assert "soap:OXResellerUserService.createByModuleAccessName" not in server.stats
+    assert server.stats["soap:OXaaSService.setMailQuota"] == 1
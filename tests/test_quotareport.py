@@ -0,0 +1,66 @@
+# Copyright (C) 2022  OX Software GmbH
+#                     Wolfgang Rosenauer
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import argparse
+import io
+
+import listuser
+import quotareport
+import records
+import settings
+import soapclient
+
+
+def contexts():
+    contextService = soapclient.getService("OXResellerContextService")
+    return contextService.raw("list", "brand_*", settings.getCreds(), record=records.Context)
+
+
+def test_report_totals_and_top():
+    report = quotareport.Report(top=1, threshold=50)
+    report.add({"record": "context", "cid": 1, "uid": None, "name": "brand_ctx0", "usedQuota": 60, "maxQuota": 100})
+    for uid, used in ((3, 10), (4, 80)):
+        report.add({"record": "user", "cid": 1, "uid": uid, "name": "u%d" % uid, "usedQuota": used,
+                    "maxQuota": 100, "mailUsage": "-", "mailQuota": "-"})
+    assert report.totals["users"] == 2
+    assert report.totals["usedQuota"] == 90
+    assert report.over == {"contexts": 1, "users": 1, "mailboxes": 0}
+    assert report.largest["users"] == [(80, 1, 4, "u4")]
+
+
+def test_collect_reports_failed_contexts(state, server, monkeypatch):
+    fetchUsers = listuser.fetchUsers
+
+    def failing(ctx, ids, *args):
+        if ctx["id"] == 1:
+            raise ConnectionError("unreachable")
+        return fetchUsers(ctx, ids, *args)
+
+    monkeypatch.setattr(listuser, "fetchUsers", failing)
+    args = argparse.Namespace(workers=4, skip_mail=True)
+    rows = list(quotareport.collect(contexts(), args))
+    assert rows[0]["record"] == "failed"
+    assert rows[0]["name"] == "unreachable"
+    assert [row["record"] for row in rows[1:]] == ["context"] + ["user"] * len(state.users[2])
+
+    report = quotareport.Report(10, 90)
+    for row in rows:
+        report.add(row)
+    assert report.failed == ["brand_ctx0"]
+    assert report.totals["contexts"] == 1
+    output = io.StringIO()
+    report.write(output)
+    assert "Failed to fetch 1 contexts" in output.getvalue()
@@ -0,0 +1,109 @@
+# Copyright (C) 2022  OX Software GmbH
+#                     Wolfgang Rosenauer
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import json
+import sys
+
+import reconcile
+import records
+import userdetails
+
+
+def live(users=(), details=None, forwarders=None, catchalls=()):
+    return {"brand_ctx0": {
+        "context": records.Context(id=1, name="brand_ctx0", maxQuota=1024),
+        "users": {user.name: user for user in users},
+        "forwarders": forwarders or {},
+        "catchalls": set(catchalls),
+        "details": details or {}}}
+
+
+def descriptions(operations):
+    return [operation.description for operation in operations]
+
+
+def test_normalize_cos():
+    assert userdetails.normalizeCos(["gold", "mail"]) == "gold,mail"
+    assert userdetails.normalizeCos("gold, mail") == "gold,mail"
+    assert userdetails.normalizeCos("") == ""
+    assert userdetails.normalizeCos(None) is None
+
+
+def test_check_manifest():
+    manifest = {"contexts": [{"users": []}, {"name": "ctx0", "users": [{}], "catchalls": [{"domain": "x"}]}]}
+    assert reconcile.checkManifest(manifest) == [
+        "context without name", "user without email in context ctx0",
+        "catchall without domain or user in context ctx0"]
+
+
+def test_plan_creates_missing_context_and_users():
+    manifest = {"contexts": [{"name": "new", "users": [{"email": "a@new.example.com", "spamlevel": "high"}]}]}
+    operations = reconcile.plan(manifest, {}, {})
+    assert descriptions(operations) == ["+ context brand_new", "+ user a@new.example.com in brand_new"]
+    assert [operation.phase for operation in operations] == [reconcile.CONTEXTS, reconcile.USERS]
+    # createByModuleAccessName, setMailQuota and the spamlevel
+    assert operations[1].calls == 3
+
+
+def test_plan_is_empty_when_state_matches():
+    user = records.User(id=3, name="a@ctx0.example.com", maxQuota=100, aliases=("a@ctx0.example.com",))
+    manifest = {"contexts": [{"name": "ctx0", "quota": 1024, "prune": True,
+                              "users": [{"email": "a@ctx0.example.com", "quota": 100, "cos": ["gold", "mail"]}],
+                              "forwarders": {"info": ["b@example.com", "a@example.com"]},
+                              "catchalls": [{"domain": "ctx0.example.com", "user": "a"}]}]}
+    state = live([user], {3: {"cos": "gold,mail"}}, {"info": ["a@example.com", "b@example.com"]},
+                 [("ctx0.example.com", "a")])
+    assert reconcile.plan(manifest, state, {}) == []
+
+
+def test_plan_changes_only_differing_user_fields():
+    user = records.User(id=3, name="a@ctx0.example.com", maxQuota=100, aliases=())
+    manifest = {"contexts": [{"name": "ctx0", "users": [{"email": "a@ctx0.example.com", "quota": 200,
+                                                         "cos": "gold", "spamlevel": "low"}]}]}
+    state = live([user], {3: {"cos": "gold", "spamlevel": "high"}})
+    operations = reconcile.plan(manifest, state, {})
+    assert descriptions(operations) == [
+        "~ user a@ctx0.example.com in brand_ctx0: quota 100 -> 200, spamlevel high -> low"]
+    # change and setMailQuota for the quota, the spamlevel PUT
+    assert operations[0].calls == 3
+
+
+def test_plan_prunes_everything_not_in_manifest():
+    admin = records.User(id=2, name="admin@ctx0.example.com")
+    other = records.User(id=3, name="b@ctx0.example.com")
+    manifest = {"contexts": [{"name": "ctx0", "prune": True}]}
+    state = live([admin, other], forwarders={"info": ["a@example.com"]}, catchalls=[("ctx0.example.com", "b")])
+    operations = reconcile.plan(manifest, state, {})
+    assert descriptions(operations) == [
+        "- catchall ctx0.example.com -> b in brand_ctx0", "- forwarder info in brand_ctx0",
+        "- user b@ctx0.example.com in brand_ctx0"]
+    assert [operation.phase for operation in operations] == [reconcile.CLEANUP, reconcile.CLEANUP, reconcile.PRUNE]
+
+
+def test_reconcile_converges(state, server, tmp_path, monkeypatch, capsys):
+    manifest = tmp_path / "manifest.json"
+    manifest.write_text(json.dumps({"contexts": [
+        {"name": "ctx0", "users": [{"email": "user1@ctx0.example.com", "cos": "gold,mail", "spamlevel": "high"},
+                                   {"email": "new@ctx0.example.com", "cos": ["gold"]}],
+         "forwarders": {"info": ["user1@ctx0.example.com"]}},
+        {"name": "other", "users": [{"email": "a@other.example.com"}]}]}))
+    monkeypatch.setattr(sys, "argv", ["reconcile.py", str(manifest)])
+    reconcile.main()
+    output = capsys.readouterr().out
+    assert "FAILED" not in output
+    assert "+ context brand_other" in output
+    reconcile.main()
+    assert "0 operations, 0 API calls" in capsys.readouterr().out
@@ -0,0 +1,57 @@
+# Copyright (C) 2022  OX Software GmbH
+#                     Wolfgang Rosenauer
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import types
+
+import records
+
+
+def zeepMap(maps):
+    """Build userAttributes the way zeep returns them."""
+    return types.SimpleNamespace(entries=[
+        types.SimpleNamespace(key=ns, value=types.SimpleNamespace(entries=[
+            types.SimpleNamespace(key=key, value=value) for key, value in values.items()]))
+        for ns, values in maps.items()])
+
+
+def test_slotted_defaults_and_dict():
+    user = records.User(id=3, name="a@example.com")
+    assert user.maxQuota is None
+    assert user["name"] == "a@example.com"
+    assert user.toDict()["id"] == 3
+    assert not hasattr(user, "__dict__")
+
+
+def test_from_zeep():
+    obj = types.SimpleNamespace(id=3, name="a@example.com", aliases=["a@example.com"], display_name="A",
+                                userAttributes=zeepMap({"config": {"k": "v"}, "cloud": {"service": "gold"}}))
+    user = records.User.fromZeep(obj)
+    assert user.aliases == ("a@example.com",)
+    assert user.primaryEmail is None
+    assert user.userAttributes.get("cloud") == {"service": "gold"}
+    assert records.config(user.userAttributes) == {"k": "v"}
+
+
+def test_context_ref():
+    ctx = records.Context(id=1, name="brand_ctx0", maxQuota=1024)
+    assert ctx.ref() == {"id": 1, "name": "brand_ctx0"}
+
+
+def test_config():
+    assert records.config(None) == {}
+    assert records.config(zeepMap({"cloud": {"service": "gold"}})) == {}
+    assert records.config(zeepMap({"config": {"k": "v"}})) == {"k": "v"}
+    assert records.config(records.Attributes({"config": {"k": "v"}})) == {"k": "v"}
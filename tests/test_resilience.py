@@ -0,0 +1,127 @@
+# Copyright (C) 2022  OX Software GmbH
+#                     Wolfgang Rosenauer
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import argparse
+
+import pytest
+from requests import RequestException
+
+import listuser
+import records
+import resilience
+import restclient
+import settings
+import soapclient
+
+
+def spamlevelUrl(uid):
+    return settings.getRestHost() + "oxaas/v1/admin/contexts/1/users/" + str(uid) + "/spamlevel"
+
+
+def test_breaker_opens_after_threshold():
+    breaker = resilience.CircuitBreaker(threshold=2, cooldown=60)
+    breaker.failure()
+    assert breaker.allow()
+    breaker.failure()
+    assert not breaker.allow()
+
+
+def test_breaker_allows_trial_after_cooldown():
+    breaker = resilience.CircuitBreaker(threshold=1, cooldown=0)
+    breaker.failure()
+    assert breaker.allow()
+    breaker.success()
+    assert breaker.failures == 0
+
+
+def test_call_fails_fast_while_open():
+    calls = []
+
+    def fail():
+        calls.append(1)
+        raise ConnectionError("down")
+
+    for i in range(resilience.BREAKER_THRESHOLD):
+        with pytest.raises(ConnectionError):
+            resilience.call("soap", "Test", "Test.get", fail)
+    with pytest.raises(resilience.CircuitOpenError):
+        resilience.call("soap", "Test", "Test.get", fail)
+    assert len(calls) == resilience.BREAKER_THRESHOLD
+
+
+def test_call_retries_idempotent_requests():
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise ConnectionError("reset")
+        return "ok"
+
+    assert resilience.call("soap", "Test", "Test.get", flaky, idempotent=True) == "ok"
+    assert len(attempts) == 3
+
+
+def test_limiter_starts_at_workers_and_halves_on_error():
+    limiter = resilience.Limiter(16)
+    limiter.expect(4)
+    assert limiter.limit == 4
+    limiter.acquire()
+    limiter.release("Test.get", 0.01, error=True)
+    assert limiter.limit == 2
+    # congestion was seen, a later bulk run does not reset the limit
+    limiter.expect(8)
+    assert limiter.limit == 2
+
+
+def test_limiter_judges_latency_per_operation():
+    limiter = resilience.Limiter(16)
+    for i in range(5):
+        limiter.acquire()
+        limiter.release("Test.get", 0.01)
+    limit = limiter.limit
+    limiter.acquire()
+    limiter.release("Test.getMultipleData", 1.0)
+    assert limiter.limit >= limit
+
+
+def test_rest_circuit_open_is_request_exception(state, server):
+    server.errorRate = 1.0
+    for i in range(resilience.BREAKER_THRESHOLD):
+        assert restclient.get(spamlevelUrl(3), retry=False).status_code == 503
+    with pytest.raises(RequestException) as error:
+        restclient.get(spamlevelUrl(3), retry=False)
+    assert isinstance(error.value, resilience.CircuitOpenError)
+
+
+def test_best_effort_get_is_not_retried(state, server):
+    server.errorRate = 1.0
+    restclient.get(spamlevelUrl(3), retry=False)
+    assert server.stats["error"] == 1
+    restclient.get(spamlevelUrl(3))
+    assert server.stats["error"] == 2 + settings.getRetries()
+
+
+def test_listuser_keeps_fallbacks_while_circuit_open(state, server):
+    server.errorRate = 1.0
+    args = argparse.Namespace(skip_cos=False, skip_acn=True, skip_spamlevel=False)
+    ctx = records.Context(id=1, name="brand_ctx0")
+    userService = soapclient.getService("OXResellerUserService")
+    oxaasService = soapclient.getService("OXaaSService")
+    for uid in range(3, 3 + 2 * resilience.BREAKER_THRESHOLD):
+        acn, cos, spamlevel, mailquota, usage = listuser.getUserDetails(
+            ctx, records.User(id=uid), args, userService, oxaasService)
+        assert (acn, cos, spamlevel, mailquota, usage) == ("<skipped>", "unset", "<skipped>", "-", "-")
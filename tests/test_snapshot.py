@@ -0,0 +1,95 @@
+# Copyright (C) 2022  OX Software GmbH
+#                     Wolfgang Rosenauer
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import gzip
+import json
+import sys
+
+import snapshot
+import userdetails
+
+
+def run(monkeypatch, *argv):
+    monkeypatch.setattr(sys, "argv", ["snapshot.py"] + list(argv))
+    snapshot.main()
+
+
+def read(path):
+    with gzip.open(path, "rt") as archive:
+        return [json.loads(line) for line in archive]
+
+
+def users(records):
+    return {record["id"]: record for record in records if record["type"] == "user" and record["cid"] == 1}
+
+
+def test_snapshot_contents(state, server, tmp_path, monkeypatch):
+    state.forwards["1"] = {"info": ["user1@ctx0.example.com"]}
+    output = str(tmp_path / "full.jsonl.gz")
+    run(monkeypatch, "-o", output)
+    records = read(output)
+    assert records[0]["type"] == "reseller"
+    assert [record["id"] for record in records if record["type"] == "context"] == [1, 2]
+    assert len(users(records)) == len(state.users[1])
+    assert {"type": "forwarders", "cid": 1, "data": {"info": ["user1@ctx0.example.com"]}} in records
+    assert all("acn" in record["details"] for record in users(records).values())
+
+
+def test_incremental_snapshot_reuses_details(state, server, tmp_path, monkeypatch, capsys):
+    full = str(tmp_path / "full.jsonl.gz")
+    run(monkeypatch, "-o", full)
+    state.users[1][3]["maxQuota"] = 2048
+    server.stats.clear()
+    incremental = str(tmp_path / "incremental.jsonl.gz")
+    run(monkeypatch, "-o", incremental, "--previous", full)
+    assert "details of 1 looked up, {} reused, 0 failed".format(
+        sum(len(users) for users in state.users.values()) - 1) in capsys.readouterr().out
+    assert server.stats["soap:OXResellerUserService.getAccessCombinationName"] == 1
+    assert users(read(incremental))[3]["data"]["maxQuota"] == 2048
+    # the users, forwarders and catchalls are fetched for every context
+    assert server.stats["rest:GET forwards"] == len(state.contexts)
+
+
+def test_failed_details_are_kept_and_looked_up_again(state, server, tmp_path, monkeypatch, capsys):
+    full = str(tmp_path / "full.jsonl.gz")
+    run(monkeypatch, "-o", full)
+    state.users[1][3]["maxQuota"] = 2048
+    fetchDetails = userdetails.fetchDetails
+
+    def failing(ctx, user, *args):
+        if user.id == 3:
+            raise ConnectionError("unreachable")
+        return fetchDetails(ctx, user, *args)
+
+    monkeypatch.setattr(userdetails, "fetchDetails", failing)
+    second = str(tmp_path / "second.jsonl.gz")
+    run(monkeypatch, "-o", second, "--previous", full)
+    assert "1 failed)" in capsys.readouterr().out
+    record = users(read(second))[3]
+    assert record["detailsFailed"]
+    assert record["details"] == users(read(full))[3]["details"]
+
+    monkeypatch.setattr(userdetails, "fetchDetails", fetchDetails)
+    third = str(tmp_path / "third.jsonl.gz")
+    run(monkeypatch, "-o", third, "--previous", second)
+    assert "details of 1 looked up" in capsys.readouterr().out
+    assert "detailsFailed" not in users(read(third))[3]
+
+
+def test_pair_merges_previous_groups():
+    ctx = [type("Ctx", (), {"id": cid}) for cid in (1, 3, 4)]
+    groups = iter([(1, "a", ["1"]), (2, "b", ["2"]), (4, "d", ["4"])])
+    assert [group for c, group in snapshot.pair(ctx, groups)] == [("a", ["1"]), None, ("d", ["4"])]
@@ -0,0 +1,100 @@
+# Copyright (C) 2022  OX Software GmbH
+#                     Wolfgang Rosenauer
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import pytest
+
+import records
+import settings
+import soapclient
+
+RESPONSE = b"""<soap:Envelope xmlns:soap="http://schemas.xmlsoap.org/soap/envelope/"
+  xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" xmlns:ns="http://example.com/">
+<soap:Body><ns:listAllResponse>
+<ns:return><ns:id>3</ns:id><ns:name>a@example.com</ns:name><ns:mailenabled>true</ns:mailenabled>
+  <ns:maxQuota xsi:nil="true"/><ns:aliases>a@example.com</ns:aliases><ns:aliases>b@example.com</ns:aliases>
+  <ns:userAttributes><ns:entries><ns:key>config</ns:key><ns:value>
+    <ns:entries><ns:key>k</ns:key><ns:value>v</ns:value></ns:entries></ns:value></ns:entries></ns:userAttributes>
+  <ns:display_name>ignored</ns:display_name></ns:return>
+<ns:return><ns:id>4</ns:id><ns:name>c@example.com</ns:name></ns:return>
+</ns:listAllResponse></soap:Body></soap:Envelope>"""
+
+FAULT = b"""<soap:Envelope xmlns:soap="http://schemas.xmlsoap.org/soap/envelope/"><soap:Body>
+<soap:Fault><faultcode>soap:Server</faultcode><faultstring>No such user</faultstring></soap:Fault>
+</soap:Body></soap:Envelope>"""
+
+
+class Response:
+    """A response read completely, as zeep's transport returns it."""
+
+    def __init__(self, content, status=200):
+        self.content = content
+        self.status_code = status
+        self.raw = None
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def test_parse_records():
+    response = Response(RESPONSE)
+    users = soapclient.parseRecords(response, records.User.__slots__, records.User)
+    assert response.closed
+    assert [user.id for user in users] == [3, 4]
+    assert users[0].mailenabled is True
+    assert users[0].maxQuota is None
+    assert users[0].aliases == ("a@example.com", "b@example.com")
+    assert records.config(users[0].userAttributes) == {"k": "v"}
+    assert users[1].aliases == ()
+    assert users[1].userAttributes is None
+
+
+def test_parse_records_into_dicts():
+    users = soapclient.parseRecords(Response(RESPONSE), ("id", "name"))
+    assert users == [{"id": 3, "name": "a@example.com"}, {"id": 4, "name": "c@example.com"}]
+    assert users[0].name == "a@example.com"
+
+
+def test_parse_fault():
+    from zeep.exceptions import Fault
+    response = Response(FAULT, 500)
+    with pytest.raises(Fault, match="No such user"):
+        soapclient.parseRecords(response, ("id",))
+    assert response.closed
+
+
+@pytest.mark.parametrize("operation", ["listAll", "getMultipleData"])
+def test_raw_matches_zeep(state, server, monkeypatch, operation):
+    userService = soapclient.getService("OXResellerUserService")
+    ctx = {"id": 1}
+    if operation == "listAll":
+        args = (ctx, settings.getCreds(), False)
+    else:
+        args = (ctx, [{"id": uid} for uid in state.users[1]], settings.getCreds())
+    fast = userService.raw(operation, *args, record=records.User)
+    monkeypatch.setattr(settings, "getFastParse", lambda: False)
+    slow = userService.raw(operation, *args, record=records.User)
+    assert len(fast) == len(state.users[1])
+    assert [user.toDict() for user in fast] == [user.toDict() for user in slow]
+
+
+def test_raw_streams_large_responses(state, server):
+    for i in range(2000):
+        state.addUser(1, "bulk%d@ctx0.example.com" % i, "cloud_pim")
+    userService = soapclient.getService("OXResellerUserService")
+    users = userService.raw("listAll", {"id": 1}, settings.getCreds(), False, fields=("id", "name"))
+    assert len(users) == len(state.users[1])
+    assert users[-1].name == "bulk1999@ctx0.example.com"
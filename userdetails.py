@@ -0,0 +1,52 @@
+# Copyright (C) 2022  OX Software GmbH
+#                     Wolfgang Rosenauer
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Per-user details which are not part of the user data.
+
+ACN, COS and spamlevel each need a request per user, via SOAP and the
+oxaas REST API. They are fetched here for the tools comparing them
+(reconcile, snapshot).
+"""
+
+import restclient
+import settings
+import soapclient
+
+DETAILS = ("acn", "cos", "spamlevel")
+
+
+def fetchDetails(ctx, user, wanted=DETAILS):
+  """Return the details in wanted of user as dict, a value the server does not return is None."""
+  values = {}
+  if "acn" in wanted:
+    userService = soapclient.getService("OXResellerUserService")
+    values["acn"] = userService.getAccessCombinationName(ctx, {"id": user.id}, settings.getCreds())
+  for key, resource in (("cos", "classofservice"), ("spamlevel", "spamlevel")):
+    if key in wanted:
+      r = restclient.get(settings.getRestHost()+"oxaas/v1/admin/contexts/"+str(
+        ctx.id)+"/users/"+str(user.id)+"/"+resource)
+      values[key] = r.json()[resource] if r.status_code == 200 else None
+  if "cos" in values:
+    values["cos"] = normalizeCos(values["cos"])
+  return values
+
+def normalizeCos(cos):
+  """Return a COS (REST returns a list, manifests give a string or list) as comma separated string."""
+  if cos is None:
+    return None
+  if isinstance(cos, str):
+    cos = cos.split(",")
+  return ",".join(c.strip() for c in cos if c.strip())